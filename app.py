@@ -1,12 +1,84 @@
-import dash
-from dash import html
-from dash import dcc
-from dash_bootstrap_templates import load_figure_template
+import hmac
+import os
+import sys
+
+# `python -m app --profile-startup [--output startup.folded]` times a fresh import of this module, before the
+# imports below run, and reports where the boot time goes instead of starting the server
+if __name__ == "__main__" and '--profile-startup' in sys.argv:
+    from utils.startup_profile import profile_startup
+
+    profile_startup('app', sys.argv[1:])
+    sys.exit()
+
+import dash  # noqa: E402
+import flask  # noqa: E402
+from dash import html  # noqa: E402
+from dash import dcc  # noqa: E402
+from dash_bootstrap_templates import load_figure_template  # noqa: E402
+
+from utils.coalesce import coalesce  # noqa: E402
+from utils.compression import Compression  # noqa: E402
+from utils.data_manager import WATCH_INTERVAL, data_manager  # noqa: E402
+from utils.figure_cache import figure_cache  # noqa: E402
+from utils.figure_pool import figure_pool  # noqa: E402
+from utils.lazy import prime_all  # noqa: E402
+from utils.metrics import callback_metrics  # noqa: E402
+from utils.serialization import enable_fast_json  # noqa: E402
+from utils.startup_profile import span  # noqa: E402
+from utils.static_assets import static_assets  # noqa: E402
 
 # Instantiate the Dash app
 app = dash.Dash(__name__, use_pages=True, suppress_callback_exceptions=True)
 server = app.server
-load_figure_template("darkly")
+with span('load_figure_template("darkly") in app.py', 'theme'):
+    load_figure_template("darkly")
+
+# Opt-in faster callback serialization with orjson; DASH_TYPED_ARRAYS=1 also sends numeric figure arrays as
+# base64 typed arrays, when the bundled plotly.js decodes them
+FAST_JSON = os.environ.get('DASH_FAST_JSON', '0') == '1'
+if FAST_JSON:
+    enable_fast_json(typed_arrays=os.environ.get('DASH_TYPED_ARRAYS', '0') == '1')
+
+
+# Expose the figure cache hit/miss/eviction counters
+@server.route('/figure-cache/stats')
+def figure_cache_stats():
+    return figure_cache.stats()
+
+
+# Reload changed dataset files without a redeploy. With DATA_RELOAD_TOKEN set, POST /admin/reload-data with an
+# "Authorization: Bearer <token>" header reloads them in the worker serving the request (?dataset=<name> reloads
+# a dataset even if its file is unchanged); DATA_WATCH_INTERVAL makes every worker check the files itself.
+RELOAD_TOKEN = os.environ.get('DATA_RELOAD_TOKEN', '')
+if RELOAD_TOKEN:
+    @server.route('/admin/reload-data', methods=['POST'])
+    def reload_data():
+        if not hmac.compare_digest(flask.request.headers.get('Authorization', ''), f'Bearer {RELOAD_TOKEN}'):
+            flask.abort(403)
+        return {'reloaded': data_manager.reload(flask.request.args.getlist('dataset')), **data_manager.stats()}
+
+
+# Identify browser sessions so slider callbacks superseded by a newer value can be dropped
+coalesce.init_app(server)
+# Count running requests, so the figure pool is only (re)forked while none holds a lock
+figure_pool.init_app(server)
+
+# Compress responses of at least COMPRESS_MIN_SIZE bytes, and serve assets with content-hashed ETags.
+# Flask runs after_request hooks in reverse order, so compression sees the final asset headers.
+Compression(min_size=int(os.environ.get('COMPRESS_MIN_SIZE', '1024'))).init_app(server)
+static_assets.init_app(app)
+
+# Time every callback and serve the results, with the figure cache and figure pool counters, as Prometheus
+# text on /metrics
+callback_metrics.instrument(app)
+callback_metrics.register_route(server, extra_counters=lambda: [
+    *((f'dash_figure_cache_{name}_total', f'Figure cache {name}.', value)
+      for name, value in figure_cache.stats().items()),
+    *((f'dash_figure_pool_{name}_total', f'Figure pool builds {name}.', value)
+      for name, value in figure_pool.stats().items()),
+    ('dash_data_reloads_total', 'Data versions published after the first.', data_manager.reloads),
+])
+
 
 # Define the overall layout of the app
 app.layout = html.Div(
@@ -35,6 +107,11 @@ app.layout = html.Div(
     ]
 )
 
+# Pages load their datasets and build their layouts on first use; DASH_LAZY_PAGES=0 builds them all at startup
+if os.environ.get('DASH_LAZY_PAGES', '1') == '0':
+    prime_all()
+
 # Run the app
 if __name__ == "__main__":
+    data_manager.watch(WATCH_INTERVAL)
     app.run_server()
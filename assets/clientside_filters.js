@@ -0,0 +1,209 @@
+// Client-side year-range and entity filtering, used when the app runs with DASH_CLIENTSIDE_FILTERING=1.
+// Each page sends its series once per session into a dcc.Store (see utils/clientside.py); these functions
+// slice them and fill the same figure skeletons as the server callbacks they replace.
+(function () {
+    // How Python formats None in the titles
+    function text(value) {
+        return value === null || value === undefined ? 'None' : String(value);
+    }
+
+    function component(type, namespace, props) {
+        return {type: type, namespace: namespace, props: props};
+    }
+
+    function htmlElement(type, children, className) {
+        return component(type, 'dash_html_components', {children: children, className: className});
+    }
+
+    // First position in values[lo:hi] (sorted) holding a value > year, or >= year when inclusive is false
+    function bisect(values, year, lo, hi, inclusive) {
+        while (lo < hi) {
+            var mid = (lo + hi) >> 1;
+            if (inclusive ? values[mid] <= year : values[mid] < year) {
+                lo = mid + 1;
+            } else {
+                hi = mid;
+            }
+        }
+        return lo;
+    }
+
+    // The years of an entity between first and last, and every feature's values in them (EntityProfiles.series)
+    function series(columns, entity, first, last) {
+        var bounds = entity !== null && entity !== undefined &&
+            Object.prototype.hasOwnProperty.call(columns.bounds, entity) ? columns.bounds[entity] : [0, 0];
+        var lo = bisect(columns.years, first, bounds[0], bounds[1], false);
+        var hi = bisect(columns.years, last, bounds[0], bounds[1], true);
+        var values = {};
+        columns.features.forEach(function (feature) {
+            values[feature] = columns.values[feature].slice(lo, hi);
+        });
+        return {years: columns.years.slice(lo, hi), values: values};
+    }
+
+    // FigureTemplate.render: the i-th skeleton trace updated with traces[i], and layout keys replaced
+    function render(spec, traces, layout) {
+        var data = [];
+        for (var i = 0; i < Math.min(spec.data.length, traces.length); i++) {
+            data.push(Object.assign({}, spec.data[i], traces[i]));
+        }
+        return {data: data, layout: Object.assign({}, spec.layout, layout)};
+    }
+
+    // YearEntityMatrix.slice, without the years and entities that have no value
+    function densitySlice(density, first, last, entity) {
+        var lo = bisect(density.years, first, 0, density.years.length, false);
+        var hi = bisect(density.years, last, 0, density.years.length, true);
+        var columns = [];
+        if (entity === null) {
+            columns = density.entities.map(function (_, i) { return i; });
+        } else if (density.entities.indexOf(entity) >= 0) {
+            columns = [density.entities.indexOf(entity)];
+        }
+
+        var rows = density.values.slice(lo, hi);
+        var keptColumns = columns.filter(function (column) {
+            return rows.some(function (row) { return row[column] !== null; });
+        });
+        var x = keptColumns.map(function (column) { return density.entities[column]; });
+        var y = [];
+        var z = [];
+        rows.forEach(function (row, i) {
+            if (keptColumns.some(function (column) { return row[column] !== null; })) {
+                y.push(density.years[lo + i]);
+                z.push(keptColumns.map(function (column) { return row[column]; }));
+            }
+        });
+        return {x: x, y: y, z: z};
+    }
+
+    function noUpdates(count) {
+        var updates = [];
+        for (var i = 0; i < count; i++) {
+            updates.push(window.dash_clientside.no_update);
+        }
+        return updates;
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        clientFilters: {
+            // update_line_charts_and_details of both pages
+            countryProfile: function (country, clickData, selectedYears, data) {
+                if (!data) {
+                    return noUpdates(3);
+                }
+                var triggered = window.dash_clientside.callback_context.triggered;
+                if (triggered.length && /\.clickData$/.test(triggered[0].prop_id) && clickData) {
+                    country = clickData.points[0].location;
+                }
+                country = country === undefined ? null : country;
+
+                var charts = [];
+                var details = htmlElement('P', 'Click on a country to see details.', 'placeholder-text');
+                if (country) {
+                    var profile = series(data.profiles, country, selectedYears[0], selectedYears[1]);
+                    if (profile.years.length) {
+                        var figure = render(data.templates.profile, data.profiles.features.map(function (feature) {
+                            return {x: profile.years, y: profile.values[feature]};
+                        }), {title: {text: country}});
+                        charts.push(component('Graph', 'dash_core_components',
+                                              {figure: figure, style: {width: '100%'}}));
+
+                        var lines = data.details[country];
+                        if (lines) {
+                            details = htmlElement('Div', [htmlElement('H3', country, 'country-name')].concat(
+                                lines.map(function (line) { return htmlElement('P', line[0], line[1]); })
+                            ), 'country-details');
+                        }
+                    }
+                }
+                return [charts, details, country];
+            },
+
+            // update_region_line_plots of the GDP page
+            gdpRegionLines: function (region, selectedYears, data) {
+                if (!data) {
+                    return noUpdates(2);
+                }
+                var rows = series(data.regions, region, selectedYears[0], selectedYears[1]);
+                var gdp = data.regions.features[0];
+                var growthRate = data.regions.features[1];
+                return [
+                    render(data.templates.gdpLine, [{x: rows.years, y: rows.values[gdp]}],
+                           {title: {text: 'GDP in Current Prices Over Time for ' + text(region)}}),
+                    render(data.templates.growthRateLine, [{x: rows.years, y: rows.values[growthRate]}],
+                           {title: {text: 'GDP Real Rates of Growth Over Time for ' + text(region)}})
+                ];
+            },
+
+            // update_region_charts of the Population page
+            populationRegionCharts: function (region, selectedYears, data) {
+                if (!data) {
+                    return noUpdates(4);
+                }
+                var first = selectedYears[0];
+                var last = selectedYears[1];
+                var population = data.regions.features[0];
+                var barColumns = data.regions.features.slice(1);
+                var lineRows = series(data.regions, region, first, last);
+                var hasRows = region ? lineRows.years.length > 0 : data.regions.years.some(function (year) {
+                    return year >= first && year <= last;
+                });
+
+                var heatmap = render(
+                    data.templates.densityHeatmap, [densitySlice(data.density, first, last, region || null)],
+                    {title: {text: region ? 'Density Heatmap for ' + region : 'Density Heatmap for All Regions'}});
+
+                var details;
+                if (!hasRows) {
+                    details = htmlElement('P', 'No data available for selected region and year range.',
+                                          'placeholder-text');
+                } else if (region) {
+                    details = htmlElement('Div', [
+                        htmlElement('H3', region, 'region-name'),
+                        htmlElement('P', 'Years: ' + first + ' - ' + last, 'region-years')
+                    ], 'region-details');
+                } else {
+                    details = htmlElement('P', 'Select a region to see details.', 'placeholder-text');
+                }
+
+                var lineTitle = {title: {text: 'Population over Time for ' + text(region)}};
+                var line;
+                if (lineRows.years.length) {
+                    // The skeleton's trace is named after data.regionMarker
+                    var trace = {x: lineRows.years, y: lineRows.values[population]};
+                    var skeleton = data.templates.line.data[0];
+                    ['name', 'legendgroup', 'hovertemplate'].forEach(function (key) {
+                        trace[key] = skeleton[key].split(data.regionMarker).join(region);
+                    });
+                    line = render(data.templates.line, [trace], lineTitle);
+                } else {
+                    line = render(data.templates.emptyLine, [], lineTitle);
+                }
+
+                // The bar chart shows a few fixed years of the region, whatever the range selected
+                var allRows = series(data.regions, region, -Infinity, Infinity);
+                var barPositions = [];
+                allRows.years.forEach(function (year, i) {
+                    if (data.barYears.indexOf(year) >= 0) {
+                        barPositions.push(i);
+                    }
+                });
+                var barTitle = {title: {text: 'Population Distribution for ' + text(region)}};
+                var bar;
+                if (barPositions.length) {
+                    bar = render(data.templates.bar, barColumns.map(function (column) {
+                        return {
+                            x: barPositions.map(function (i) { return allRows.years[i]; }),
+                            y: barPositions.map(function (i) { return allRows.values[column][i]; })
+                        };
+                    }), barTitle);
+                } else {
+                    bar = render(data.templates.emptyBar, [], barTitle);
+                }
+
+                return [heatmap, details, line, bar];
+            }
+        }
+    });
+})();
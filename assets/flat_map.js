@@ -0,0 +1,58 @@
+// Client-side playback of the GDP flat map: the figure already carries one frame per year,
+// so playing it needs no server round trips.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    flatMap: {
+        togglePlay: function (nClicks) {
+            var container = document.getElementById('flat-map');
+            var graph = container && container.querySelector('.js-plotly-plot');
+            var playing = nClicks % 2 === 1;
+
+            if (!graph || !window.Plotly) {
+                return 'Play';
+            }
+            graph.flatMapPlaying = playing;
+
+            if (!playing) {
+                // Animating to an empty frame list stops the running animation
+                window.Plotly.animate(graph, [null], {mode: 'immediate', frame: {duration: 0, redraw: false}});
+                return 'Play';
+            }
+
+            // Play one frame at a time, reading the years selected on the range slider (the figure's
+            // layout.meta) before each one, so moving the slider mid-playback plays the new range from its start
+            var run = (graph.flatMapRun || 0) + 1;
+            var played = null;
+            var index = 0;
+            graph.flatMapRun = run;
+            var step = function () {
+                // Stopped, or replaced by a later press of the button
+                if (!graph.flatMapPlaying || graph.flatMapRun !== run) {
+                    return;
+                }
+                var meta = graph.layout && graph.layout.meta;
+                var years = meta && meta.years ? meta.years : [];
+                if (years.join() !== played) {
+                    played = years.join();
+                    index = 0;
+                }
+                if (!years.length) {
+                    // Nothing to play in this range, wait for another one
+                    setTimeout(step, 1000);
+                    return;
+                }
+                var year = years[index % years.length];
+                index += 1;
+                window.Plotly.animate(graph, [year], {
+                    mode: 'immediate',
+                    frame: {duration: 1000, redraw: true},
+                    transition: {duration: 0}
+                }).then(step, function () {
+                    // Interrupted, e.g. by the slider's figure update: carry on with the next frame
+                    setTimeout(step, 0);
+                });
+            };
+            step();
+            return 'Pause';
+        }
+    }
+});
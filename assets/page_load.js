@@ -0,0 +1,15 @@
+// Tags the callback requests of this page load with an id of its own, so utils/coalesce.py only lets a newer
+// slider value supersede an older one from the same tab. The session cookie is shared by every tab of a browser.
+(function () {
+    var pageLoad = Date.now().toString(36) + '-' + Math.random().toString(36).slice(2);
+    var fetch = window.fetch;
+
+    window.fetch = function (input, init) {
+        var url = typeof input === 'string' ? input : input.url;
+        if (url.indexOf('_dash-update-component') !== -1) {
+            init = Object.assign({}, init);
+            init.headers = Object.assign({}, init.headers, {'X-Dash-Page-Load': pageLoad});
+        }
+        return fetch.call(this, input, init);
+    };
+})();
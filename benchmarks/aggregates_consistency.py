@@ -0,0 +1,84 @@
+"""Check that the precomputed MetricCube aggregates match the per-callback pandas computations exactly.
+
+For every metric used by the pie and bar charts and every year (plus an unknown one), recomputes the
+original groupby/sum/percentage and compares it with the cube, then times both. Exits with status 1 on
+any mismatch.
+
+    python benchmarks/aggregates_consistency.py [--repeat 200]
+"""
+import argparse
+import sys
+import timeit
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.aggregates import MetricCube  # noqa: E402
+from utils.data_loader import ENTITY_COLUMN, load_dataset, widen  # noqa: E402
+
+METRICS = {
+    'gdp_regions': ['GDP in current prices (millions of US dollars)', 'GDP per capita (US dollars)'],
+    'population_regions': ['Population mid-year estimates (millions)', 'Surface area (thousand km2)'],
+}
+
+
+def year_shares(df, metric, year):
+    selected_data = df[df['Year'] == year]
+    total = df.groupby('Year')[metric].sum()
+    region_total = selected_data.groupby(ENTITY_COLUMN, observed=True)[metric].sum()
+    return region_total / total.sum() * 100
+
+
+def entity_shares(df, metric):
+    total = df.groupby('Year')[metric].sum()
+    region_total = df.groupby(ENTITY_COLUMN, observed=True)[metric].sum()
+    return region_total / total.sum() * 100
+
+
+def year_rows(df, metric, year):
+    return df[df['Year'] == year][[ENTITY_COLUMN, metric]].reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    failures = 0
+    for name, metrics in METRICS.items():
+        # The cube is built from the compact frame the app loads, the reference from the columns as read
+        loaded = load_dataset(name)
+        df = widen(loaded)
+        for metric in metrics:
+            cube = MetricCube(loaded, metric)
+            checks = [('all years', entity_shares(df, metric), cube.entity_shares)]
+            for year in [*sorted(df['Year'].unique()), 1900]:
+                checks.append((f'{year} shares', year_shares(df, metric, year), cube.year_shares(year)))
+                checks.append((f'{year} totals', year_rows(df, metric, year), cube.year_totals(year).reset_index()))
+            for label, expected, actual in checks:
+                try:
+                    if isinstance(expected, pd.DataFrame):
+                        pd.testing.assert_frame_equal(actual, expected, check_exact=True, check_index_type=False,
+                                                      check_categorical=False)
+                    else:
+                        pd.testing.assert_series_equal(actual, expected, check_exact=True, check_index_type=False)
+                except AssertionError as e:
+                    failures += 1
+                    print(f'MISMATCH {name} / {metric} / {label}: {e}')
+
+            year = df['Year'].max()
+            before = min(timeit.repeat(lambda: year_shares(df, metric, year), repeat=5, number=args.repeat))
+            after = min(timeit.repeat(lambda: cube.year_shares(year), repeat=5, number=args.repeat))
+            print(f'{name} / {metric}: {len(checks)} checks, per call '
+                  f'{before / args.repeat * 1e6:.1f} us -> {after / args.repeat * 1e6:.2f} us')
+
+    if failures:
+        print(f'{failures} mismatches')
+        sys.exit(1)
+    print('all aggregates match')
+
+
+if __name__ == '__main__':
+    main()
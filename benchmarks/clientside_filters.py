@@ -0,0 +1,129 @@
+"""Check assets/clientside_filters.js against the server callbacks it replaces in clientside filtering mode.
+
+Runs the JavaScript functions under node on each page's client data, for every country and region (and none)
+over several year ranges, and compares their output with the server callback's response to the same inputs.
+Also reports the size of the client data a session downloads. Exits with status 1 on any mismatch.
+
+    python benchmarks/clientside_filters.py [--node node]
+"""
+import argparse
+import gzip
+import json
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+from plotly.io.json import to_json_plotly
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from load_test import callback_requests  # noqa: E402
+
+YEAR_RANGES = [(1990, 2030), (2005, 2010), (2010, 2010), (2021, 2022), (2030, 2040)]
+
+# Loads the asset with a stub of what dash-renderer provides and answers every case read from stdin
+NODE_RUNNER = """
+const fs = require('fs');
+global.window = {dash_clientside: {no_update: {}, callback_context: {}}};
+require(process.argv[1]);
+const input = JSON.parse(fs.readFileSync(0, 'utf8'));
+const functions = window.dash_clientside.clientFilters;
+const results = input.cases.map(function (c) {
+    window.dash_clientside.callback_context.triggered = [{prop_id: c.changed, value: c.args[0]}];
+    return functions[c.function].apply(null, c.args.concat([input.data[c.page]]));
+});
+process.stdout.write(JSON.stringify(results));
+"""
+
+
+def cases(gdp, population):
+    """Yield (page, JS function, server callback, changed property, {property: value}) for every case checked."""
+    gdp_data, population_data = gdp.gdp_data(), population.population_data()
+    for page, data, suffix, slider in (('gdp', gdp_data, '', 'year-slider'),
+                                       ('population', population_data, '1', 'year-slider-country')):
+        for country in [None, 'Unknown', *data.country_profiles.index.entities()]:
+            for first_year, last_year in YEAR_RANGES:
+                yield (page, 'countryProfile', 'update_line_charts_and_details', f'country-dropdown{suffix}.value',
+                       {f'country-dropdown{suffix}.value': country, f'{slider}.value': [first_year, last_year]})
+        for country in data.country_profiles.index.entities()[::10]:
+            yield (page, 'countryProfile', 'update_line_charts_and_details', f'map{suffix}.clickData',
+                   {f'map{suffix}.clickData': {'points': [{'location': country}]}, f'{slider}.value': [1990, 2030]})
+
+    for region in [None, 'Unknown', *gdp_data.gdp_regions_index.entities()]:
+        for first_year, last_year in YEAR_RANGES:
+            yield ('gdp', 'gdpRegionLines', 'update_region_line_plots', 'gdp-region-dropdown.value',
+                   {'gdp-region-dropdown.value': region, 'gdp-year-slider.value': [first_year, last_year]})
+    for region in [None, 'Unknown', *population_data.regions_index.entities()]:
+        for first_year, last_year in YEAR_RANGES:
+            yield ('population', 'populationRegionCharts', 'update_region_charts', 'region-dropdown.value',
+                   {'region-dropdown.value': region, 'year-slider-region.value': [first_year, last_year]})
+
+
+def server_response(client, template, changed, values):
+    def current(item):
+        return values.get(f"{item['id']}.{item['property']}")
+
+    body = json.dumps({
+        'output': template['output'],
+        'outputs': template['outputs'],
+        'inputs': [dict(item, value=current(item)) for item in template['inputs']],
+        'state': [dict(item, value=current(item)) for item in template['state']],
+        'changedPropIds': [changed],
+    })
+    response = client.post('/_dash-update-component', data=body, content_type='application/json').get_json()
+    return [response['response'][output['id']][output['property']] for output in template['outputs']]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--node', default='node')
+    args = parser.parse_args()
+    if shutil.which(args.node) is None:
+        sys.exit(f'{args.node} not found, it is needed to run the JavaScript')
+
+    import app as dash_app  # the server callbacks, registered as clientside filtering is off
+
+    gdp = sys.modules['pages.GDP']
+    population = sys.modules['pages.Population']
+    client = dash_app.app.server.test_client()
+    client.get('/')
+
+    data = {'gdp': gdp.build_client_data(), 'population': population.build_client_data()}
+    for page, page_data in data.items():
+        payload = to_json_plotly(page_data).encode()
+        print(f'{page} client data: {len(payload) / 1024:.1f} KB, {len(gzip.compress(payload)) / 1024:.1f} KB gzipped')
+
+    all_cases = list(cases(gdp, population))
+    expected = []
+    for page, _, name, changed, values in all_cases:
+        template = next(t for t in callback_requests(dash_app.app, {}, changed) if t['name'] == name)
+        expected.append(server_response(client, template, changed, values))
+        # The inputs in the order of the callback's arguments; the store data comes last
+        values['args'] = [values.get(f"{item['id']}.{item['property']}") for item in template['inputs']]
+
+    node_input = to_json_plotly({
+        'data': data,
+        'cases': [{'page': page, 'function': function, 'changed': changed, 'args': values['args']}
+                  for page, function, _, changed, values in all_cases],
+    })
+    output = subprocess.run([args.node, '-e', NODE_RUNNER, str(ROOT / 'assets' / 'clientside_filters.js')],
+                            input=node_input, capture_output=True, text=True, check=True).stdout
+
+    failures = 0
+    for (page, function, _, changed, values), server, browser in zip(all_cases, expected, json.loads(output)):
+        if server != browser:
+            failures += 1
+            if failures <= 10:
+                print(f'MISMATCH {page} {function} {changed}={values["args"]}')
+
+    if failures:
+        print(f'{failures} of {len(all_cases)} cases differ')
+        sys.exit(1)
+    print(f'all {len(all_cases)} cases match')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+"""Memory of the compact dtypes the data layer loads, and a check that every figure renders the same with them.
+
+For each dataset, reports the deep memory of the frame as pandas reads it (entity names as Python strings,
+int64 and float64 columns), with only the names categorical (the previous layout) and with the compact
+dtypes (DASH_COMPACT_DTYPES, the default), column by column, and times the equality masks callbacks build
+on the entity and Year columns with each layout.
+
+The frames are only part of what a worker holds: the lookup structures built from them (entity indexes,
+latest snapshots, cubes, profiles) keep widened 64-bit copies. So it then builds both pages' data in one
+subprocess with compact dtypes and one without and reports every structure's arrays and strings, each
+buffer counted once (views under the structure that owns their base), with the totals.
+
+Then renders both page layouts and the response of every callback a scenario of benchmarks/load_test.py
+triggers, for every value of its input, in one subprocess with compact dtypes and one without, for each
+plotly JSON engine available (json and orjson), and compares them byte for byte. Exits with status 1 if
+any output differs.
+
+    python benchmarks/compact_dtypes.py [--values 0] [--repeat 200]
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import timeit
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / 'benchmarks'))
+
+
+def render(path, engine, values):
+    """Write {request: sha256 of the response} for the layouts and the scenario callbacks to path."""
+    import plotly.io as pio
+
+    import app as dash_app
+    from load_test import SCENARIOS, _body, callback_requests, page_components, scenario_values
+
+    pio.json.config.default_engine = engine
+    server = dash_app.app.server
+    client = server.test_client()
+    client.get('/')
+
+    outputs = {}
+    for page in dash_app.dash.page_registry.values():
+        layout = page['layout']() if callable(page['layout']) else page['layout']
+        outputs[f"layout {page['path']}"] = pio.json.to_json_plotly(layout)
+
+    components = page_components()
+    for scenario, _, changed, context in SCENARIOS:
+        scenario_inputs = scenario_values(changed, components)
+        for i, value in enumerate(itertools.islice(scenario_inputs, values or None)):
+            for template in callback_requests(dash_app.app, components, changed):
+                response = client.post('/_dash-update-component', data=_body(
+                    template, components, changed, value, context), content_type='application/json')
+                outputs[f"{scenario} #{i} {template['output']}"] = response.get_data(as_text=True)
+
+    with open(path, 'w') as f:
+        json.dump({key: hashlib.sha256(value.encode()).hexdigest() for key, value in outputs.items()}, f)
+
+
+def held_bytes(obj, seen):
+    """Bytes of the arrays and strings reachable from obj that are not in seen yet (views count their base)."""
+    if isinstance(obj, pd.DataFrame):
+        return held_bytes(obj.index, seen) + sum(held_bytes(obj.iloc[:, i], seen) for i in range(obj.shape[1]))
+    if isinstance(obj, pd.RangeIndex):
+        return 0
+    if isinstance(obj, (pd.Series, pd.Index)):
+        return held_bytes(obj.to_numpy() if isinstance(obj.dtype, np.dtype) else obj.array, seen)
+    if isinstance(obj, pd.Categorical):
+        return held_bytes(obj.codes, seen) + held_bytes(obj.categories, seen)
+    if isinstance(obj, np.ndarray):
+        while isinstance(obj.base, np.ndarray):
+            obj = obj.base
+    if id(obj) in seen:
+        return 0
+    if isinstance(obj, (np.ndarray, pd.api.extensions.ExtensionArray)):
+        seen[id(obj)] = obj
+        items = obj.ravel() if obj.dtype == object or obj.dtype.kind == 'O' else ()
+        return int(obj.nbytes) + sum(held_bytes(item, seen) for item in items)
+    if isinstance(obj, str):
+        seen[id(obj)] = obj
+        return sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        seen[id(obj)] = obj
+        return sys.getsizeof(obj) + sum(held_bytes(key, seen) + held_bytes(value, seen) for key, value in obj.items())
+    if isinstance(obj, (list, tuple)):
+        seen[id(obj)] = obj
+        return sys.getsizeof(obj) + sum(held_bytes(item, seen) for item in obj)
+    if type(obj).__module__.startswith(('utils.', 'pages.')):
+        seen[id(obj)] = obj
+        return sys.getsizeof(obj) + held_bytes(vars(obj), seen)
+    # Numbers, figures, callables: not part of the data layout
+    return 0
+
+
+def structures(path):
+    """Write {structure: bytes} for the datasets and everything the pages derive from them to path."""
+    import app as dash_app
+    from utils.data_manager import data_manager
+
+    dash_app.server.test_client().get('/')
+    page_data = {'gdp': sys.modules['pages.GDP'].gdp_data(),
+                 'population': sys.modules['pages.Population'].population_data()}
+    data = data_manager.current()
+
+    seen = {}
+    sizes = {f'dataset {name}': held_bytes(data.frame(name), seen) for name in sorted(data.loaded())}
+    for page, built in page_data.items():
+        for attribute, value in vars(built).items():
+            sizes[f'{page}.{attribute}'] = held_bytes(value, seen)
+    with open(path, 'w') as f:
+        json.dump(sizes, f)
+
+
+def frame_memory(df):
+    return int(df.memory_usage(deep=True).sum())
+
+
+def memory_report(repeat):
+    from utils.data_loader import DATASETS, ENTITY_COLUMN, load_dataset, widen
+
+    print(f"{'dataset':<22} {'as read':>10} {'categorical':>12} {'compact':>10}")
+    strings = set()
+    names = 0
+    for name in DATASETS:
+        compact = load_dataset(name)
+        previous = widen(compact)
+        read = previous.assign(**{ENTITY_COLUMN: previous[ENTITY_COLUMN].astype(object)})
+        sizes = [frame_memory(df) for df in (read, previous, compact)]
+        print(f'{name:<22} {sizes[0] / 1024:>8.0f} KB {sizes[1] / 1024:>10.0f} KB {sizes[2] / 1024:>8.0f} KB '
+              f'({(1 - sizes[2] / sizes[0]) * 100:.0f}% less than as read)')
+        for column in compact.columns:
+            if read[column].dtype != compact[column].dtype:
+                print(f'    {column:<54} {str(read[column].dtype):>8} -> {compact[column].dtype}')
+
+        entity = compact[ENTITY_COLUMN].cat.categories[len(compact[ENTITY_COLUMN].cat.categories) // 2]
+        year = int(compact['Year'].max())
+        for label, column, value in [('entity ==', ENTITY_COLUMN, entity), ('Year ==', 'Year', year)]:
+            before = min(timeit.repeat(lambda: read[column] == value, number=repeat, repeat=5)) / repeat
+            after = min(timeit.repeat(lambda: compact[column] == value, number=repeat, repeat=5)) / repeat
+            print(f'    mask {label:<10} {before * 1e6:>8.1f} us -> {after * 1e6:>6.1f} us')
+
+        names += len(compact[ENTITY_COLUMN].cat.categories)
+        strings.update(id(category) for category in compact[ENTITY_COLUMN].cat.categories)
+    print(f'entity names: {names} categories across the datasets, {len(strings)} distinct string objects')
+
+
+def structures_report():
+    sizes = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for compact in ('0', '1'):
+            output = Path(tmp) / f'structures-{compact}.json'
+            env = dict(os.environ, DASH_COMPACT_DTYPES=compact, DASH_SNAPSHOT_DIR='', FIGURE_POOL_WORKERS='0',
+                       DASH_CLIENTSIDE_FILTERING='0')
+            subprocess.run([sys.executable, __file__, '--structures', str(output)], env=env, check=True)
+            with open(output) as f:
+                sizes[compact] = json.load(f)
+
+    print(f"\n{'page data':<48} {'64-bit':>10} {'compact':>10}")
+    totals = {'datasets': [0, 0], 'derived structures': [0, 0]}
+    for name in sizes['0']:
+        wide, compact = sizes['0'][name], sizes['1'].get(name, 0)
+        totals['datasets' if name.startswith('dataset ') else 'derived structures'][0] += wide
+        totals['datasets' if name.startswith('dataset ') else 'derived structures'][1] += compact
+        if wide or compact:
+            print(f'{name:<48} {wide / 1024:>7.0f} KB {compact / 1024:>7.0f} KB')
+    totals['total'] = [sum(sizes['0'].values()), sum(sizes['1'].values())]
+    for label, (wide, compact) in totals.items():
+        print(f'{label:<48} {wide / 1024:>7.0f} KB {compact / 1024:>7.0f} KB ({(compact / wide - 1) * 100:+.0f}%)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--values', type=int, default=0, help='input values per scenario (0 for all)')
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--render', nargs=2, metavar=('OUTPUT', 'ENGINE'), help=argparse.SUPPRESS)
+    parser.add_argument('--structures', metavar='OUTPUT', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.render:
+        return render(args.render[0], args.render[1], args.values)
+    if args.structures:
+        return structures(args.structures)
+
+    memory_report(args.repeat)
+    structures_report()
+
+    try:
+        import orjson  # noqa: F401
+        engines = ['json', 'orjson']
+    except ImportError:
+        engines = ['json']
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        for engine in engines:
+            results = {}
+            for compact in ('0', '1'):
+                output = Path(tmp) / f'{engine}-{compact}.json'
+                env = dict(os.environ, DASH_COMPACT_DTYPES=compact, DASH_SNAPSHOT_DIR='', FIGURE_POOL_WORKERS='0',
+                           DASH_CLIENTSIDE_FILTERING='0', FIGURE_CACHE_BACKEND='memory')
+                subprocess.run([sys.executable, __file__, '--render', str(output), engine,
+                                '--values', str(args.values)], env=env, check=True)
+                with open(output) as f:
+                    results[compact] = json.load(f)
+            differ = sorted(key for key in results['0'] if results['0'][key] != results['1'].get(key))
+            failures += len(differ)
+            for key in differ:
+                print(f'MISMATCH {engine}: {key}')
+            print(f'{engine} engine: {len(results["0"])} layouts and responses, {len(differ)} differ')
+
+    if failures:
+        return 1
+    print('all figures render identically')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
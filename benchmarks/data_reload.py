@@ -0,0 +1,153 @@
+"""Check that a dataset reload rebuilds only what depends on the changed file.
+
+Copies data/ to a temporary DASH_DATA_DIR, builds both pages' data and map figures, then changes one
+population figure and removes one country from the countries CSV and reloads it through /admin/reload-data.
+Checks that the structures derived from the other datasets are the same objects in the new version, that the
+population map's old figure cache entries are dropped while the GDP map's and the new version's are kept, that
+the changed value is served, that selecting the removed country (as a tab still listing it would) leaves the
+globe unselected, and that a request which started before a reload keeps reading the version it started on.
+Exits with status 1 on any failure.
+
+    python benchmarks/data_reload.py
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+TOKEN = 'benchmark-token'
+COUNTRY = 'Afghanistan'
+REMOVED_COUNTRY = 'Albania'
+POPULATION_COLUMN = 'Population mid-year estimates (millions)'
+
+
+def main():
+    argparse.ArgumentParser(description=__doc__.splitlines()[0]).parse_args()
+
+    data_dir = Path(tempfile.mkdtemp(prefix='dash-data-'))
+    shutil.copytree(ROOT / 'data', data_dir, dirs_exist_ok=True, ignore=shutil.ignore_patterns('.cache'))
+    os.environ.update(DASH_DATA_DIR=str(data_dir), DASH_SNAPSHOT_DIR='', DASH_CLIENTSIDE_FILTERING='0',
+                      FIGURE_POOL_WORKERS='0', FIGURE_CACHE_BACKEND='memory', DATA_RELOAD_TOKEN=TOKEN)
+    try:
+        return check(data_dir)
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def latest_population():
+    population = sys.modules['pages.Population']
+    return float(population.population_data().latest_countries.get(COUNTRY)[POPULATION_COLUMN])
+
+
+def select_country(client, country):
+    """Return the globe rotation the population page's update_map patches in for a dropdown value."""
+    response = client.post('/_dash-update-component', json={
+        'output': 'map1.figure', 'outputs': {'id': 'map1', 'property': 'figure'},
+        'inputs': [{'id': 'country-dropdown1', 'property': 'value', 'value': country}],
+        'changedPropIds': ['country-dropdown1.value'], 'state': []})
+    if response.status_code != 200:
+        return None
+    operations = response.get_json()['response']['map1']['figure']['operations']
+    return next(operation['params']['value'] for operation in operations
+                if operation['location'] == ['layout', 'geo', 'projection', 'rotation'])
+
+
+def check(data_dir):
+    import app as dash_app
+    from utils.data_manager import data_manager
+    from utils.figure_cache import figure_cache
+
+    client = dash_app.server.test_client()
+    client.get('/')
+    gdp = sys.modules['pages.GDP']
+    population = sys.modules['pages.Population']
+
+    failures = []
+
+    def expect(condition, message):
+        print(f'{"ok  " if condition else "FAIL"} {message}')
+        if not condition:
+            failures.append(message)
+
+    old_gdp, old_population = gdp.gdp_data(), population.population_data()
+    gdp.build_map()
+    population.build_map()
+    old_value = latest_population()
+    expect(select_country(client, REMOVED_COUNTRY) not in (None, {'lon': 0, 'lat': 0}),
+           f'{REMOVED_COUNTRY} selected before the reload')
+    cached = set(figure_cache.backend.keys())
+
+    expect(client.post('/admin/reload-data').status_code == 403, 'reload without the token is refused')
+    response = client.post('/admin/reload-data', headers={'Authorization': f'Bearer {TOKEN}'})
+    expect(response.get_json()['reloaded'] == [], 'reload with unchanged files publishes nothing')
+
+    # Change one country's latest population and remove another country
+    csv = data_dir / 'cleaned_df.csv'
+    lines = []
+    for line in csv.read_text().splitlines(keepends=True):
+        fields = line.split(',')
+        if fields[0] == COUNTRY and fields[1] == '2022':
+            fields[5] = f'{float(fields[5]) + 1:g}'
+            line = ','.join(fields)
+        if fields[0] != REMOVED_COUNTRY:
+            lines.append(line)
+    csv.write_text(''.join(lines))
+
+    start = time.perf_counter()
+    response = client.post('/admin/reload-data', headers={'Authorization': f'Bearer {TOKEN}'})
+    elapsed = time.perf_counter() - start
+    result = response.get_json()
+    expect(result['reloaded'] == ['population_countries'], f'only population_countries reloaded ({elapsed:.2f} s)')
+    expect(result['version'] == 2, 'version 2 published')
+
+    new_gdp, new_population = gdp.gdp_data(), population.population_data()
+    expect(new_gdp is not old_gdp and new_population is not old_population, 'page data rebuilt for the new version')
+    for name in ['df_gdp_countries', 'df_gdp_regions', 'latest_gdp_countries', 'gdp_countries_index',
+                 'gdp_regions_index', 'country_profiles', 'gdp_regions_cube', 'gdp_per_capita_regions_cube']:
+        expect(getattr(new_gdp, name) is getattr(old_gdp, name), f'GDP {name} reused')
+    for name in ['df_regions', 'regions_index', 'population_regions_cube', 'area_regions_cube', 'density_matrix',
+                 'area_pie_figure']:
+        expect(getattr(new_population, name) is getattr(old_population, name), f'population {name} reused')
+    for name in ['df', 'latest_countries', 'countries_index', 'country_profiles']:
+        expect(getattr(new_population, name) is not getattr(old_population, name), f'population {name} rebuilt')
+    expect(latest_population() == old_value + 1, f'new latest population served ({old_value} -> {old_value + 1})')
+    expect(select_country(client, REMOVED_COUNTRY) == {'lon': 0, 'lat': 0},
+           f'selecting the removed {REMOVED_COUNTRY} leaves the globe unselected')
+
+    keys = set(figure_cache.backend.keys())
+    expect(any(key.startswith('gdp.map@') for key in keys & cached), 'GDP map cache entry kept')
+    expect(not any(key.startswith('population.map@') for key in keys), 'population map cache entry dropped')
+    expect(figure_cache.invalidations >= 1, f'{figure_cache.invalidations} cache entries invalidated')
+    # Another worker sharing the cache backend reloads the same files after this one built the new map
+    population.build_map()
+    rebuilt = {key for key in figure_cache.backend.keys() if key.startswith('population.map@')}
+    figure_cache.invalidate(result['reloaded'], keep=data_manager.current())
+    expect(bool(rebuilt) and rebuilt <= set(figure_cache.backend.keys()),
+           "new version's population map entry kept by a later invalidation")
+
+    # A request reading data before a reload keeps its version until it ends
+    with dash_app.server.test_request_context('/'):
+        pinned = latest_population()
+        reload = threading.Thread(target=data_manager.reload, args=(['population_countries'],))
+        reload.start()
+        reload.join()
+        expect(data_manager.published.number == 3, 'version 3 published during the request')
+        expect(data_manager.current().number == 2 and latest_population() == pinned,
+               'the request still reads version 2')
+    expect(data_manager.current().number == 3, 'the next request reads version 3')
+
+    if failures:
+        print(f'{len(failures)} checks failed')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
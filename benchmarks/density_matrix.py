@@ -0,0 +1,93 @@
+"""Check the precomputed density matrix and heatmap skeleton against pivot_table and px.imshow.
+
+For the region dataset and the ~230-country dataset (which has duplicate and missing values), pivots the
+rows of every entity (and of all entities) over several year ranges. Each pivot is compared with the
+YearEntityMatrix slice, and the px.imshow heatmap of the pivot with the Population page's templated heatmap
+of the slice. Then the full-table case is timed both ways. Exits with status 1 on any mismatch.
+
+    python benchmarks/density_matrix.py [--repeat 20]
+"""
+import argparse
+import sys
+import timeit
+from pathlib import Path
+
+import pandas as pd
+from plotly.io.json import to_json_plotly
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.aggregates import YearEntityMatrix  # noqa: E402
+from utils.data_loader import ENTITY_COLUMN, load_dataset, widen  # noqa: E402
+
+DATASETS = ['population_regions', 'population_countries']
+METRIC = 'Population density'
+YEAR_RANGES = [(2010, 2022), (2015, 2021), (2011, 2014), (2022, 2022), (1900, 2100), (2021, 2010)]
+
+
+def pivot(df, first_year, last_year, entity):
+    selected_data = df[(df['Year'] >= first_year) & (df['Year'] <= last_year)]
+    if entity is not None:
+        selected_data = selected_data[selected_data[ENTITY_COLUMN] == entity]
+    return selected_data.pivot_table(index='Year', columns=ENTITY_COLUMN, values=METRIC, observed=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    import app  # noqa: F401  registers the pages and makes darkly the default plotly template
+
+    population = sys.modules['pages.Population']
+
+    def before(df, first_year, last_year, entity):
+        return population.build_density_heatmap(entity, pivot(df, first_year, last_year, entity))
+
+    def after(matrix, first_year, last_year, entity):
+        density = matrix.slice(first_year, last_year, entity)
+        return population.build_heatmap_and_details(entity, (first_year, last_year), True, density)[0]
+
+    failures = 0
+    for name in DATASETS:
+        # The matrix is built from the compact frame the app loads, the reference from the columns as read
+        loaded = load_dataset(name)
+        df = widen(loaded)
+        matrix = YearEntityMatrix(loaded, METRIC)
+        entities = [None, *df[ENTITY_COLUMN].cat.categories, 'Unknown']
+        checks = 0
+        for entity in entities:
+            for first_year, last_year in YEAR_RANGES:
+                checks += 1
+                try:
+                    pd.testing.assert_frame_equal(matrix.slice(first_year, last_year, entity),
+                                                  pivot(df, first_year, last_year, entity), check_exact=True,
+                                                  check_index_type=False, check_column_type=False,
+                                                  check_categorical=False)
+                    assert to_json_plotly(after(matrix, first_year, last_year, entity)) == to_json_plotly(
+                        before(df, first_year, last_year, entity)), 'heatmap figures differ'
+                except AssertionError as e:
+                    failures += 1
+                    print(f'MISMATCH {name} / {entity} / {first_year}-{last_year}: {e}')
+
+        first_year, last_year = matrix.years[0], matrix.years[-1]
+        pivot_time = min(timeit.repeat(lambda: pivot(df, first_year, last_year, None), repeat=5,
+                                       number=args.repeat))
+        slice_time = min(timeit.repeat(lambda: matrix.slice(first_year, last_year), repeat=5, number=args.repeat))
+        before_time = min(timeit.repeat(lambda: before(df, first_year, last_year, None), repeat=3,
+                                        number=args.repeat))
+        after_time = min(timeit.repeat(lambda: after(matrix, first_year, last_year, None), repeat=3,
+                                       number=args.repeat))
+        print(f'{name}: {matrix.values.shape[0]} years x {matrix.values.shape[1]} entities, {checks} checks; '
+              f'all entities per call: pivot {pivot_time / args.repeat * 1e3:.2f} ms -> slice '
+              f'{slice_time / args.repeat * 1e3:.3f} ms, with the heatmap {before_time / args.repeat * 1e3:.1f} ms '
+              f'-> {after_time / args.repeat * 1e3:.2f} ms')
+
+    if failures:
+        print(f'{failures} mismatches')
+        sys.exit(1)
+    print('all density slices match')
+
+
+if __name__ == '__main__':
+    main()
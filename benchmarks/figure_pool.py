@@ -0,0 +1,117 @@
+"""Compare callback throughput of gunicorn with and without the figure process pool at a fixed core count.
+
+Starts `gunicorn app:server --config gunicorn.conf.py` pinned to --cores CPUs in each configuration below,
+replays the first view of the GDP flat map, the figure the pool builds, from benchmarks/load_test.py against it
+with --concurrency clients and the figure cache off, and reports requests per second, p95 latency and
+no_update (204) answers per callback (Linux only, for the CPU pinning). The pool only pays off with more than
+one core: on one, its processes take CPU time from the worker they serve.
+
+- sync: one sync worker per core, figures built in the request (the default deployment)
+- gthread: one threaded worker per core, figures built in the request thread
+- gthread + pool: one threaded worker with a figure pool of one process per core
+
+    python benchmarks/figure_pool.py [--cores 2] [--concurrency 8] [--requests 40] [--scenario pie ...]
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from worker_memory import _free_port  # noqa: E402
+
+DEFAULT_SCENARIOS = ['flat map first view']
+
+
+def configurations(cores, threads, concurrency):
+    return [
+        ('sync', {'GUNICORN_WORKER_CLASS': 'sync', 'WEB_CONCURRENCY': str(cores), 'FIGURE_POOL_WORKERS': '0'}),
+        ('gthread', {'GUNICORN_WORKER_CLASS': 'gthread', 'WEB_CONCURRENCY': str(cores),
+                     'GUNICORN_THREADS': str(threads), 'FIGURE_POOL_WORKERS': '0'}),
+        ('gthread + pool', {'GUNICORN_WORKER_CLASS': 'gthread', 'WEB_CONCURRENCY': '1',
+                            'GUNICORN_THREADS': str(threads * cores), 'FIGURE_POOL_WORKERS': str(cores),
+                            # Room for every client's builds, so requests are measured rather than turned away
+                            'FIGURE_POOL_QUEUE': str(2 * concurrency)}),
+    ]
+
+
+def _wait_until_up(port, proc, timeout):
+    deadline = time.time() + timeout
+    while True:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/', timeout=30).read()
+            return
+        except OSError:
+            if time.time() > deadline or proc.poll() is not None:
+                raise RuntimeError('gunicorn did not start')
+            time.sleep(0.2)
+
+
+def measure(env_overrides, cores, args):
+    port = _free_port()
+    # Without the figure cache every first view builds the flat map
+    env = dict(os.environ, PORT=str(port), FIGURE_CACHE_BACKEND='memory', FIGURE_CACHE_SIZE='0', **env_overrides)
+    cpus = sorted(os.sched_getaffinity(0))[:cores]
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'app:server', '--config', 'gunicorn.conf.py'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        preexec_fn=lambda: os.sched_setaffinity(0, cpus),
+    )
+    try:
+        _wait_until_up(port, proc, timeout=120)
+        with tempfile.NamedTemporaryFile(suffix='.json') as out:
+            command = [sys.executable, str(ROOT / 'benchmarks' / 'load_test.py'),
+                       '--url', f'http://127.0.0.1:{port}', '--concurrency', str(args.concurrency),
+                       '--requests', str(args.requests), '--json', out.name]
+            for scenario in args.scenario or DEFAULT_SCENARIOS:
+                command += ['--scenario', scenario]
+            subprocess.run(command, cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+            return json.load(open(out.name))['results']
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cores', type=int, default=2)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=40, help='requests per callback and scenario')
+    parser.add_argument('--threads', type=int, default=4, help='threads per core of the gthread workers')
+    parser.add_argument('--scenario', action='append', help='load test scenarios to replay')
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    cores = min(args.cores, len(os.sched_getaffinity(0)))
+    if cores < args.cores:
+        print(f'only {cores} CPUs available, pinning to {cores}')
+
+    results = {}
+    for name, env in configurations(cores, args.threads, args.concurrency):
+        results[name] = measure(env, cores, args)
+
+    print(f"{'scenario':<32} {'callback':<24} {'configuration':<16} {'req/s':>8} {'p95 ms':>8} {'errors':>7} "
+          f"{'204s':>6}")
+    for name, rows in results.items():
+        for row in rows:
+            print(f"{row['scenario']:<32} {row['callback']:<24} {name:<16} {row['requests_per_second']:>8.1f} "
+                  f"{row['p95_ms']:>8.1f} {row['errors']:>7} {row['no_updates']:>6}")
+    for name, rows in results.items():
+        total = sum(row['requests'] for row in rows)
+        seconds = sum(row['requests'] / row['requests_per_second'] for row in rows)
+        print(f'{name}: {total / seconds:.1f} req/s overall')
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'cores': cores, 'concurrency': args.concurrency, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Compare plotly.express figure construction with the prebuilt FigureTemplate skeletons.
+
+For every templated chart of the GDP and Population pages and a sample of countries/regions, builds the
+figure both ways, checks that they serialize to the same JSON and times both. Exits with status 1 on any
+mismatch or when a template is less than --min-speedup times faster.
+
+    python benchmarks/figure_templates.py [--entities 20] [--repeat 5] [--min-speedup 5]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+from plotly.io.json import to_json_plotly
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def charts():
+    """Yield (chart name, entity index, px builder, template renderer) for every templated chart."""
+    import app  # noqa: F401  registers the pages and makes darkly the default plotly template
+    from utils.data_loader import widen
+    from utils.figures import xy
+
+    gdp = sys.modules['pages.GDP']
+    population = sys.modules['pages.Population']
+
+    for page, page_data in ((gdp, gdp.gdp_data()), (population, population.population_data())):
+        profiles = page_data.country_profiles
+        yield (
+            f'{page.__name__} country profile',
+            profiles.index,
+            lambda data, country, page=page, profiles=profiles: page.build_country_profile(
+                country, *profiles.series(country, 0, 9999)),
+            lambda data, country, page=page, profiles=profiles: page.country_profile_template.render(
+                [{'x': years, 'y': series[feature]} for years, series in [profiles.series(country, 0, 9999)]
+                 for feature in page.country_features], title={'text': country}),
+        )
+
+    yield (
+        'pages.GDP region line: GDP',
+        gdp.gdp_data().gdp_regions_index,
+        lambda data, region: gdp.build_gdp_line_plot(widen(data), region),
+        lambda data, region: gdp.gdp_line_template.render(
+            [xy(data, 'Year', 'GDP in current prices (millions of US dollars)')],
+            title={'text': f'GDP in Current Prices Over Time for {region}'}),
+    )
+    yield (
+        'pages.GDP region line: growth rate',
+        gdp.gdp_data().gdp_regions_index,
+        lambda data, region: gdp.build_growth_rate_line_plot(widen(data), region),
+        lambda data, region: gdp.growth_rate_line_template.render(
+            [xy(data, 'Year', 'GDP real rates of growth (percent)')],
+            title={'text': f'GDP Real Rates of Growth Over Time for {region}'}),
+    )
+    yield (
+        'pages.Population region bar',
+        population.population_data().regions_index,
+        lambda data, region: population.build_bar_plot(region, widen(data)),
+        lambda data, region: population.bar_template.render(
+            [xy(data, 'Year', column) for column in population.bar_columns],
+            title={'text': f'Population Distribution for {region}'}),
+    )
+
+
+def best_time(func, samples, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for data, entity in samples:
+            func(data, entity)
+        best = min(best, time.perf_counter() - start)
+    return best / len(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--entities', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--min-speedup', type=float, default=5.0)
+    args = parser.parse_args()
+
+    failures = 0
+    print(f"{'chart':<80} {'px ms':>8} {'template ms':>12} {'speedup':>8}")
+    for name, index, build, render in charts():
+        samples = [(index.rows(entity), entity) for entity in index.entities()[:args.entities]]
+        for data, entity in samples:
+            if to_json_plotly(build(data, entity).to_plotly_json()) != to_json_plotly(render(data, entity)):
+                failures += 1
+                print(f'MISMATCH {name} / {entity}')
+
+        before = best_time(build, samples, args.repeat)
+        after = best_time(render, samples, args.repeat)
+        speedup = before / after
+        if speedup < args.min_speedup:
+            failures += 1
+        print(f'{name:<80} {before * 1e3:>8.2f} {after * 1e3:>12.3f} {speedup:>7.0f}x')
+
+    if failures:
+        print(f'{failures} failures')
+        sys.exit(1)
+    print('all templated figures match')
+
+
+if __name__ == '__main__':
+    main()
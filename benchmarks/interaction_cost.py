@@ -0,0 +1,69 @@
+"""Requests and server CPU time per user interaction.
+
+For every scenario of benchmarks/load_test.py, sends the update-component requests one interaction
+triggers (one per callback listening to the changed property) and reports how many requests that is
+and the median process CPU time spent serving them over --interactions different values.
+
+    python benchmarks/interaction_cost.py [--interactions 30] [--scenario TEXT] [--json out.json]
+"""
+import argparse
+import itertools
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from load_test import SCENARIOS, TestClientTransport, _body, callback_requests, page_components, scenario_values  # noqa: E402,E501
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--interactions', type=int, default=30)
+    parser.add_argument('--scenario', action='append', help='only run scenarios containing this text')
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    import app as dash_app
+
+    server = dash_app.app.server
+    server.test_client().get('/')
+    components = page_components()
+    transport = TestClientTransport(server)
+
+    results = []
+    print(f"{'scenario':<32} {'requests':>9} {'cpu ms':>8} {'KB':>8}")
+    for scenario, _, changed, context in SCENARIOS:
+        if args.scenario and not any(text in scenario for text in args.scenario):
+            continue
+        templates = callback_requests(dash_app.app, components, changed)
+        values = list(itertools.islice(itertools.cycle(scenario_values(changed, components)), args.interactions))
+        interactions = [[_body(t, components, changed, value, context) for t in templates] for value in values]
+
+        total_bytes = 0
+        cpu_times = []
+        for bodies in interactions:
+            start = time.process_time()
+            for body in bodies:
+                total_bytes += transport.post(body)[1]
+            cpu_times.append(time.process_time() - start)
+        cpu = statistics.median(cpu_times)
+
+        result = {
+            'scenario': scenario,
+            'requests_per_interaction': len(templates),
+            'cpu_ms_per_interaction': cpu * 1e3,
+            'bytes_per_interaction': total_bytes / len(interactions),
+        }
+        results.append(result)
+        print(f"{scenario:<32} {len(templates):>9} {cpu * 1e3:>8.1f} {result['bytes_per_interaction'] / 1024:>8.1f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Microbenchmark of the "latest year per entity" precomputation and details-panel lookups.
+
+Compares the previous groupby + merge and boolean-mask lookups with utils.latest.LatestSnapshot on the
+population and GDP country tables replicated --scale times (100 by default) under distinct entity names.
+
+    python benchmarks/latest_snapshot.py [--scale 100] [--repeat 5]
+"""
+import argparse
+import sys
+import timeit
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.data_loader import ENTITY_COLUMN, load_dataset  # noqa: E402
+from utils.latest import LatestSnapshot  # noqa: E402
+
+
+def scaled(df, scale):
+    copies = []
+    for i in range(scale):
+        copy = df.copy()
+        copy[ENTITY_COLUMN] = copy[ENTITY_COLUMN].astype(str) + ('' if i == 0 else f' #{i}')
+        copies.append(copy)
+    result = pd.concat(copies, ignore_index=True)
+    result[ENTITY_COLUMN] = result[ENTITY_COLUMN].astype('category')
+    return result
+
+
+def groupby_merge(df):
+    latest_years = df.groupby(ENTITY_COLUMN, observed=True)['Year'].max().reset_index()
+    return pd.merge(df, latest_years, on=[ENTITY_COLUMN, 'Year'], how='inner')
+
+
+def best(func, repeat, number=1):
+    return min(timeit.repeat(func, repeat=repeat, number=number)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    for name in ('population_countries', 'gdp_countries'):
+        df = scaled(load_dataset(name), args.scale)
+        merged = groupby_merge(df)
+        snapshot = LatestSnapshot(df)
+        entities = list(snapshot.frame[ENTITY_COLUMN].iloc[::max(len(snapshot.frame) // 100, 1)])
+
+        build_old = best(lambda: groupby_merge(df), args.repeat)
+        build_new = best(lambda: LatestSnapshot(df), args.repeat)
+        lookup_old = best(lambda: [merged[merged[ENTITY_COLUMN] == e] for e in entities], args.repeat) / len(entities)
+        lookup_new = best(lambda: [snapshot.get(e) for e in entities], args.repeat) / len(entities)
+
+        print(f'{name}: {len(df):,} rows, {len(snapshot.frame):,} entities '
+              f'({len(merged) - len(snapshot.frame):,} duplicate rows from merge)')
+        print(f'  build   groupby+merge {build_old * 1e3:9.2f} ms   LatestSnapshot {build_new * 1e3:9.2f} ms')
+        print(f'  lookup  boolean mask  {lookup_old * 1e6:9.2f} us   LatestSnapshot {lookup_new * 1e6:9.2f} us')
+
+
+if __name__ == '__main__':
+    main()
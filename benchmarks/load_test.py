@@ -0,0 +1,278 @@
+"""Headless load test of the Dash callback endpoint.
+
+Replays realistic /_dash-update-component requests (country dropdowns, map clicks, year-slider drags,
+pie-year dropdowns and flat-map range changes) against app.server, either in-process through Flask's
+test client or against a running server (--url, e.g. a local gunicorn), and reports p50/p95/p99 latency,
+requests per second and response size for every callback a scenario triggers.
+
+--scale N multiplies the rows of every dataset by adding N-1 renamed copies of each country/region, so
+throughput can be measured on tables larger than the shipped extract.
+
+    python benchmarks/load_test.py [--requests 50] [--concurrency 1] [--scale 1] [--url URL] [--json out.json]
+"""
+import argparse
+import itertools
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# Interactions replayed by the load test: (scenario name, page path, property that changes,
+# values of other properties that differ from the layout defaults during the interaction).
+# "first view" scenarios replay the call the browser makes when the page loads, without a changed property.
+SCENARIOS = [
+    ('gdp country dropdown', '/gdp', 'country-dropdown.value', {}),
+    ('gdp map click', '/gdp', 'map.clickData', {}),
+    ('gdp country year slider', '/gdp', 'year-slider.value', {'country-dropdown.value': 'France'}),
+    ('gdp region dropdown', '/gdp', 'gdp-region-dropdown.value', {}),
+    ('gdp region year slider', '/gdp', 'gdp-year-slider.value', {'gdp-region-dropdown.value': 'Asia'}),
+    ('gdp pie year dropdown', '/gdp', 'gdp-pie-year-dropdown.value', {}),
+    ('gdp flat map year slider', '/gdp', 'flat-map-year-slider.value', {}),
+    ('gdp flat map first view', '/gdp', 'flat-map-year-slider.value', {}),
+    ('population country dropdown', '/population', 'country-dropdown1.value', {}),
+    ('population map click', '/population', 'map1.clickData', {}),
+    ('population country year slider', '/population', 'year-slider-country.value',
+     {'country-dropdown1.value': 'France'}),
+    ('population region dropdown', '/population', 'region-dropdown.value', {}),
+    ('population region year slider', '/population', 'year-slider-region.value', {'region-dropdown.value': 'Asia'}),
+    ('population pie year dropdown', '/population', 'pie-year-dropdown.value', {}),
+]
+
+# Dropdown/map values are drawn from the dropdown of the same page
+CLICK_SOURCES = {'map.clickData': 'country-dropdown', 'map1.clickData': 'country-dropdown1'}
+
+
+def scaled_data_dir(scale):
+    """Write copies of the datasets with every entity repeated scale times and return their directory."""
+    import pandas as pd
+
+    from utils.data_loader import DATASETS, ENTITY_COLUMN, load_dataset, widen
+
+    target = Path(tempfile.gettempdir()) / f'dash-load-test-scale-{scale}'
+    target.mkdir(exist_ok=True)
+    for name, filename in DATASETS.items():
+        path = target / filename
+        if path.exists():
+            continue
+        df = widen(load_dataset(name))
+        df[ENTITY_COLUMN] = df[ENTITY_COLUMN].astype(str)
+        copies = [df] + [df.assign(**{ENTITY_COLUMN: df[ENTITY_COLUMN] + f' #{i}'}) for i in range(1, scale)]
+        scaled = pd.concat(copies, ignore_index=True)
+        tmp = path.with_name(f'.{filename}')
+        if filename.endswith('.csv'):
+            scaled.to_csv(tmp, index=False)
+        else:
+            scaled.to_excel(tmp, index=False)
+        os.replace(tmp, path)
+    return target
+
+
+def _walk(component):
+    yield component
+    children = getattr(component, 'children', None)
+    if children is None:
+        return
+    for child in children if isinstance(children, (list, tuple)) else [children]:
+        if hasattr(child, 'to_plotly_json'):
+            yield from _walk(child)
+
+
+def page_components():
+    """Map every component id of every page layout to (page path, component)."""
+    import dash
+
+    components = {}
+    for page in dash.page_registry.values():
+        layout = page['layout']() if callable(page['layout']) else page['layout']
+        for component in _walk(layout):
+            component_id = getattr(component, 'id', None)
+            if isinstance(component_id, str):
+                components[component_id] = (page['path'], component)
+    return components
+
+
+def scenario_values(prop_id, components):
+    """Return the values cycled through for one input property."""
+    component_id, prop = prop_id.rsplit('.', 1)
+    if prop_id in CLICK_SOURCES:
+        countries = scenario_values(f'{CLICK_SOURCES[prop_id]}.value', components)
+        return [{'points': [{'location': country}]} for country in countries]
+    component = components[component_id][1]
+    if getattr(component, 'options', None):
+        return [option['value'] for option in component.options]
+    if getattr(component, 'marks', None):
+        # Slider drags: move one handle across every mark, then the other
+        years = sorted(int(year) for year in component.marks)
+        return [[first, years[-1]] for first in years] + [[years[0], last] for last in years[1:]]
+    return [getattr(component, prop, None)]
+
+
+def callback_requests(app, components, changed):
+    """Build the update-component request bodies the browser sends when the changed property updates."""
+    requests = []
+    for output, entry in app.callback_map.items():
+        inputs = [f"{i['id']}.{i['property']}" for i in entry['inputs'] if isinstance(i['id'], str)]
+        # Clientside callbacks run in the browser and send no request
+        if changed not in inputs or 'callback' not in entry:
+            continue
+        if output.startswith('..'):
+            outputs = [dict(zip(('id', 'property'), o.rsplit('.', 1))) for o in output[2:-2].split('...')]
+        else:
+            outputs = dict(zip(('id', 'property'), output.rsplit('.', 1)))
+        requests.append({
+            'name': entry['callback'].__name__,
+            'output': output,
+            'outputs': outputs,
+            'inputs': [{'id': i['id'], 'property': i['property']} for i in entry['inputs']],
+            'state': [{'id': s['id'], 'property': s['property']} for s in entry.get('state', [])],
+        })
+    return requests
+
+
+def _body(template, components, changed, value, context, first_view=False):
+    def current(item):
+        prop_id = f"{item['id']}.{item['property']}"
+        if prop_id == changed:
+            return value
+        if prop_id in context:
+            return context[prop_id]
+        return getattr(components[item['id']][1], item['property'], None) if item['id'] in components else None
+
+    return json.dumps({
+        'output': template['output'],
+        'outputs': template['outputs'],
+        'inputs': [dict(item, value=current(item)) for item in template['inputs']],
+        'state': [dict(item, value=current(item)) for item in template['state']],
+        'changedPropIds': [] if first_view else [changed],
+    }, default=lambda o: o.tolist())  # numpy values from the layouts
+
+
+class TestClientTransport:
+    def __init__(self, server):
+        self.server = server
+        self._local = threading.local()
+
+    def post(self, body):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.server.test_client()
+        response = client.post('/_dash-update-component', data=body, content_type='application/json')
+        return response.status_code, len(response.get_data())
+
+
+class HttpTransport:
+    def __init__(self, url):
+        self.url = url.rstrip('/') + '/_dash-update-component'
+
+    def post(self, body):
+        request = urllib.request.Request(self.url, data=body.encode(), headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                return response.status, len(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, len(e.read())
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(int(round(q / 100 * (len(ordered) - 1))), len(ordered) - 1)]
+
+
+def run(transport, bodies, concurrency):
+    """Send every body, return per-request latencies (seconds), sizes, statuses and the wall time."""
+    def send(body):
+        start = time.perf_counter()
+        status, size = transport.post(body)
+        return time.perf_counter() - start, size, status
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(send, bodies))
+    return results, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=50, help='requests per callback and scenario')
+    parser.add_argument('--concurrency', type=int, default=1, help='concurrent clients')
+    parser.add_argument('--scale', type=int, default=1, help='multiply the entities of every dataset')
+    parser.add_argument('--url', help='target a running server instead of an in-process test client')
+    parser.add_argument('--scenario', action='append', help='only run scenarios containing this text')
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    if args.scale > 1:
+        from utils import data_loader
+
+        data_loader.DATA_DIR = scaled_data_dir(args.scale)
+        data_loader.CACHE_DIR = str(data_loader.DATA_DIR / '.cache')
+
+    import app as dash_app
+
+    server = dash_app.app.server
+    # The first request lets dash register the page callbacks
+    server.test_client().get('/')
+    components = page_components()
+    transport = HttpTransport(args.url) if args.url else TestClientTransport(server)
+
+    results = []
+    print(f"{'scenario':<32} {'callback':<36} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8} {'KB':>8}")
+    for scenario, page, changed, context in SCENARIOS:
+        if args.scenario and not any(text in scenario for text in args.scenario):
+            continue
+        values = list(itertools.islice(itertools.cycle(scenario_values(changed, components)), args.requests))
+        for template in callback_requests(dash_app.app, components, changed):
+            bodies = [_body(template, components, changed, value, context, scenario.endswith('first view'))
+                      for value in values]
+            samples, wall = run(transport, bodies, args.concurrency)
+            latencies = [latency for latency, _, status in samples if status in (200, 204)]
+            errors = len(samples) - len(latencies)
+            if not latencies:
+                print(f'{scenario:<32} {template["name"]:<36} all {errors} requests failed')
+                continue
+            result = {
+                'scenario': scenario,
+                'page': page,
+                'changed': changed,
+                'callback': template['name'],
+                'output': template['output'],
+                'requests': len(samples),
+                'errors': errors,
+                'no_updates': sum(status == 204 for _, _, status in samples),
+                'p50_ms': percentile(latencies, 50) * 1e3,
+                'p95_ms': percentile(latencies, 95) * 1e3,
+                'p99_ms': percentile(latencies, 99) * 1e3,
+                'mean_ms': statistics.fmean(latencies) * 1e3,
+                'requests_per_second': len(samples) / wall,
+                'mean_response_bytes': statistics.fmean(size for _, size, _ in samples),
+            }
+            results.append(result)
+            print(f"{scenario:<32} {template['name']:<36} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} "
+                  f"{result['p99_ms']:>8.2f} {result['requests_per_second']:>8.1f} "
+                  f"{result['mean_response_bytes'] / 1024:>8.1f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'config': {
+                    'requests': args.requests,
+                    'concurrency': args.concurrency,
+                    'scale': args.scale,
+                    'target': args.url or 'test-client',
+                    'timestamp': time.time(),
+                },
+                'results': results,
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""Compare callback response serialization: bytes on the wire and encode time.
+
+Captures the responses of update_map and update_flat_map (first call with the full figure and a later call
+returning a patch) on both pages, then encodes each with plotly's json engine, plotly's orjson engine
+(what dash uses when orjson is installed), the fast orjson encoder of utils/serialization.py and the fast
+encoder with typed arrays. The app only uses typed arrays when the bundled plotly.js decodes them, so here
+they are decoded back and checked against the plain JSON. Exits with status 1 on any mismatch.
+
+    python benchmarks/serialization.py [--repeat 20]
+"""
+import argparse
+import base64
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from plotly.io.json import to_json_plotly
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from load_test import _body, callback_requests, page_components  # noqa: E402
+from utils.serialization import TYPED_ARRAY_DTYPES, to_json  # noqa: E402
+
+TYPED_ARRAY_NAMES = {short: name for name, short in TYPED_ARRAY_DTYPES.items()}
+
+# (label, changed property, callback name, value of the changed property; None for the initial call)
+CALLS = [
+    ('gdp update_map initial', 'country-dropdown.value', 'update_map', None),
+    ('gdp update_map patch', 'country-dropdown.value', 'update_map', 'France'),
+    ('population update_map initial', 'country-dropdown1.value', 'update_map', None),
+    ('population update_map patch', 'country-dropdown1.value', 'update_map', 'France'),
+    ('gdp update_flat_map initial', 'flat-map-year-slider.value', 'update_flat_map', None),
+    ('gdp update_flat_map patch', 'flat-map-year-slider.value', 'update_flat_map', [2010, 2015]),
+]
+
+
+def capture_responses():
+    """Send every call through the test client and return the response objects dash serialized."""
+    import dash._callback
+
+    import app as dash_app
+
+    server = dash_app.app.server
+    client = server.test_client()
+    client.get('/')
+    components = page_components()
+
+    captured = []
+    to_json = dash._callback.to_json
+
+    def capturing_to_json(obj):
+        captured.append(obj)
+        return to_json(obj)
+
+    dash._callback.to_json = capturing_to_json
+    try:
+        responses = {}
+        for label, changed, name, value in CALLS:
+            template = next(t for t in callback_requests(dash_app.app, components, changed) if t['name'] == name)
+            if value is None:
+                # Initial call: every input at its layout value and nothing changed
+                body = json.loads(_body(template, components, '', None, {}))
+                body['changedPropIds'] = []
+            else:
+                body = json.loads(_body(template, components, changed, value, {}))
+            captured.clear()
+            client.post('/_dash-update-component', json=body)
+            responses[label] = captured[-1]
+    finally:
+        dash._callback.to_json = to_json
+    return responses
+
+
+def decode_typed_arrays(obj):
+    """Replace typed-array specs by the plain JSON of their values."""
+    if isinstance(obj, dict):
+        if 'bdata' in obj and set(obj) <= {'dtype', 'bdata', 'shape'}:
+            dtype = np.dtype(TYPED_ARRAY_NAMES[obj['dtype']]).newbyteorder('<')
+            values = np.frombuffer(base64.b64decode(obj['bdata']), dtype=dtype)
+            if 'shape' in obj:
+                values = values.reshape([int(size) for size in obj['shape'].split(',')])
+            return json.loads(to_json_plotly(values, engine='json'))
+        return {key: decode_typed_arrays(value) for key, value in obj.items()}
+    if isinstance(obj, list):
+        return [decode_typed_arrays(value) for value in obj]
+    return obj
+
+
+def best_time(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    encoders = [
+        ('json', lambda obj: to_json_plotly(obj, engine='json')),
+        ('plotly orjson', lambda obj: to_json_plotly(obj, engine='orjson')),
+        ('fast', lambda obj: to_json(obj)),
+        ('fast + typed arrays', lambda obj: to_json(obj, typed_arrays=True)),
+    ]
+
+    failures = 0
+    print(f"{'response':<32} {'encoder':<20} {'KB':>8} {'ms':>8}")
+    for label, response in capture_responses().items():
+        expected = json.loads(encoders[0][1](response))
+        for name, encode in encoders:
+            encoded = encode(response)
+            if decode_typed_arrays(json.loads(encoded)) != expected:
+                failures += 1
+                print(f'MISMATCH {label} / {name}')
+            seconds = best_time(lambda: encode(response), args.repeat)
+            print(f'{label:<32} {name:<20} {len(encoded.encode()) / 1024:>8.1f} {seconds * 1e3:>8.2f}')
+
+    if failures:
+        print(f'{failures} mismatches')
+        sys.exit(1)
+    print('all encodings match')
+
+
+if __name__ == '__main__':
+    main()
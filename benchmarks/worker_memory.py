@@ -0,0 +1,121 @@
+"""Compare per-worker memory of the gunicorn deployment for 1, 4 and 16 workers.
+
+Starts `gunicorn app:server --config gunicorn.conf.py` with and without preloading, waits for every
+worker to serve requests, then reads RSS/PSS/USS for each worker from /proc/<pid>/smaps_rollup (Linux only).
+PSS is the number to watch: shared pages are divided between the processes that map them.
+
+    python benchmarks/worker_memory.py [--workers 1 4 16] [--json results.json]
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _children(pid):
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == pid:
+            children.append(int(entry))
+    return children
+
+
+def _memory_kb(pid):
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            key, _, rest = line.partition(':')
+            if key in ('Rss', 'Pss', 'Private_Clean', 'Private_Dirty'):
+                values[key] = int(rest.split()[0])
+    return {
+        'rss': values['Rss'],
+        'pss': values['Pss'],
+        'uss': values['Private_Clean'] + values['Private_Dirty'],
+    }
+
+
+def measure(workers, preload, timeout=120):
+    port = _free_port()
+    env = dict(os.environ, PORT=str(port), WEB_CONCURRENCY=str(workers), GUNICORN_PRELOAD='1' if preload else '0')
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'app:server', '--config', 'gunicorn.conf.py'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.time() + timeout
+        while len(_children(proc.pid)) < workers:
+            if time.time() > deadline or proc.poll() is not None:
+                raise RuntimeError(f'gunicorn did not start {workers} workers')
+            time.sleep(0.2)
+        # Hit every page a few times per worker so each has built its layouts
+        for _ in range(workers * 2):
+            for path in ('/', '/gdp', '/population'):
+                while True:
+                    try:
+                        urllib.request.urlopen(f'http://127.0.0.1:{port}{path}', timeout=30).read()
+                        break
+                    except OSError:
+                        if time.time() > deadline:
+                            raise
+                        time.sleep(0.2)
+        per_worker = [_memory_kb(pid) for pid in _children(proc.pid)]
+        master = _memory_kb(proc.pid)
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait(timeout=30)
+
+    def mean(key):
+        return sum(w[key] for w in per_worker) / len(per_worker)
+
+    return {
+        'workers': workers,
+        'preload': preload,
+        'master_rss_kb': master['rss'],
+        'worker_rss_kb': round(mean('rss')),
+        'worker_pss_kb': round(mean('pss')),
+        'worker_uss_kb': round(mean('uss')),
+        'total_pss_kb': master['pss'] + sum(w['pss'] for w in per_worker),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    results = [measure(n, preload) for preload in (False, True) for n in args.workers]
+
+    print(f"{'preload':>8} {'workers':>8} {'rss/worker':>12} {'pss/worker':>12} {'uss/worker':>12} {'total pss':>12}")
+    for r in results:
+        print(f"{str(r['preload']):>8} {r['workers']:>8} {r['worker_rss_kb'] / 1024:>10.1f}MB "
+              f"{r['worker_pss_kb'] / 1024:>10.1f}MB {r['worker_uss_kb'] / 1024:>10.1f}MB "
+              f"{r['total_pss_kb'] / 1024:>10.1f}MB")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+# Gunicorn configuration, picked up by `gunicorn app:server` (see Procfile)
+import gc
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', '2'))
+
+# With FIGURE_POOL_WORKERS > 0 heavy figures are built in a process pool of each worker (utils/figure_pool.py).
+# A sync worker would sit idle while its figure is built, so the pool comes with threaded workers by default:
+# their other threads keep serving requests meanwhile. gevent also works (pip install gevent).
+figure_pool_workers = int(os.environ.get('FIGURE_POOL_WORKERS', '0'))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread' if figure_pool_workers else 'sync')
+threads = int(os.environ.get('GUNICORN_THREADS', '4' if worker_class == 'gthread' else '1'))
+
+# Load app.py (and with it every page's datasets) once in the master process. Workers are forked
+# from it and share the loaded tables copy-on-write; the frames are backed by read-only memory-mapped
+# arrays from the data cache, so workers never write to those pages and RSS stays flat per worker.
+# Set GUNICORN_PRELOAD=0 to go back to loading the app separately in every worker.
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') != '0'
+
+
+def when_ready(server):
+    if preload_app:
+        # Pages load their data lazily; build it in the master so the workers share one copy
+        from utils.figure_pool import figure_pool
+        from utils.lazy import prime_all
+
+        # The layouts embed figures; build them here instead of forking a figure pool from the master
+        with figure_pool.in_process():
+            prime_all()
+        # Move everything allocated while preloading into the permanent GC generation, so the collector
+        # running in a worker does not touch (and therefore copy) the objects shared with the master.
+        gc.freeze()
+
+
+def post_worker_init(worker):
+    from app import server
+    from utils.data_manager import WATCH_INTERVAL, data_manager
+    from utils.figure_pool import figure_pool
+
+    # Dash registers the page callbacks on the first request it serves; serve one now, before the worker
+    # starts its request threads, so concurrent first requests never find the callbacks missing
+    server.test_client().get('/')
+    # Fork the figure pool now that the app is loaded
+    figure_pool.start()
+    # Threads do not survive the fork from the master, so every worker watches the data files itself
+    data_manager.watch(WATCH_INTERVAL)
+
+
+def worker_exit(server, worker):
+    from utils.figure_pool import figure_pool
+
+    figure_pool.close()
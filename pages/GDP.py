@@ -1,278 +1,372 @@
 import dash
-from dash import dcc, html, callback
+from dash import dcc, html, callback, ctx, Patch, clientside_callback, ClientsideFunction
 from dash.dependencies import Input, Output, State
 import plotly.express as px
-import pandas as pd
-
-# Register the page
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+from utils.aggregates import MetricCube
+from utils.clientside import filtering_callback, register_session_store, session_store
+from utils.coalesce import coalesce, raise_if_stale
+from utils.data_loader import widen
+from utils.data_manager import DataView, data_manager
+from utils.entity_index import EntityIndex, EntityProfiles
+from utils.figure_cache import figure_cache
+from utils.figure_patch import apply_country_selection
+from utils.figure_pool import figure_pool
+from utils.figures import FigureTemplate, xy
+from utils.latest import LatestSnapshot
+from utils.metrics import lap
+from utils.snapshots import LayoutSnapshot
+from utils.startup_profile import span
+
+# Register the page; its data and layout are built on the first request that needs them, and again for every new
+# version of the datasets (see utils/data_manager.py)
 dash.register_page(__name__, path='/gdp', name='GDP 💲')
 
-# Load the datasets
-df_gdp_countries = pd.read_excel(
-    'https://github.com/TouradBaba/exploratory_data_analysis_and_visualization/raw/master/data/cleaned_gdp.xlsx')
-df_gdp_regions = pd.read_excel(
-    'https://github.com/TouradBaba/exploratory_data_analysis_and_visualization/raw/master/data/cleaned_gdp2.xlsx')
-# Convert 'GDP in current prices (millions of US dollars)' to numeric, coercing errors
-df_gdp_countries['GDP in current prices (millions of US dollars)'] = (
-    pd.to_numeric(df_gdp_countries['GDP in current prices (millions of US dollars)'], errors='coerce'))
-df_gdp_regions['GDP in current prices (millions of US dollars)'] = (
-    pd.to_numeric(df_gdp_regions['GDP in current prices (millions of US dollars)'], errors='coerce'))
+# Initial figures rendered by scripts/build_snapshots.py, embedded in the layout when they are up to date
+snapshot = LayoutSnapshot('gdp', ['gdp_countries', 'gdp_regions'])
 
-# Find the latest year for each country
-latest_years_countries = df_gdp_countries.groupby('Region/Country/Area')['Year'].max().reset_index()
+flat_map_features = ['GDP in current prices (millions of US dollars)',
+                     'GDP per capita (US dollars)',
+                     'GDP real rates of growth (percent)']
 
-# Merge to get the latest data for each country
-latest_data_gdp_countries = pd.merge(df_gdp_countries, latest_years_countries, on=['Region/Country/Area', 'Year'],
-                                     how='inner')
 
-# Get unique countries and regions for dropdown options
-countries = latest_data_gdp_countries['Region/Country/Area'].unique()
-regions = df_gdp_regions['Region/Country/Area'].unique()
+class GDPData:
+    """The GDP datasets of a data version and the lookup structures the callbacks precompute from them.
 
-# Available years for the flat map
-available_years_countries = df_gdp_countries['Year'].unique()
-available_years_regions = df_gdp_regions['Year'].unique()
+    Structures derived from one dataset are reused by the next version if its file did not change.
+    """
 
-# Define combined app layout with custom styling
-layout = html.Div(
-    className='container-fluid',
-    children=[
-        html.Div(
-            className='jumbotron bg-dark text-white',
-            children=[
-                html.H1("GDP Data Dashboard", className='display-4', style={'fontSize': '3rem', 'textAlign': 'center'}),
-                html.P(
-                    "Explore GDP data over time by selecting a country or region.",
-                    className='lead smaller-text', style={'textAlign': 'center'}
-                )
-            ]
-        ),
-        html.Hr(className='my-4'),
-
-        html.Div(
-            className='row',
-            children=[
-                html.Div(
-                    className='col-md-6 map-container',
-                    children=[
-                        dcc.Graph(id='map', config={'scrollZoom': True})
-                    ]
-                ),
-                html.Div(
-                    className='col-md-6 details-container bg-light p-3',
-                    children=[
-                        html.Div(id='country-details', className='details'),
-                        html.Hr(style={'backgroundColor': 'black'}),
-                        dcc.Dropdown(
-                            id='country-dropdown',
-                            options=[{'label': country, 'value': country} for country in countries],
-                            placeholder="Select a country",
-                            className='mb-3'
-                        ),
-                        html.Div(
-                            dcc.RangeSlider(
-                                id='year-slider',
-                                min=1995,
-                                max=2020,
-                                value=[1995, 2020],
-                                marks={str(year): str(year) for year in df_gdp_countries['Year'].unique()},
-                                step=None,
-                                className='mb-3'
-                            ),
-                            style={'marginTop': '20px'}
-                        ),
-                        html.Div(
-                            id='line-charts-container',
-                            className='line-charts-container',
-                            style={'display': 'flex', 'flexDirection': 'row', 'flexWrap': 'wrap'}
-                        )
-                    ]
-                )
-            ]
-        ),
+    def __init__(self):
+        # Load the datasets
+        data = data_manager.current()
+        self.df_gdp_countries = data.frame('gdp_countries')
+        self.df_gdp_regions = data.frame('gdp_regions')
+
+        # Get the latest data for each country
+        with span('GDP latest snapshot', 'precompute'):
+            self.latest_gdp_countries = data.derive('GDP latest snapshot', ['gdp_countries'],
+                                                    lambda: LatestSnapshot(self.df_gdp_countries))
+            self.latest_data_gdp_countries = self.latest_gdp_countries.frame
+
+        # Index rows by country/region so callbacks can look up year ranges without scanning the tables
+        with span('GDP entity indexes', 'precompute'):
+            self.gdp_countries_index = data.derive('GDP countries index', ['gdp_countries'],
+                                                   lambda: EntityIndex(self.df_gdp_countries))
+            self.gdp_regions_index = data.derive('GDP regions index', ['gdp_regions'],
+                                                 lambda: EntityIndex(self.df_gdp_regions))
+
+        # Every country's indicator series as arrays, for the country profile charts
+        with span('GDP country profiles', 'precompute'):
+            self.country_profiles = data.derive('GDP country profiles', ['gdp_countries'],
+                                                lambda: EntityProfiles(self.gdp_countries_index, country_features))
+
+        # Country order and color values of the globe's single trace, used to patch it on selection
+        self.map_locations = self.latest_data_gdp_countries['Region/Country/Area'].to_numpy()
+        self.map_values = self.latest_gdp_countries.column('GDP in current prices (millions of US dollars)')
 
-        html.Hr(className='my-4'),
+        # Year x region totals read by the pie and bar charts
+        with span('GDP metric cubes', 'precompute'):
+            self.gdp_regions_cube = data.derive(
+                'GDP regions cube', ['gdp_regions'],
+                lambda: MetricCube(self.df_gdp_regions, 'GDP in current prices (millions of US dollars)'))
+            self.gdp_per_capita_regions_cube = data.derive(
+                'GDP per capita regions cube', ['gdp_regions'],
+                lambda: MetricCube(self.df_gdp_regions, 'GDP per capita (US dollars)'))
 
-        html.Div(
-            className='row',
-            children=[
-                html.Div(
-                    className='col-md-6',
-                    children=[
-                        html.Div(
+        # Get unique countries and regions for dropdown options
+        self.countries = self.latest_data_gdp_countries['Region/Country/Area'].unique()
+        self.regions = self.df_gdp_regions['Region/Country/Area'].unique()
+
+        # Available years and countries for the flat map
+        self.available_years_countries = self.df_gdp_countries['Year'].unique()
+        self.flat_map_years = sorted(int(year) for year in self.available_years_countries)
+        self.flat_map_countries = self.gdp_countries_index.entities()
+        self.available_years_regions = self.df_gdp_regions['Year'].unique()
+
+gdp_data = DataView(GDPData, 'GDP data')
+
+
+# Define combined app layout with custom styling
+def build_page_layout():
+    page_data = gdp_data()
+    df_gdp_countries, df_gdp_regions = page_data.df_gdp_countries, page_data.df_gdp_regions
+    countries, regions = page_data.countries, page_data.regions
+    available_years_countries = page_data.available_years_countries
+
+    return snapshot.apply(html.Div(
+        className='container-fluid',
+        children=[
+            html.Div(
+                className='jumbotron bg-dark text-white',
+                children=[
+                    html.H1("GDP Data Dashboard", className='display-4',
+                            style={'fontSize': '3rem', 'textAlign': 'center'}),
+                    html.P(
+                        "Explore GDP data over time by selecting a country or region.",
+                        className='lead smaller-text', style={'textAlign': 'center'}
+                    )
+                ]
+            ),
+            html.Hr(className='my-4'),
+
+            html.Div(
+                className='row',
+                children=[
+                    html.Div(
+                        className='col-md-6 map-container',
+                        children=[
+                            dcc.Graph(id='map', figure=build_map(), config={'scrollZoom': True})
+                        ]
+                    ),
+                    html.Div(
+                        className='col-md-6 details-container bg-light p-3',
+                        children=[
+                            html.Div(id='country-details', className='details'),
+                            html.Hr(style={'backgroundColor': 'black'}),
                             dcc.Dropdown(
-                                id='gdp-pie-year-dropdown',
-                                options=[{'label': year, 'value': year} for year in df_gdp_regions['Year'].unique()],
-                                value=2021,
-                                placeholder="Select a year",
+                                id='country-dropdown',
+                                options=[{'label': country, 'value': country} for country in countries],
+                                placeholder="Select a country",
                                 className='mb-3'
+                            ),
+                            html.Div(
+                                dcc.RangeSlider(
+                                    id='year-slider',
+                                    min=1995,
+                                    max=2020,
+                                    value=[1995, 2020],
+                                    marks={str(year): str(year) for year in df_gdp_countries['Year'].unique()},
+                                    step=None,
+                                    className='mb-3'
+                                ),
+                                style={'marginTop': '20px'}
+                            ),
+                            html.Div(
+                                id='line-charts-container',
+                                className='line-charts-container',
+                                style={'display': 'flex', 'flexDirection': 'row', 'flexWrap': 'wrap'}
                             )
-                        ),
-                        html.Div(
-                            dcc.Graph(id='gdp-pie-chart', config={'displayModeBar': False})
-                        ),
-                        html.Div(
-                            dcc.Graph(id='gdp-per-capita-bar-chart', config={'displayModeBar': False})
-                        ),
-                    ]
-                ),
-                html.Div(
-                    className='col-md-6',
-                    children=[
-                        html.Div(
-                            dcc.Dropdown(
-                                id='gdp-region-dropdown',
-                                options=[{'label': region, 'value': region} for region in regions],
-                                placeholder="Select a region",
-                                className='mb-3'
+                        ]
+                    )
+                ]
+            ),
+
+            html.Hr(className='my-4'),
+
+            html.Div(
+                className='row',
+                children=[
+                    html.Div(
+                        className='col-md-6',
+                        children=[
+                            html.Div(
+                                dcc.Dropdown(
+                                    id='gdp-pie-year-dropdown',
+                                    options=[{'label': year, 'value': year}
+                                             for year in df_gdp_regions['Year'].unique()],
+                                    value=2021,
+                                    placeholder="Select a year",
+                                    className='mb-3'
+                                )
                             ),
-                            style={'marginBottom': '20px', 'marginLeft': '20px', 'marginRight': '20px'}
-                        ),
-                        html.Div(
-                            dcc.RangeSlider(
-                                id='gdp-year-slider',
-                                min=df_gdp_regions['Year'].min(),
-                                max=df_gdp_regions['Year'].max(),
-                                value=[df_gdp_regions['Year'].min(), df_gdp_regions['Year'].max()],
-                                marks={str(year): str(year) for year in df_gdp_regions['Year'].unique()},
-                                step=None,
-                                className='mb-3'
+                            html.Div(
+                                dcc.Graph(id='gdp-pie-chart', config={'displayModeBar': False})
                             ),
-                            style={'marginTop': '20px'}
-                        ),
-                        html.Div(
-                            id='gdp-line-plots-container',
-                            children=[
-                                dcc.Graph(id='gdp-line-plot', style={'height': '500px'}),
-                                dcc.Graph(id='growth-rate-line-plot', style={'height': '500px'})
-                            ],
-                            style={'marginTop': '20px'}
-                        )
-                    ]
-                )
-            ]
-        ),
+                            html.Div(
+                                dcc.Graph(id='gdp-per-capita-bar-chart', config={'displayModeBar': False})
+                            ),
+                        ]
+                    ),
+                    html.Div(
+                        className='col-md-6',
+                        children=[
+                            html.Div(
+                                dcc.Dropdown(
+                                    id='gdp-region-dropdown',
+                                    options=[{'label': region, 'value': region} for region in regions],
+                                    placeholder="Select a region",
+                                    className='mb-3'
+                                ),
+                                style={'marginBottom': '20px', 'marginLeft': '20px', 'marginRight': '20px'}
+                            ),
+                            html.Div(
+                                dcc.RangeSlider(
+                                    id='gdp-year-slider',
+                                    min=df_gdp_regions['Year'].min(),
+                                    max=df_gdp_regions['Year'].max(),
+                                    value=[df_gdp_regions['Year'].min(), df_gdp_regions['Year'].max()],
+                                    marks={str(year): str(year) for year in df_gdp_regions['Year'].unique()},
+                                    step=None,
+                                    className='mb-3'
+                                ),
+                                style={'marginTop': '20px'}
+                            ),
+                            html.Div(
+                                id='gdp-line-plots-container',
+                                children=[
+                                    dcc.Graph(id='gdp-line-plot', style={'height': '500px'}),
+                                    dcc.Graph(id='growth-rate-line-plot', style={'height': '500px'})
+                                ],
+                                style={'marginTop': '20px'}
+                            )
+                        ]
+                    )
+                ]
+            ),
+
+            html.Hr(className='my-4'),
+
+            html.Div(
+                className='row',
+                children=[
+                    html.P(
+                        "The map below presents a global view of GDP data across various countries. "
+                        "Use the play button to animate changes over time, or adjust the slider to focus on specific years.",
+                        className='lead', style={'fontSize': 25, 'color': '#FFFFFF'}
+                    ),
+                    html.Div(
+                        className='col-md-12 flat-map-container',
+                        children=[
+                            html.Div(
+                                className='d-flex justify-content-between align-items-center',
+                                children=[
+                                    html.Div([
+                                        html.Button('Play', id='play-button', n_clicks=0,
+                                                    className='btn btn-primary ml-2 btn-lg'),
+                                    ]),
+                                    html.Div([
+                                        dcc.RangeSlider(
+                                            id='flat-map-year-slider',
+                                            min=available_years_countries.min(),
+                                            max=available_years_countries.max(),
+                                            value=[available_years_countries.min(), available_years_countries.max()],
+                                            marks={str(year): str(year) for year in available_years_countries},
+                                            step=None,
+                                            className='mb-3'
+                                        ),
+                                    ], style={'marginTop': '20px', 'flex': '1', 'marginLeft': '20px'}),
+                                ]
+                            ),
+                            dcc.Graph(id='flat-map'),
+                        ],
+                        style={'height': '400px', 'marginBottom': '20px'}
+                    )
+                ]
+            ),
+            *session_store('gdp-client-data')
+        ]
+    ))
+
+
+page_layout = DataView(build_page_layout, 'GDP layout', kind='layout')
 
-        html.Hr(className='my-4'),
-
-        html.Div(
-            className='row',
-            children=[
-                html.P(
-                    "The map below presents a global view of GDP data across various countries. "
-                    "Use the play button to animate changes over time, or adjust the slider to focus on specific years.",
-                    className='lead', style={'fontSize': 25, 'color': '#FFFFFF'}
-                ),
-                html.Div(
-                    className='col-md-12 flat-map-container',
-                    children=[
-                        html.Div(
-                            className='d-flex justify-content-between align-items-center',
-                            children=[
-                                html.Div([
-                                    html.Button('Play', id='play-button', n_clicks=0,
-                                                className='btn btn-primary ml-2 btn-lg'),
-                                ]),
-                                html.Div([
-                                    dcc.RangeSlider(
-                                        id='flat-map-year-slider',
-                                        min=available_years_countries.min(),
-                                        max=available_years_countries.max(),
-                                        value=[available_years_countries.min(), available_years_countries.max()],
-                                        marks={str(year): str(year) for year in available_years_countries},
-                                        step=None,
-                                        className='mb-3'
-                                    ),
-                                ], style={'marginTop': '20px', 'flex': '1', 'marginLeft': '20px'}),
-                            ]
-                        ),
-                        dcc.Graph(id='flat-map'),
-                        dcc.Interval(
-                            id='interval-component',
-                            interval=1000,  # in milliseconds
-                            n_intervals=0,
-                            disabled=True  # Start with the interval disabled
-                        ),
-                    ],
-                    style={'height': '400px', 'marginBottom': '20px'}
-                )
-            ]
-        )
-    ]
-)
+
+def layout(**_):
+    return page_layout()
 
 
 # Callback to update the line charts and country details based on dropdown or map selection
-@callback(
+@filtering_callback(
+    'countryProfile', 'gdp-client-data',
     [Output('line-charts-container', 'children'),
      Output('country-details', 'children'),
      Output('country-dropdown', 'value')],
     [Input('country-dropdown', 'value'),
      Input('map', 'clickData'),
      Input('year-slider', 'value')],
-    [State('country-dropdown', 'value')]
+    [State('country-dropdown', 'value')],
+    prevent_initial_call=snapshot.available
 )
+@coalesce
 def update_line_charts_and_details(country, clickData, selected_years, current_dropdown_value):
     triggered_by = dash.callback_context.triggered[0]['prop_id'].split('.')[0]
 
     if triggered_by == 'map' and clickData is not None:
         country = clickData['points'][0]['location']
 
+    page_data = gdp_data()
     line_chart_figures = []
     country_details = html.P("Click on a country to see details.", className='placeholder-text')
 
     if country:
-        selected_data_chart = df_gdp_countries[(df_gdp_countries['Region/Country/Area'] == country) &
-                                     (df_gdp_countries['Year'] >= selected_years[0]) & (df_gdp_countries['Year'] <= selected_years[1])]
+        years, series = page_data.country_profiles.series(country, selected_years[0], selected_years[1])
+        lap('filter')
+
+        if len(years):
+            raise_if_stale()
+            # One figure with a line chart per feature, filled from the country's precomputed series
+            profile_figure = country_profile_template.render(
+                [{'x': years, 'y': series[feature]} for feature in country_features], title={'text': country})
+            line_chart_figures.append(dcc.Graph(figure=profile_figure, style={'width': '100%'}))
+
+            latest_data_country = page_data.latest_gdp_countries.get(country)
+            if latest_data_country is not None:
+                detail_lines = country_detail_lines(latest_data_country)
+                country_details = html.Div([
+                    html.H3(f"{country}", className='country-name'),
+                    *(html.P(text, className=class_name) for text, class_name in detail_lines)
+                ], className='country-details')
 
-        if not selected_data_chart.empty:
-            # Line plot for each feature
-            features = ['GDP in current prices (millions of US dollars)',
-                        'GDP per capita (US dollars)',
-                        'GDP real rates of growth (percent)']
+    lap('figure')
+    return line_chart_figures, country_details, country
 
-            for feature in features:
-                if selected_data_chart[feature].isnull().all():
-                    continue  # Skip this feature if all values are NaN
 
-                line_chart_figure = px.line(selected_data_chart, x='Year', y=feature,
-                                            labels={'Year': 'Year', 'Value': feature})
+def country_detail_lines(latest_data_country):
+    gdp = latest_data_country['GDP in current prices (millions of US dollars)']
+    latest_year_country = latest_data_country['Year']
+    return [(f"GDP: ${gdp} million", 'country-population'),
+            (f"Year: {latest_year_country}", 'country-year')]
 
-                line_chart_figure.update_layout(title=f'{country} {feature}',
-                                                xaxis_title='Year',
-                                                yaxis_title=feature,
-                                                margin=dict(l=20, r=20, t=40, b=20),
-                                                height=300)
 
-                line_chart_figures.append(dcc.Graph(figure=line_chart_figure, style={'height': '300px', 'width': '50%'}))
+def build_country_profile(country, years, series):
+    # Two line charts per row, one per feature; a feature without data leaves its chart empty
+    rows = -(-len(country_features) // 2)
+    profile_figure = make_subplots(rows=rows, cols=2, subplot_titles=country_features, horizontal_spacing=0.1,
+                                   vertical_spacing=0.25 / rows)
+    for i, feature in enumerate(country_features):
+        profile_figure.add_trace(go.Scatter(x=years, y=series[feature], mode='lines', name=feature,
+                                            hovertemplate=f'Year=%{{x}}<br>{feature}=%{{y}}<extra></extra>'),
+                                 row=i // 2 + 1, col=i % 2 + 1)
 
-            latest_data_country = latest_data_gdp_countries[latest_data_gdp_countries['Region/Country/Area'] == country]
-            if not latest_data_country.empty:
-                gdp = latest_data_country['GDP in current prices (millions of US dollars)'].values[0]
-                latest_year_country = latest_data_country['Year'].values[0]
+    profile_figure.update_annotations(font_size=13)
+    profile_figure.update_layout(title=country,
+                                 showlegend=False,
+                                 margin=dict(l=20, r=20, t=80, b=20),
+                                 height=300 * rows)
+    return profile_figure
 
-                country_details = html.Div([
-                    html.H3(f"{country}", className='country-name'),
-                    html.P(f"GDP: ${gdp} million", className='country-population'),
-                    html.P(f"Year: {latest_year_country}", className='country-year')
-                ], className='country-details')
 
-    return line_chart_figures, country_details, country
+country_features = ['GDP in current prices (millions of US dollars)',
+                    'GDP per capita (US dollars)',
+                    'GDP real rates of growth (percent)']
+
+# The country profile is filled into a prebuilt skeleton instead of being laid out per request
+country_profile_template = FigureTemplate(
+    lambda: build_country_profile('', *gdp_data().country_profiles.series(None, 0, 0)))
 
 
-# Callback to update the map based on country selection
+# Callback to update the map based on country selection. The layout carries the whole globe, so a selection
+# only patches its color values and rotation (the renderer may drop this callback's initial call, so it has none)
 @callback(
     Output('map', 'figure'),
-    [Input('country-dropdown', 'value')]
+    [Input('country-dropdown', 'value')],
+    prevent_initial_call=True
 )
 def update_map(selected_country):
-    if selected_country:
-        selected_data_map = latest_data_gdp_countries[latest_data_gdp_countries['Region/Country/Area'] == selected_country]
-    else:
-        selected_data_map = latest_data_gdp_countries
+    page_data = gdp_data()
+    map_figure = apply_country_selection(Patch(), page_data.map_locations, page_data.map_values,
+                                         page_data.latest_gdp_countries, selected_country)
+    lap('figure')
+    return map_figure
+
 
+# Only page layouts build the globe, so never in the figure pool: a build it turned away would blank the page
+@figure_cache.memoize('gdp.map', ['gdp_countries'])
+def build_map():
     map_figure = px.choropleth(
-        selected_data_map,
+        widen(gdp_data().latest_data_gdp_countries),
         locations='Region/Country/Area',
         locationmode='country names',
         color='GDP in current prices (millions of US dollars)',
@@ -296,14 +390,6 @@ def update_map(selected_country):
         oceancolor="LightBlue"
     )
 
-    if selected_country:
-        center_lat = selected_data_map['Latitude'].mean()
-        center_lon = selected_data_map['Longitude'].mean()
-        map_figure.update_geos(
-            projection_rotation_lon=center_lon,
-            projection_rotation_lat=center_lat
-        )
-
     map_figure.update_layout(
         margin={"r": 0, "t": 60, "l": 0, "b": 0},
         dragmode='pan',
@@ -313,54 +399,91 @@ def update_map(selected_country):
     return map_figure
 
 
-# Callback to update region line plots based on dropdown selection and year slider
-@callback(
-    Output('gdp-line-plot', 'figure'),
+# Callback to update both region line plots from a single pass over the region's rows
+@filtering_callback(
+    'gdpRegionLines', 'gdp-client-data',
+    [Output('gdp-line-plot', 'figure'),
+     Output('growth-rate-line-plot', 'figure')],
     [Input('gdp-region-dropdown', 'value'),
-     Input('gdp-year-slider', 'value')]
+     Input('gdp-year-slider', 'value')],
+    prevent_initial_call=snapshot.available
 )
-def update_gdp_line_plot(region, selected_years):
-    filtered_data = df_gdp_regions[(df_gdp_regions['Region/Country/Area'] == region) &
-                                   (df_gdp_regions['Year'] >= selected_years[0]) & (df_gdp_regions['Year'] <= selected_years[1])]
+@coalesce
+def update_region_line_plots(region, selected_years):
+    filtered_data = gdp_data().gdp_regions_index.year_range(region, selected_years[0], selected_years[1])
+    lap('filter')
+    raise_if_stale()
+
+    gdp_line_plot = gdp_line_template.render(
+        [xy(filtered_data, 'Year', 'GDP in current prices (millions of US dollars)')],
+        title={'text': f'GDP in Current Prices Over Time for {region}'})
+    growth_rate_line_plot = growth_rate_line_template.render(
+        [xy(filtered_data, 'Year', 'GDP real rates of growth (percent)')],
+        title={'text': f'GDP Real Rates of Growth Over Time for {region}'})
+    lap('figure')
+
+    return gdp_line_plot, growth_rate_line_plot
 
+
+def build_gdp_line_plot(filtered_data, region):
     gdp_line_plot = px.line(filtered_data, x='Year', y='GDP in current prices (millions of US dollars)',
                             title=f'GDP in Current Prices Over Time for {region}')
     gdp_line_plot.update_layout(xaxis_title='Year', yaxis_title='GDP in current prices (millions of US dollars)',
                                 height=510)
-
     return gdp_line_plot
 
 
-# Callback to update the growth rate line plot based on dropdown selection and year slider
-@callback(
-    Output('growth-rate-line-plot', 'figure'),
-    [Input('gdp-region-dropdown', 'value'),
-     Input('gdp-year-slider', 'value')]
-)
-def update_growth_rate_line_plot(region, selected_years):
-    filtered_data = df_gdp_regions[(df_gdp_regions['Region/Country/Area'] == region) &
-                                   (df_gdp_regions['Year'] >= selected_years[0]) & (df_gdp_regions['Year'] <= selected_years[1])]
-
+def build_growth_rate_line_plot(filtered_data, region):
     growth_rate_line_plot = px.line(filtered_data, x='Year', y='GDP real rates of growth (percent)',
                                     title=f'GDP Real Rates of Growth Over Time for {region}')
     growth_rate_line_plot.update_layout(xaxis_title='Year', yaxis_title='GDP real rates of growth (percent)',
                                         height=510)
-
     return growth_rate_line_plot
 
 
-# Callback to update the pie chart based on year dropdown selection
+gdp_line_template = FigureTemplate(lambda: build_gdp_line_plot(gdp_data().df_gdp_regions.iloc[:1], ''))
+growth_rate_line_template = FigureTemplate(lambda: build_growth_rate_line_plot(gdp_data().df_gdp_regions.iloc[:1], ''))
+
+region_features = ['GDP in current prices (millions of US dollars)', 'GDP real rates of growth (percent)']
+
+
+def build_client_data():
+    # What assets/clientside_filters.js needs to draw the country profiles and region line plots in the browser
+    page_data = gdp_data()
+    latest = page_data.latest_gdp_countries
+    return {
+        'profiles': page_data.country_profiles.columns(),
+        'details': {country: country_detail_lines(latest.get(country)) for country in page_data.countries},
+        'regions': EntityProfiles(page_data.gdp_regions_index, region_features).columns(),
+        'templates': {'profile': country_profile_template.spec, 'gdpLine': gdp_line_template.spec,
+                      'growthRateLine': growth_rate_line_template.spec},
+    }
+
+
+register_session_store('gdp-client-data', build_client_data, 'GDP client data',
+                       ['gdp_countries', 'gdp_regions'])
+
+
+# Callback to update the pie chart and the GDP per capita bar chart based on year dropdown selection
 @callback(
-    Output('gdp-pie-chart', 'figure'),
-    [Input('gdp-pie-year-dropdown', 'value')]
+    [Output('gdp-pie-chart', 'figure'),
+     Output('gdp-per-capita-bar-chart', 'figure')],
+    [Input('gdp-pie-year-dropdown', 'value')],
+    prevent_initial_call=snapshot.available
 )
-def update_gdp_pie_chart(selected_year):
-    selected_data = df_gdp_regions[df_gdp_regions['Year'] == selected_year]
+def update_year_charts(selected_year):
+    page_data = gdp_data()
+    percentage_gdp = page_data.gdp_regions_cube.year_shares(selected_year)
+    selected_data = page_data.gdp_per_capita_regions_cube.year_totals(selected_year).reset_index()
+    lap('filter')
+
+    pie_figure = build_gdp_pie_chart(percentage_gdp, selected_year)
+    bar_figure = build_gdp_per_capita_bar_chart(selected_data, selected_year)
+    lap('figure')
+    return pie_figure, bar_figure
 
-    total_gdp = df_gdp_regions.groupby('Year')['GDP in current prices (millions of US dollars)'].sum()
-    region_gdp = selected_data.groupby('Region/Country/Area')['GDP in current prices (millions of US dollars)'].sum()
-    percentage_gdp = region_gdp / total_gdp.sum() * 100
 
+def build_gdp_pie_chart(percentage_gdp, selected_year):
     pie_figure = px.pie(values=percentage_gdp.values, names=percentage_gdp.index,
                         title=f'Percentage of Global GDP by Region in {selected_year}')
 
@@ -372,13 +495,7 @@ def update_gdp_pie_chart(selected_year):
     return pie_figure
 
 
-# Callback to update the GDP per capita bar chart based on year dropdown selection
-@callback(
-    Output('gdp-per-capita-bar-chart', 'figure'),
-    [Input('gdp-pie-year-dropdown', 'value')]
-)
-def update_gdp_per_capita_bar_chart(selected_year):
-    selected_data = df_gdp_regions[df_gdp_regions['Year'] == selected_year]
+def build_gdp_per_capita_bar_chart(selected_data, selected_year):
     bar_figure = px.bar(
         selected_data,
         x='Region/Country/Area',
@@ -392,30 +509,50 @@ def update_gdp_per_capita_bar_chart(selected_year):
     return bar_figure
 
 
-# Callback to update the flat map based on the interval or range slider
+# Callback to show the selected range on the flat map; the first call sends every year's frame,
+# later slider moves only patch the displayed year's values and the range played back
 @callback(
     Output('flat-map', 'figure'),
-    [Input('interval-component', 'n_intervals'),
-     Input('flat-map-year-slider', 'value')],
-    [State('interval-component', 'disabled')]
+    [Input('flat-map-year-slider', 'value')],
+    prevent_initial_call=snapshot.available
 )
-def update_flat_map(n_intervals, slider_value, interval_disabled):
+@coalesce
+def update_flat_map(slider_value):
     start_year, end_year = slider_value
-    available_years_in_range = [year for year in available_years_countries if start_year <= year <= end_year]
-
-    # Determine the year to display based on whether the interval is enabled
-    if not interval_disabled:
-        current_index = n_intervals % len(available_years_in_range)
-        year = available_years_in_range[current_index]
-    else:
-        year = slider_value[1]  # Default to the end of the selected range
-
-    # Filter the dataframe for the selected year
-    filtered_df = df_gdp_countries[df_gdp_countries['Year'] == year]
-
-    # Create the flat map figure
+    years = [year for year in gdp_data().flat_map_years if start_year <= year <= end_year]
+
+    flat_map = build_flat_map() if ctx.triggered_id is None else Patch()
+
+    # Show the end of the selected range until playback starts. A range without any data year (the slider
+    # only stops on data years, but a reload may drop one) draws no country and leaves nothing to play back.
+    year = years[-1] if years else end_year
+    data = flat_map_year_data(year)
+    lap('filter')
+    flat_map['data'][0]['z'] = data[flat_map_features[0]].to_numpy()
+    flat_map['data'][0]['customdata'] = data[flat_map_features].to_numpy()
+    flat_map['layout']['title']['text'] = f"GDP in {year}" if years else f"No GDP data in {start_year}-{end_year}"
+    flat_map['layout']['meta'] = {'years': [str(year) for year in years]}
+    lap('figure')
+    return flat_map
+
+
+def flat_map_year_data(year):
+    # Align every year on the same countries so frames and patches only need to carry the values
+    page_data = gdp_data()
+    df_gdp_countries = page_data.df_gdp_countries
+    return widen(df_gdp_countries[df_gdp_countries['Year'] == year].set_index('Region/Country/Area')
+                 .reindex(page_data.flat_map_countries)[flat_map_features])
+
+
+@figure_cache.memoize('gdp.flat_map', ['gdp_countries'])
+@figure_pool.offload
+def build_flat_map():
+    flat_map_years = gdp_data().flat_map_years
+    frames_data = {year: flat_map_year_data(year) for year in flat_map_years}
+
+    year = flat_map_years[-1]
     fig = px.choropleth(
-        filtered_df,
+        frames_data[year].rename_axis('Region/Country/Area').reset_index(),
         locations="Region/Country/Area",
         locationmode='country names',
         color="GDP in current prices (millions of US dollars)",
@@ -439,18 +576,23 @@ def update_flat_map(n_intervals, slider_value, interval_disabled):
         margin={"r": 0, "t": 60, "l": 0, "b": 0},
         height=800
     )
+
+    # Playback happens in the browser (assets/flat_map.js), frames only swap the color and hover values
+    fig.frames = [
+        go.Frame(
+            name=str(frame_year),
+            data=[go.Choropleth(z=data[flat_map_features[0]].to_numpy(),
+                                customdata=data[flat_map_features].to_numpy())],
+            layout=go.Layout(title_text=f"GDP in {frame_year}")
+        )
+        for frame_year, data in frames_data.items()
+    ]
     return fig
 
 
-# Callback to enable/disable the interval and update the play button text
-@callback(
-    Output('interval-component', 'disabled'),
+# Play/pause the flat map animation client-side
+clientside_callback(
+    ClientsideFunction(namespace='flatMap', function_name='togglePlay'),
     Output('play-button', 'children'),
-    Input('play-button', 'n_clicks'),
-    State('interval-component', 'disabled')
+    Input('play-button', 'n_clicks')
 )
-def toggle_play(n_clicks, interval_disabled):
-    if n_clicks % 2 == 0:
-        return True, 'Play'
-    else:
-        return False, 'Pause'
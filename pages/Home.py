@@ -1,6 +1,8 @@
 import dash
 from dash import dcc, html
 
+from utils.static_assets import asset_url
+
 # Register the page
 dash.register_page(__name__, path='/', name='Home 🏠')
 
@@ -49,7 +51,7 @@ layout = html.Div(
                                     className='col-lg-6 mb-4',
                                     children=[
                                         html.Img(
-                                            src='/assets/Screenshots/GDP-Home.png',
+                                            src=asset_url('Screenshots/GDP-Home.png'),
                                             className='img-fluid rounded',
                                             style={
                                                 'maxWidth': '100%',
@@ -78,7 +80,7 @@ layout = html.Div(
                                     className='col-lg-6 mb-4',
                                     children=[
                                         html.Img(
-                                            src='/assets/Screenshots/Population-Home.png',
+                                            src=asset_url('Screenshots/Population-Home.png'),
                                             className='img-fluid rounded',
                                             style={
                                                 'maxWidth': '100%',
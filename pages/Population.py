@@ -1,269 +1,385 @@
 import dash
-from dash import dcc, html, callback
+from dash import dcc, html, callback, Patch
 from dash.dependencies import Input, Output, State
 import plotly.express as px
-import pandas as pd
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
 from dash_bootstrap_templates import load_figure_template
 
-# Register the page
+from utils.aggregates import MetricCube, YearEntityMatrix
+from utils.clientside import filtering_callback, register_session_store, session_store
+from utils.coalesce import coalesce, raise_if_stale
+from utils.data_loader import widen
+from utils.data_manager import DataView, data_manager
+from utils.entity_index import EntityIndex, EntityProfiles
+from utils.figure_cache import figure_cache
+from utils.figure_patch import apply_country_selection
+from utils.figures import FigureTemplate, xy
+from utils.latest import LatestSnapshot
+from utils.metrics import lap
+from utils.snapshots import LayoutSnapshot
+from utils.startup_profile import span
+
+# Register the page; its data and layout are built on the first request that needs them, and again for every new
+# version of the datasets (see utils/data_manager.py)
 dash.register_page(__name__, path='/population', name='Population 📊')
 
-load_figure_template("darkly")
+# Initial figures rendered by scripts/build_snapshots.py, embedded in the layout when they are up to date
+snapshot = LayoutSnapshot('population', ['population_countries', 'population_regions'])
 
-# Load the dataset for countries
-df = pd.read_csv('https://raw.githubusercontent.com/TouradBaba/exploratory_data_analysis_and_visualization/master/data/cleaned_df.csv')
+with span('load_figure_template("darkly") in pages/Population.py', 'theme'):
+    load_figure_template("darkly")
 
-# Find the latest year for each country
-latest_years = df.groupby('Region/Country/Area')['Year'].max().reset_index()
 
-# Merge to get the latest data for each country
-latest_data = pd.merge(df, latest_years, on=['Region/Country/Area', 'Year'], how='inner')
+class PopulationData:
+    """The population datasets of a data version and the lookup structures the callbacks precompute from them.
 
-# Get unique countries for dropdown options
-regions1 = latest_data['Region/Country/Area'].unique()
+    Structures derived from one dataset are reused by the next version if its file did not change.
+    """
 
-# Load the dataset for regions
-df_regions = pd.read_excel('https://github.com/TouradBaba/exploratory_data_analysis_and_visualization/raw/master/data/cleaned_df2.xlsx')
+    def __init__(self):
+        # Load the dataset for countries
+        data = data_manager.current()
+        self.df = data.frame('population_countries')
 
-# Get unique regions for dropdown options
-regions = df_regions['Region/Country/Area'].unique()
+        # Get the latest data for each country
+        with span('Population latest snapshot', 'precompute'):
+            self.latest_countries = data.derive('Population latest snapshot', ['population_countries'],
+                                                lambda: LatestSnapshot(self.df))
+            self.latest_data = self.latest_countries.frame
 
-# Calculate percentage of global surface area by region
-total_area = df_regions.groupby('Year')['Surface area (thousand km2)'].sum()
-region_area = df_regions.groupby('Region/Country/Area')['Surface area (thousand km2)'].sum()
-percentage_area = region_area / total_area.sum() * 100
+        # Index rows by country so callbacks can look up year ranges without scanning the tables
+        with span('Population entity indexes', 'precompute'):
+            self.countries_index = data.derive('Population countries index', ['population_countries'],
+                                               lambda: EntityIndex(self.df))
+
+        # Every country's indicator series as arrays, for the country profile charts
+        with span('Population country profiles', 'precompute'):
+            self.country_profiles = data.derive('Population country profiles', ['population_countries'],
+                                                lambda: EntityProfiles(self.countries_index, country_features))
+
+        # Country order and color values of the globe's single trace, used to patch it on selection
+        self.map_locations = self.latest_data['Region/Country/Area'].to_numpy()
+        self.map_values = self.latest_countries.column('Population mid-year estimates (millions)')
+
+        # Get unique countries for dropdown options
+        self.regions1 = self.latest_data['Region/Country/Area'].unique()
+
+        # Load the dataset for regions
+        self.df_regions = data.frame('population_regions')
+
+        # Index rows by region
+        with span('Population entity indexes', 'precompute'):
+            self.regions_index = data.derive('Population regions index', ['population_regions'],
+                                             lambda: EntityIndex(self.df_regions))
+
+        # Get unique regions for dropdown options
+        self.regions = self.df_regions['Region/Country/Area'].unique()
+
+        # Year x region totals read by the pie charts
+        with span('Population metric cubes', 'precompute'):
+            self.population_regions_cube = data.derive(
+                'Population regions cube', ['population_regions'],
+                lambda: MetricCube(self.df_regions, 'Population mid-year estimates (millions)'))
+            self.area_regions_cube = data.derive(
+                'Area regions cube', ['population_regions'],
+                lambda: MetricCube(self.df_regions, 'Surface area (thousand km2)'))
+
+        # Year x region density matrix the heatmap slices, instead of pivoting the selected rows
+        with span('Population density matrix', 'precompute'):
+            self.density_matrix = data.derive('Population density matrix', ['population_regions'],
+                                              lambda: YearEntityMatrix(self.df_regions, 'Population density'))
+
+        # Calculate percentage of global surface area by region
+        self.percentage_area = self.area_regions_cube.entity_shares
+
+        # Create pie chart for area percentage
+        with span('Population area pie chart', 'precompute'):
+            self.area_pie_figure = data.derive('Population area pie chart', ['population_regions'],
+                                               lambda: build_area_pie_chart(self.percentage_area))
+
+
+def build_area_pie_chart(percentage_area):
+    area_pie_figure = px.pie(values=percentage_area.values, names=percentage_area.index, title=None)
+    area_pie_figure.update_traces(textposition='inside', textinfo='percent+label')
+    area_pie_figure.update_layout(margin=dict(l=20, r=20, t=40, b=20))
+    return area_pie_figure
+
+
+population_data = DataView(PopulationData, 'Population data')
 
-# Create pie chart for area percentage
-area_pie_figure = px.pie(values=percentage_area.values, names=percentage_area.index,
-                         title=None)
-area_pie_figure.update_traces(textposition='inside', textinfo='percent+label')
-area_pie_figure.update_layout(margin=dict(l=20, r=20, t=40, b=20))
 
 # Update layout with both population and area pie charts
-layout = html.Div(
-    className='container-fluid',
-    children=[
-        # Header section for countries
-        html.Div(
-            className='jumbotron bg-dark text-white',
-            children=[
-                html.H1("Population Data Dashboard", className='display-4', style={'fontSize': '3rem',
-                                                                                   'textAlign': 'center'}),
-                html.P(
-                    "Explore population data over time by selecting a country or region.",
-                    className='lead smaller-text', style={'textAlign': 'center'}
-                )
-            ]
-        ),
-        html.Hr(className='my-4'),
-
-        # Country section
-        html.Div(
-            className='row',
-            children=[
-                html.Div(
-                    className='col-md-6 map-container',
-                    children=[
-                        dcc.Graph(id='map1', config={'scrollZoom': True})
-                    ]
-                ),
-                html.Div(
-                    className='col-md-6 details-container bg-light p-3',
-                    children=[
-                        html.Div(id='country-details1', className='details'),
-                        dcc.Dropdown(
-                            id='country-dropdown1',
-                            options=[{'label': country, 'value': country} for country in regions1],
-                            placeholder="Select a country",
-                            className='mb-3'
-                        ),
-                        html.Div(
-                            dcc.RangeSlider(
-                                id='year-slider-country',
-                                min=df['Year'].min(),
-                                max=df['Year'].max(),
-                                value=[df['Year'].min(), df['Year'].max()],
-                                marks={str(year): str(year) for year in df['Year'].unique()},
-                                step=None,
+def build_page_layout():
+    page_data = population_data()
+    df, df_regions = page_data.df, page_data.df_regions
+    regions1, regions = page_data.regions1, page_data.regions
+    area_pie_figure = page_data.area_pie_figure
+
+    return snapshot.apply(html.Div(
+        className='container-fluid',
+        children=[
+            # Header section for countries
+            html.Div(
+                className='jumbotron bg-dark text-white',
+                children=[
+                    html.H1("Population Data Dashboard", className='display-4', style={'fontSize': '3rem',
+                                                                                       'textAlign': 'center'}),
+                    html.P(
+                        "Explore population data over time by selecting a country or region.",
+                        className='lead smaller-text', style={'textAlign': 'center'}
+                    )
+                ]
+            ),
+            html.Hr(className='my-4'),
+
+            # Country section
+            html.Div(
+                className='row',
+                children=[
+                    html.Div(
+                        className='col-md-6 map-container',
+                        children=[
+                            dcc.Graph(id='map1', figure=build_map(), config={'scrollZoom': True})
+                        ]
+                    ),
+                    html.Div(
+                        className='col-md-6 details-container bg-light p-3',
+                        children=[
+                            html.Div(id='country-details1', className='details'),
+                            dcc.Dropdown(
+                                id='country-dropdown1',
+                                options=[{'label': country, 'value': country} for country in regions1],
+                                placeholder="Select a country",
                                 className='mb-3'
                             ),
-                            style={'marginTop': '20px'}
-                        ),
-                        html.Div(
-                            id='line-charts-container1',
-                            className='line-charts-container',
-                            style={'display': 'flex', 'flexDirection': 'row', 'flexWrap': 'wrap'}
-                        )
-                    ]
-                )
-            ]
-        ),
-        html.Hr(className='my-4'),
-
-        # Region section
-        html.Div(
-            className='row',
-            children=[
-                html.Div(
-                    className='col-md-6 heatmap-container',
-                    children=[
-                        dcc.Graph(id='density-heatmap', config={'scrollZoom': True})
-                    ]
-                ),
-                html.Div(
-                    className='col-md-6 details-container bg-light p-3',
-                    children=[
-                        html.Div(id='region-details', className='details'),
-                        html.Hr(style={'backgroundColor': 'black'}),
-                        dcc.Dropdown(
-                            id='region-dropdown',
-                            options=[{'label': region, 'value': region} for region in regions],
-                            placeholder="Select a region",
-                            className='mb-3'
-                        ),
-                        html.Div(
-                            dcc.RangeSlider(
-                                id='year-slider-region',
-                                min=df_regions['Year'].min(),
-                                max=df_regions['Year'].max(),
-                                value=[df_regions['Year'].min(), df_regions['Year'].max()],
-                                marks={str(year): str(year) for year in df_regions['Year'].unique()},
-                                step=None,
+                            html.Div(
+                                dcc.RangeSlider(
+                                    id='year-slider-country',
+                                    min=df['Year'].min(),
+                                    max=df['Year'].max(),
+                                    value=[df['Year'].min(), df['Year'].max()],
+                                    marks={str(year): str(year) for year in df['Year'].unique()},
+                                    step=None,
+                                    className='mb-3'
+                                ),
+                                style={'marginTop': '20px'}
+                            ),
+                            html.Div(
+                                id='line-charts-container1',
+                                className='line-charts-container',
+                                style={'display': 'flex', 'flexDirection': 'row', 'flexWrap': 'wrap'}
+                            )
+                        ]
+                    )
+                ]
+            ),
+            html.Hr(className='my-4'),
+
+            # Region section
+            html.Div(
+                className='row',
+                children=[
+                    html.Div(
+                        className='col-md-6 heatmap-container',
+                        children=[
+                            dcc.Graph(id='density-heatmap', config={'scrollZoom': True})
+                        ]
+                    ),
+                    html.Div(
+                        className='col-md-6 details-container bg-light p-3',
+                        children=[
+                            html.Div(id='region-details', className='details'),
+                            html.Hr(style={'backgroundColor': 'black'}),
+                            dcc.Dropdown(
+                                id='region-dropdown',
+                                options=[{'label': region, 'value': region} for region in regions],
+                                placeholder="Select a region",
                                 className='mb-3'
                             ),
-                            style={'marginTop': '20px'}
-                        )
-                    ]
-                )
-            ]
-        ),
-
-        # Additional charts section
-        html.Div(
-            className='row mt-4',
-            children=[
-                html.Div(
-                    className='col-md-6',
-                    children=[
-                        dcc.Graph(id='line-plot')
-                    ]
-                ),
-                html.Div(
-                    className='col-md-6',
-                    children=[
-                        dcc.Graph(id='bar-plot')
-                    ]
-                )
-            ]
-        ),
-        html.Hr(className='my-4'),
-
-        # Pie charts section
-        html.Div(
-            className='row mt-4 justify-content-end',
-            children=[
-                html.Div(
-                    className='col-md-6',
-                    children=[
-                        dcc.Dropdown(
-                            id='pie-year-dropdown',
-                            options=[{'label': year, 'value': year} for year in df_regions['Year'].unique()],
-                            value=2022,  # Default value
-                            placeholder="Select a year",
-                            className='mb-3'
-                        ),
-                        dcc.Graph(id='pie-chart', config={'displayModeBar': False}),
-                    ],
-                ),
-                html.Div(
-                    className='col-md-6',
-                    children=[
-                        html.P('Percentage of Global Surface Area by Region', className="text-center",
-                               style={'fontSize': 24, 'color': '#FFFFFF'}),
-                        dcc.Graph(
-                            id='area-pie-chart',
-                            figure=area_pie_figure,
-                            config={'displayModeBar': False}
-                        ),
-                    ],
-                )
-            ]
-        )
-    ]
-)
+                            html.Div(
+                                dcc.RangeSlider(
+                                    id='year-slider-region',
+                                    min=df_regions['Year'].min(),
+                                    max=df_regions['Year'].max(),
+                                    value=[df_regions['Year'].min(), df_regions['Year'].max()],
+                                    marks={str(year): str(year) for year in df_regions['Year'].unique()},
+                                    step=None,
+                                    className='mb-3'
+                                ),
+                                style={'marginTop': '20px'}
+                            )
+                        ]
+                    )
+                ]
+            ),
+
+            # Additional charts section
+            html.Div(
+                className='row mt-4',
+                children=[
+                    html.Div(
+                        className='col-md-6',
+                        children=[
+                            dcc.Graph(id='line-plot')
+                        ]
+                    ),
+                    html.Div(
+                        className='col-md-6',
+                        children=[
+                            dcc.Graph(id='bar-plot')
+                        ]
+                    )
+                ]
+            ),
+            html.Hr(className='my-4'),
+
+            # Pie charts section
+            html.Div(
+                className='row mt-4 justify-content-end',
+                children=[
+                    html.Div(
+                        className='col-md-6',
+                        children=[
+                            dcc.Dropdown(
+                                id='pie-year-dropdown',
+                                options=[{'label': year, 'value': year} for year in df_regions['Year'].unique()],
+                                value=2022,  # Default value
+                                placeholder="Select a year",
+                                className='mb-3'
+                            ),
+                            dcc.Graph(id='pie-chart', config={'displayModeBar': False}),
+                        ],
+                    ),
+                    html.Div(
+                        className='col-md-6',
+                        children=[
+                            html.P('Percentage of Global Surface Area by Region', className="text-center",
+                                   style={'fontSize': 24, 'color': '#FFFFFF'}),
+                            dcc.Graph(
+                                id='area-pie-chart',
+                                figure=area_pie_figure,
+                                config={'displayModeBar': False}
+                            ),
+                        ],
+                    )
+                ]
+            ),
+            *session_store('population-client-data')
+        ]
+    ))
+
+
+page_layout = DataView(build_page_layout, 'Population layout', kind='layout')
+
+
+def layout(**_):
+    return page_layout()
 
 
 # Callback to update the line charts and country details based on dropdown or map selection
-@callback(
+@filtering_callback(
+    'countryProfile', 'population-client-data',
     [Output('line-charts-container1', 'children'),
      Output('country-details1', 'children'),
      Output('country-dropdown1', 'value')],
     [Input('country-dropdown1', 'value'),
      Input('map1', 'clickData'),
      Input('year-slider-country', 'value')],
-    [State('country-dropdown1', 'value')]
+    [State('country-dropdown1', 'value')],
+    prevent_initial_call=snapshot.available
 )
+@coalesce
 def update_line_charts_and_details(country, clickData, selected_years, current_dropdown_value):
     triggered_by = dash.callback_context.triggered[0]['prop_id'].split('.')[0]
 
     if triggered_by == 'map1' and clickData is not None:
         country = clickData['points'][0]['location']
 
+    page_data = population_data()
     line_chart_figures = []
     country_details = html.P("Click on a country to see details.", className='placeholder-text')
 
     if country:
-        selected_data_chart = df[(df['Region/Country/Area'] == country) &
-                                 (df['Year'] >= selected_years[0]) & (df['Year'] <= selected_years[1])]
-
-        if not selected_data_chart.empty:
-            # Line plot for each feature
-            features = ['Population aged 0 to 14 years old (percentage)',
-                        'Population aged 60+ years old (percentage)',
-                        'Sex ratio (males per 100 females)',
-                        'Population mid-year estimates (millions)']
-
-            for feature in features:
-                line_chart_figure = px.line(selected_data_chart, x='Year', y=feature,
-                                            labels={'Year': 'Year', 'Value': feature})
-
-                line_chart_figure.update_layout(title=f'{country} {feature}',
-                                                xaxis_title='Year',
-                                                yaxis_title=feature,
-                                                margin=dict(l=20, r=20, t=40, b=20),
-                                                height=300)
-
-                line_chart_figures.append(dcc.Graph(figure=line_chart_figure, style={'height': '300px', 'width': '50%'}))
-
-            latest_data_country = latest_data[latest_data['Region/Country/Area'] == country]
-            if not latest_data_country.empty:
-                population = latest_data_country['Population mid-year estimates (millions)'].values[0]
-                surface_area_km2 = latest_data_country['surface_area_km2'].values[0]
-                latest_year_country = latest_data_country['Year'].values[0]
-
+        years, series = page_data.country_profiles.series(country, selected_years[0], selected_years[1])
+        lap('filter')
+
+        if len(years):
+            raise_if_stale()
+            # One figure with a line chart per feature, filled from the country's precomputed series
+            profile_figure = country_profile_template.render(
+                [{'x': years, 'y': series[feature]} for feature in country_features], title={'text': country})
+            line_chart_figures.append(dcc.Graph(figure=profile_figure, style={'width': '100%'}))
+
+            latest_data_country = page_data.latest_countries.get(country)
+            if latest_data_country is not None:
+                detail_lines = country_detail_lines(latest_data_country)
                 country_details = html.Div([
                     html.H3(f"{country}", className='country-name'),
-                    html.P(f"Population: {population} million", className='country-population'),
-                    html.P(f"Surface Area KM2: {surface_area_km2}", className='country-area'),
-                    html.P(f"Year: {latest_year_country}", className='country-year')
+                    *(html.P(text, className=class_name) for text, class_name in detail_lines)
                 ], className='country-details')
 
+    lap('figure')
     return line_chart_figures, country_details, country
 
 
-# Callback to update the map based on country selection
+def country_detail_lines(latest_data_country):
+    population = latest_data_country['Population mid-year estimates (millions)']
+    surface_area_km2 = latest_data_country['surface_area_km2']
+    latest_year_country = latest_data_country['Year']
+    return [(f"Population: {population} million", 'country-population'),
+            (f"Surface Area KM2: {surface_area_km2}", 'country-area'),
+            (f"Year: {latest_year_country}", 'country-year')]
+
+
+def build_country_profile(country, years, series):
+    # Two line charts per row, one per feature
+    rows = -(-len(country_features) // 2)
+    profile_figure = make_subplots(rows=rows, cols=2, subplot_titles=country_features, horizontal_spacing=0.1,
+                                   vertical_spacing=0.25 / rows)
+    for i, feature in enumerate(country_features):
+        profile_figure.add_trace(go.Scatter(x=years, y=series[feature], mode='lines', name=feature,
+                                            hovertemplate=f'Year=%{{x}}<br>{feature}=%{{y}}<extra></extra>'),
+                                 row=i // 2 + 1, col=i % 2 + 1)
+
+    profile_figure.update_annotations(font_size=13)
+    profile_figure.update_layout(title=country,
+                                 showlegend=False,
+                                 margin=dict(l=20, r=20, t=80, b=20),
+                                 height=300 * rows)
+    return profile_figure
+
+
+country_features = ['Population aged 0 to 14 years old (percentage)',
+                    'Population aged 60+ years old (percentage)',
+                    'Sex ratio (males per 100 females)',
+                    'Population mid-year estimates (millions)']
+
+# The country profile is filled into a prebuilt skeleton instead of being laid out per request
+country_profile_template = FigureTemplate(
+    lambda: build_country_profile('', *population_data().country_profiles.series(None, 0, 0)))
+
+
+# Callback to update the map based on country selection. The layout carries the whole globe, so a selection
+# only patches its color values and rotation (the renderer may drop this callback's initial call, so it has none)
 @callback(
     Output('map1', 'figure'),
-    [Input('country-dropdown1', 'value')]
+    [Input('country-dropdown1', 'value')],
+    prevent_initial_call=True
 )
 def update_map(selected_country):
-    if selected_country:
-        selected_data_map = latest_data[latest_data['Region/Country/Area'] == selected_country]
-    else:
-        selected_data_map = latest_data
+    page_data = population_data()
+    map_figure = apply_country_selection(Patch(), page_data.map_locations, page_data.map_values,
+                                         page_data.latest_countries, selected_country)
+    lap('figure')
+    return map_figure
+
 
+# Only page layouts build the globe, so never in the figure pool: a build it turned away would blank the page
+@figure_cache.memoize('population.map', ['population_countries'])
+def build_map():
     map_figure = px.choropleth(
-        selected_data_map,
+        widen(population_data().latest_data),
         locations='Region/Country/Area',
         locationmode='country names',
         color='Population mid-year estimates (millions)',
@@ -288,14 +404,6 @@ def update_map(selected_country):
         oceancolor="LightBlue"
     )
 
-    if selected_country:
-        center_lat = selected_data_map['Latitude'].mean()
-        center_lon = selected_data_map['Longitude'].mean()
-        map_figure.update_geos(
-            projection_rotation_lon=center_lon,
-            projection_rotation_lat=center_lat
-        )
-
     map_figure.update_layout(
         margin={"r": 0, "t": 60, "l": 0, "b": 0},
         dragmode='pan',
@@ -305,30 +413,72 @@ def update_map(selected_country):
     return map_figure
 
 
-# Callback to update the heatmap and region details based on selected region and years
-@callback(
+# Callback to update the heatmap, region details, line plot and bar plot from a single pass over the
+# selected region's rows
+@filtering_callback(
+    'populationRegionCharts', 'population-client-data',
     [Output('density-heatmap', 'figure'),
-     Output('region-details', 'children')],
+     Output('region-details', 'children'),
+     Output('line-plot', 'figure'),
+     Output('bar-plot', 'figure')],
     [Input('region-dropdown', 'value'),
-     Input('year-slider-region', 'value')]
+     Input('year-slider-region', 'value')],
+    prevent_initial_call=snapshot.available
 )
-def update_heatmap_and_details(region, selected_years):
+@coalesce
+def update_region_charts(region, selected_years):
+    page_data = population_data()
+    regions_index = page_data.regions_index
+    region_data = regions_index.rows(region)
+    line_data = regions_index.year_range(region, selected_years[0], selected_years[1])
     if region:
-        selected_data = df_regions[(df_regions['Region/Country/Area'] == region) &
-                                   (df_regions['Year'] >= selected_years[0]) & (
-                                               df_regions['Year'] <= selected_years[1])]
+        has_data = not line_data.empty
     else:
-        selected_data = df_regions[
-            (df_regions['Year'] >= selected_years[0]) & (df_regions['Year'] <= selected_years[1])]
+        # The matrix knows every year of df_regions, no need to filter the table to see whether any row is left
+        has_data = page_data.density_matrix.has_rows(selected_years[0], selected_years[1])
+    density = page_data.density_matrix.slice(selected_years[0], selected_years[1], region or None)
+    bar_data = region_data[region_data['Year'].isin(bar_years)]
+    lap('filter')
+    raise_if_stale()
+
+    density_heatmap, region_details = build_heatmap_and_details(region, selected_years, has_data, density)
+    line_figure = build_line_plot(region, widen(line_data))
+    if bar_data.empty:
+        # px lays out a chart without data differently (no bars, no legend title), build that one in full
+        bar_figure = build_bar_plot(region, widen(bar_data))
+    else:
+        bar_figure = bar_template.render([xy(bar_data, 'Year', column) for column in bar_columns],
+                                         title={'text': f'Population Distribution for {region}'})
+    lap('figure')
+
+    return density_heatmap, region_details, line_figure, bar_figure
 
+
+def build_density_heatmap(region, density):
     density_heatmap = px.imshow(
-        selected_data.pivot_table(index='Year', columns='Region/Country/Area', values='Population density'),
+        density,
         labels={'color': 'Population Density'},
         title=f'Density Heatmap for {region}' if region else 'Density Heatmap for All Regions')
 
     density_heatmap.update_layout(margin={"r": 0, "t": 60, "l": 0, "b": 0})
+    return density_heatmap
+
+
+def build_full_density_heatmap():
+    density_matrix = population_data().density_matrix
+    return build_density_heatmap(None, density_matrix.slice(density_matrix.years[0], density_matrix.years[-1]))
+
 
-    if not selected_data.empty:
+# The heatmap's trace and layout do not depend on the slice shown, only its values and labels change
+density_heatmap_template = FigureTemplate(build_full_density_heatmap)
+
+
+def build_heatmap_and_details(region, selected_years, has_data, density):
+    density_heatmap = density_heatmap_template.render(
+        [{'x': density.columns.to_numpy(), 'y': density.index.to_numpy(), 'z': density.to_numpy()}],
+        title={'text': f'Density Heatmap for {region}' if region else 'Density Heatmap for All Regions'})
+
+    if has_data:
         # Region details
         if region:
             region_details = html.Div([
@@ -343,62 +493,76 @@ def update_heatmap_and_details(region, selected_years):
     return density_heatmap, region_details
 
 
-# Callback to update line plot based on selected region and years
-@callback(
-    Output('line-plot', 'figure'),
-    [Input('region-dropdown', 'value'),
-     Input('year-slider-region', 'value')]
-)
-def update_line_plot(region, selected_years):
-    selected_data = df_regions[(df_regions['Region/Country/Area'] == region) &
-                                   (df_regions['Year'] >= selected_years[0]) & (
-                                               df_regions['Year'] <= selected_years[1])]
-
+def build_line_plot(region, selected_data):
     line_figure = px.line(selected_data, x='Year', y='Population mid-year estimates (millions)',
                           color='Region/Country/Area',
                           title=f'Population over Time for {region}')
     line_figure.update_layout(margin=dict(l=20, r=20, t=40, b=20))
-
     return line_figure
 
 
-# Callback to update bar plot based on selected region and years
-@callback(
-    Output('bar-plot', 'figure'),
-    [Input('region-dropdown', 'value'),
-     Input('year-slider-region', 'value')]
-)
-def update_bar_plot(region, selected_years):
-    selected_data = df_regions[(df_regions['Region/Country/Area'] == region) &
-                                   (df_regions['Year'].isin([2010, 2015, 2021, 2022]))]
-
+def build_bar_plot(region, selected_data):
     # Create bar plot with separate bars for each population age group
-    bar_figure = px.bar(selected_data, x='Year', y=['Population aged 0 to 14 years old (percentage)',
-                                                    'Population aged 60+ years old (percentage)'],
+    bar_figure = px.bar(selected_data, x='Year', y=bar_columns,
                         color_discrete_sequence=['#1f77b4', '#ff7f0e'],
                         title=f'Population Distribution for {region}')
 
     bar_figure.update_layout(barmode='group', margin=dict(l=20, r=20, t=40, b=20))
-
     return bar_figure
 
 
+bar_columns = ['Population aged 0 to 14 years old (percentage)', 'Population aged 60+ years old (percentage)']
+bar_years = [2010, 2015, 2021, 2022]
+bar_template = FigureTemplate(lambda: build_bar_plot('', population_data().df_regions.iloc[:1]))
+
+# Skeletons the browser fills in clientside filtering mode. The line plot names its trace after the region, so
+# its skeleton is built for a region called region_marker, which the browser replaces with the selected one;
+# without data px lays out both charts differently, so those have their own skeletons.
+region_marker = '{region}'
+line_template = FigureTemplate(lambda: build_line_plot(
+    '', population_data().df_regions.iloc[:1].assign(**{'Region/Country/Area': region_marker})))
+empty_line_template = FigureTemplate(lambda: build_line_plot('', population_data().df_regions.iloc[:0]))
+empty_bar_template = FigureTemplate(lambda: build_bar_plot('', population_data().df_regions.iloc[:0]))
+
+
 # Callback to update pie chart based on selected years
 @callback(
     Output('pie-chart', 'figure'),
-    [Input('pie-year-dropdown', 'value')]
+    [Input('pie-year-dropdown', 'value')],
+    prevent_initial_call=snapshot.available
 )
 def update_pie_chart(selected_year):
-    selected_data = df_regions[df_regions['Year'] == selected_year]
-
-    total_population = df_regions.groupby('Year')['Population mid-year estimates (millions)'].sum()
-    region_population = selected_data.groupby('Region/Country/Area')['Population mid-year estimates (millions)'].sum()
-    percentage_population = region_population / total_population.sum() * 100
+    percentage_population = population_data().population_regions_cube.year_shares(selected_year)
+    lap('filter')
 
     pie_figure = px.pie(values=percentage_population.values, names=percentage_population.index,
                         title=f'Percentage of Global Population by Region in {selected_year}')
 
     pie_figure.update_traces(textposition='inside', textinfo='percent+label')
     pie_figure.update_layout(margin=dict(l=20, r=20, t=40, b=20))
+    lap('figure')
 
     return pie_figure
+
+
+def build_client_data():
+    # What assets/clientside_filters.js needs to draw the country profiles and region charts in the browser
+    page_data = population_data()
+    latest, density_matrix = page_data.latest_countries, page_data.density_matrix
+    return {
+        'profiles': page_data.country_profiles.columns(),
+        'details': {country: country_detail_lines(latest.get(country)) for country in page_data.regions1},
+        'regions': EntityProfiles(page_data.regions_index, ['Population mid-year estimates (millions)',
+                                                            *bar_columns]).columns(),
+        'density': {'years': density_matrix.years, 'entities': density_matrix.entities.to_numpy(),
+                    'values': density_matrix.values},
+        'barYears': bar_years,
+        'regionMarker': region_marker,
+        'templates': {'profile': country_profile_template.spec, 'densityHeatmap': density_heatmap_template.spec,
+                      'line': line_template.spec, 'emptyLine': empty_line_template.spec, 'bar': bar_template.spec,
+                      'emptyBar': empty_bar_template.spec},
+    }
+
+
+register_session_store('population-client-data', build_client_data, 'Population client data',
+                       ['population_countries', 'population_regions'])
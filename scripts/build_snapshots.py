@@ -0,0 +1,48 @@
+"""Render the outputs of the GDP and Population pages' initial callbacks to JSON snapshots.
+
+For every page with a LayoutSnapshot (utils/snapshots.py), sends the update-component requests the browser
+sends when the page loads, with the layout's initial values, and saves the responses to <page>.json in
+--output. The layouts then embed those figures and details, and the page's callbacks skip their initial
+call. A snapshot is only used while the datasets it was rendered from are unchanged, so run this as a build
+step before deploying, after the data is in place.
+
+    python scripts/build_snapshots.py [--output snapshots]
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', default=str(ROOT / 'snapshots'))
+    args = parser.parse_args()
+
+    # Render with the server callbacks, in the request, on layouts without the current snapshots
+    os.environ.update(DASH_SNAPSHOT_DIR='', DASH_CLIENTSIDE_FILTERING='0', FIGURE_POOL_WORKERS='0')
+    import app as dash_app
+    from utils.data_manager import data_manager
+    from utils.snapshots import LayoutSnapshot, render_initial_outputs
+
+    dash_app.server.test_client().get('/')
+
+    for page in dash_app.dash.page_registry.values():
+        module = sys.modules[page['module']]
+        if not isinstance(getattr(module, 'snapshot', None), LayoutSnapshot):
+            continue
+        start = time.perf_counter()
+        outputs = render_initial_outputs(dash_app.app, module.layout())
+        data = data_manager.current()
+        snapshot = LayoutSnapshot(module.snapshot.page, module.snapshot.datasets, args.output)
+        snapshot.write(outputs, {name: data.digest(name) for name in snapshot.datasets})
+        print(f'{snapshot.path}: {", ".join(sorted(outputs))} '
+              f'({snapshot.path.stat().st_size / 1024:.0f} KB, {time.perf_counter() - start:.1f} s)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""Build WebP variants of the screenshots under assets/Screenshots.
+
+Writes <name>.webp next to every PNG/JPEG (resized to at most --max-width pixels wide) and GIF (animated,
+full size). utils.static_assets.asset_url() serves the WebP variant instead of the original whenever it
+exists, so run this as a build step before deploying. Requires Pillow (pip install Pillow).
+
+    python scripts/build_webp.py [--max-width 1280] [--quality 80] [--force]
+"""
+import argparse
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+SCREENSHOTS = ROOT / 'assets' / 'Screenshots'
+SOURCE_SUFFIXES = {'.png', '.jpg', '.jpeg', '.gif'}
+
+
+def build(source, target, max_width, quality):
+    from PIL import Image
+
+    with Image.open(source) as image:
+        if getattr(image, 'is_animated', False):
+            image.save(target, 'WEBP', save_all=True, quality=quality)
+            return
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+        if image.width > max_width:
+            image = image.resize((max_width, round(image.height * max_width / image.width)), Image.LANCZOS)
+        image.save(target, 'WEBP', quality=quality, method=6)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--max-width', type=int, default=1280)
+    parser.add_argument('--quality', type=int, default=80)
+    parser.add_argument('--force', action='store_true', help='rebuild variants that are newer than their source')
+    args = parser.parse_args()
+
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        sys.exit('Building WebP variants requires Pillow: pip install Pillow')
+
+    for source in sorted(SCREENSHOTS.iterdir()):
+        if source.suffix.lower() not in SOURCE_SUFFIXES:
+            continue
+        target = source.with_suffix('.webp')
+        if not args.force and target.exists() and target.stat().st_mtime >= source.stat().st_mtime:
+            continue
+        tmp = target.with_name(f'.{target.name}')
+        build(source, tmp, args.max_width, args.quality)
+        tmp.replace(target)
+        print(f'{source.name}: {source.stat().st_size / 1024:.0f} KB -> {target.name}: '
+              f'{target.stat().st_size / 1024:.0f} KB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+
+from utils.data_loader import ENTITY_COLUMN, widen
+
+
+class MetricCube:
+    """Year x entity totals of one metric, precomputed once so callbacks only do dictionary lookups.
+
+    Percentages use the same denominator the pie charts always used: the sum over every year of the
+    yearly totals.
+    """
+
+    def __init__(self, df, metric, entity_column=ENTITY_COLUMN, year_column='Year'):
+        self.metric = metric
+        df = widen(df[[year_column, entity_column, metric]])
+        self.grand_total = df.groupby(year_column)[metric].sum().sum()
+
+        totals = df.groupby([year_column, entity_column], observed=True)[metric].sum()
+        self._year_totals = {
+            year: year_total.droplevel(year_column) for year, year_total in totals.groupby(level=year_column)
+        }
+        self._year_shares = {
+            year: year_total / self.grand_total * 100 for year, year_total in self._year_totals.items()
+        }
+        self._empty = totals.iloc[:0].droplevel(year_column)
+        self._empty_shares = self._empty / self.grand_total * 100
+
+        self.entity_totals = df.groupby(entity_column, observed=True)[metric].sum()
+        self.entity_shares = self.entity_totals / self.grand_total * 100
+
+    def year_totals(self, year):
+        """Return the total of every entity in a year (empty if the year is unknown)."""
+        return self._year_totals.get(year, self._empty)
+
+    def year_shares(self, year):
+        """Return every entity's total in a year as a percentage of the all-years total."""
+        return self._year_shares.get(year, self._empty_shares)
+
+
+class YearEntityMatrix:
+    """Year x entity values of one metric as a dense array, so callbacks slice it instead of pivoting.
+
+    Each cell holds what pivot_table aggregates the matching rows to (their mean, NaN if there are none).
+    A slice drops the years and entities without any value, as pivot_table does, so it equals the pivot of
+    the same rows.
+    """
+
+    def __init__(self, df, metric, entity_column=ENTITY_COLUMN, year_column='Year'):
+        self.year_column = year_column
+        self.entity_column = entity_column
+
+        df = widen(df[[year_column, entity_column, metric]])
+        means = df.groupby([year_column, entity_column], observed=True)[metric].mean()
+        self.years = np.unique(df[year_column].to_numpy())
+        self.entities = df[entity_column].astype('category').cat.categories
+        self._positions = {entity: i for i, entity in enumerate(self.entities)}
+
+        self.values = np.full((len(self.years), len(self.entities)), np.nan)
+        rows = np.searchsorted(self.years, means.index.get_level_values(year_column).to_numpy())
+        columns = self.entities.get_indexer(means.index.get_level_values(entity_column))
+        self.values[rows, columns] = means.to_numpy()
+
+    def has_rows(self, first_year, last_year):
+        """Whether the frame the matrix was built from has any row in the years first_year..last_year."""
+        lo = np.searchsorted(self.years, first_year, side='left')
+        return bool(np.searchsorted(self.years, last_year, side='right') > lo)
+
+    def slice(self, first_year, last_year, entity=None):
+        """Return the years first_year..last_year of one entity (of all of them if entity is None) as a frame."""
+        lo = int(np.searchsorted(self.years, first_year, side='left'))
+        hi = int(np.searchsorted(self.years, last_year, side='right'))
+        if entity is None:
+            columns = slice(None)
+        else:
+            columns = [self._positions[entity]] if entity in self._positions else []
+        block = self.values[lo:hi, columns]
+
+        present = ~np.isnan(block)
+        keep_rows, keep_columns = present.any(axis=1), present.any(axis=0)
+        return pd.DataFrame(
+            block[keep_rows][:, keep_columns],
+            index=pd.Index(self.years[lo:hi][keep_rows], name=self.year_column),
+            columns=pd.Index(self.entities[columns][keep_columns], name=self.entity_column),
+        )
@@ -0,0 +1,73 @@
+import os
+
+from dash import callback, clientside_callback, dcc, ClientsideFunction
+from dash.dependencies import Input, Output, State
+from dash.exceptions import PreventUpdate
+
+from utils.data_manager import DataView, data_manager
+
+# Opt-in: DASH_CLIENTSIDE_FILTERING=1 sends each page's series to the browser once per session and filters them by
+# year range and entity there (assets/clientside_filters.js) instead of in server callbacks
+CLIENTSIDE_FILTERING = os.environ.get('DASH_CLIENTSIDE_FILTERING', '0') == '1'
+
+# Store id -> the datasets its data is built from
+_store_datasets = {}
+
+
+def session_store(store_id):
+    """The layout components holding a page's client data, or nothing when the mode is off.
+
+    Besides the session dcc.Store of the data, the session remembers which version of the datasets its copy
+    is of, and the layout carries the version it was built for.
+    """
+    if not CLIENTSIDE_FILTERING:
+        return []
+    return [dcc.Store(id=store_id, storage_type='session'),
+            dcc.Store(id=f'{store_id}-version', storage_type='session'),
+            dcc.Store(id=f'{store_id}-current', data=data_manager.current().tag(*_store_datasets[store_id]))]
+
+
+def session_store_ids():
+    """Ids of the components session_store() adds to layouts; their data belongs to the session, not the layout."""
+    return {f'{store_id}{suffix}' for store_id in _store_datasets for suffix in ('', '-version', '-current')}
+
+
+def register_session_store(store_id, build, name, datasets):
+    """Fill the store of session_store(store_id) with build(), built from datasets, once per browser session.
+
+    build() runs once per process and data version. The server only sends it when the session has no copy
+    yet, or a copy of other versions of the datasets.
+    """
+    if not CLIENTSIDE_FILTERING:
+        return
+    _store_datasets[store_id] = list(datasets)
+    data = DataView(build, name)
+
+    @callback(Output(store_id, 'data'), Output(f'{store_id}-version', 'data'),
+              Input(f'{store_id}-current', 'data'), State(f'{store_id}-version', 'data'))
+    def fill_session_store(current, stored):
+        if stored is not None and stored == current:
+            raise PreventUpdate
+        return data(), data_manager.current().tag(*datasets)
+
+
+def filtering_callback(function_name, store_id, *dependencies, **kwargs):
+    """Register the decorated function as a server callback, or the JavaScript function doing the same filtering.
+
+    In clientside filtering mode, function_name of the clientFilters namespace gets the store's data as an
+    extra input, after the callback's own inputs and before its states, and the decorated function is not
+    registered. The browser then always renders the initial outputs itself (prevent_initial_call is ignored),
+    which costs the server nothing, so page snapshots need not carry them.
+    """
+    def decorator(func):
+        if CLIENTSIDE_FILTERING:
+            kwargs.pop('prevent_initial_call', None)
+            flat = [item for group in dependencies for item in (group if isinstance(group, list) else [group])]
+            states = [item for item in flat if isinstance(item, State)]
+            clientside_callback(ClientsideFunction(namespace='clientFilters', function_name=function_name),
+                                *(item for item in flat if not isinstance(item, State)), Input(store_id, 'data'),
+                                *states, **kwargs)
+        else:
+            callback(*dependencies, **kwargs)(func)
+        return func
+    return decorator
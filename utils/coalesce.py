@@ -0,0 +1,105 @@
+import contextvars
+import functools
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from dash.exceptions import PreventUpdate
+from flask import has_request_context, request
+
+SESSION_COOKIE = 'dash_session'
+# Set on callback requests by assets/page_load.js, one value per page load (browser tab)
+PAGE_LOAD_HEADER = 'X-Dash-Page-Load'
+
+# (key, generation) of the coalesced callback running in the current request context
+_current = contextvars.ContextVar('coalesced_call', default=None)
+
+
+class Coalescer:
+    """Drop superseded invocations of a callback within one page load.
+
+    Every call of a coalesced callback takes a new generation number for its (session, page load, callback)
+    key. A call that is no longer the latest one for its key, because the user kept dragging a slider,
+    stops at its next checkpoint with PreventUpdate, so the figures the browser would throw away are
+    never built.
+
+    This only works with threaded workers (gthread). Generations live in the worker process, and a newer
+    request can only supersede a call that is still running in the same process. A sync worker serves one
+    request at a time, so with the default sync workers nothing is ever dropped, whatever the window.
+    """
+
+    def __init__(self, window=0.0, max_keys=10000):
+        # Seconds a call waits before starting, giving a newer value a chance to replace it
+        self.window = window
+        self.max_keys = max_keys
+        self._latest = OrderedDict()
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def init_app(self, server):
+        """Give every browser a session cookie that identifies its burst of callback requests."""
+        @server.after_request
+        def set_session_cookie(response):
+            if SESSION_COOKIE not in request.cookies:
+                response.set_cookie(SESSION_COOKIE, uuid.uuid4().hex, httponly=True, samesite='Lax')
+            return response
+
+    @staticmethod
+    def session_id():
+        if not has_request_context():
+            return None
+        # Tabs of one browser share the cookie, so the page load keeps them from superseding each other
+        session = request.cookies.get(SESSION_COOKIE) or request.remote_addr
+        return session, request.headers.get(PAGE_LOAD_HEADER)
+
+    def _begin(self, key):
+        with self._lock:
+            generation = self._latest.get(key, 0) + 1
+            self._latest[key] = generation
+            self._latest.move_to_end(key)
+            # Forget the least recently active sessions
+            while len(self._latest) > self.max_keys:
+                self._latest.popitem(last=False)
+            return generation
+
+    def is_stale(self):
+        call = _current.get()
+        if call is None:
+            return False
+        key, generation = call
+        with self._lock:
+            return self._latest.get(key, generation) != generation
+
+    def raise_if_stale(self):
+        """Checkpoint for coalesced callbacks: abandon the call if a newer one has started."""
+        if self.is_stale():
+            with self._lock:
+                self.dropped += 1
+            raise PreventUpdate
+
+    def __call__(self, func):
+        """Decorator making a callback coalesced per session."""
+        name = f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (self.session_id(), name)
+            generation = self._begin(key)
+            token = _current.set((key, generation))
+            try:
+                if self.window:
+                    time.sleep(self.window)
+                self.raise_if_stale()
+                return func(*args, **kwargs)
+            finally:
+                _current.reset(token)
+
+        return wrapper
+
+
+# Shared by every page; COALESCE_WINDOW_MS sets how long a slider callback waits for a newer value.
+# Only threaded workers ever drop a call, see Coalescer.
+coalesce = Coalescer(window=float(os.environ.get('COALESCE_WINDOW_MS', '0')) / 1000)
+raise_if_stale = coalesce.raise_if_stale
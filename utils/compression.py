@@ -0,0 +1,92 @@
+import gzip
+import threading
+from collections import OrderedDict
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Content types worth compressing; images and fonts are compressed already
+COMPRESSIBLE_TYPES = {
+    'text/html', 'text/css', 'text/plain', 'text/javascript', 'application/javascript', 'application/json',
+    'image/svg+xml',
+}
+
+
+class Compression:
+    """gzip/brotli compression of app.server responses.
+
+    Responses of a compressible type and at least min_size bytes are compressed with brotli when the
+    brotli package is installed and the client accepts it, otherwise with gzip. Responses carrying an ETag
+    (the static assets) are kept compressed in a small LRU keyed by ETag and encoding, so bootstrap.css
+    is compressed once per worker rather than on every request.
+    """
+
+    def __init__(self, min_size=1024, gzip_level=6, brotli_quality=5, cache_size=64):
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, server):
+        server.after_request(self.compress)
+
+    @staticmethod
+    def negotiate():
+        accepted = request.accept_encodings
+        if brotli is not None and accepted.quality('br') > 0:
+            return 'br'
+        if accepted.quality('gzip') > 0:
+            return 'gzip'
+        return None
+
+    def _compress(self, data, encoding):
+        if encoding == 'br':
+            return brotli.compress(data, quality=self.brotli_quality)
+        return gzip.compress(data, compresslevel=self.gzip_level)
+
+    def compress(self, response):
+        if (response.status_code != 200 or response.mimetype not in COMPRESSIBLE_TYPES
+                or 'Content-Encoding' in response.headers
+                or (response.is_streamed and not response.direct_passthrough)):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = self.negotiate()
+        if encoding is None:
+            return response
+
+        etag, _ = response.get_etag()
+        key = (etag, encoding) if etag else None
+        with self._lock:
+            body = self._cache.get(key) if key else None
+            if body is not None:
+                self._cache.move_to_end(key)
+        if body is None:
+            # Static files are streamed from disk; read them so they can be compressed
+            response.direct_passthrough = False
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            body = self._compress(data, encoding)
+            if key:
+                with self._lock:
+                    self._cache[key] = body
+                    while len(self._cache) > self.cache_size:
+                        self._cache.popitem(last=False)
+
+        # Close the file a cached static response would otherwise have streamed
+        stream = response.response
+        response.direct_passthrough = False
+        response.set_data(body)
+        if hasattr(stream, 'close'):
+            stream.close()
+        response.headers['Content-Encoding'] = encoding
+        if etag:
+            # The compressed bytes differ from the file, so the ETag only identifies it weakly
+            response.set_etag(etag, weak=True)
+        return response
@@ -0,0 +1,167 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Bump when the on-disk layout or the normalization applied before caching changes
+CACHE_VERSION = 2
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """Return the SHA-256 hex digest of a file."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _source_stat(path):
+    stat = os.stat(path)
+    return {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+
+
+def _write_json_atomic(path, payload):
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(payload, f)
+        # mkstemp creates the file private to its owner; other users (e.g. a web server's) read it too
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def _is_string_column(series):
+    return isinstance(series.dtype, pd.CategoricalDtype) or not pd.api.types.is_numeric_dtype(series.dtype)
+
+
+def _as_categorical(series):
+    return series if isinstance(series.dtype, pd.CategoricalDtype) else series.astype('category')
+
+
+def _column_layout(df):
+    """Describe how each column of df is stored in a cache entry."""
+    columns = []
+    for i, name in enumerate(df.columns):
+        series = df[name]
+        filename = f'col_{i}.npy'
+        if _is_string_column(series):
+            # Strings are stored as integer codes plus their dictionary
+            categorical = _as_categorical(series)
+            columns.append({
+                'name': name,
+                'kind': 'category' if isinstance(series.dtype, pd.CategoricalDtype) else 'string',
+                'file': filename,
+                'categories': categorical.cat.categories.tolist(),
+                'ordered': bool(categorical.cat.ordered),
+            })
+        else:
+            columns.append({'name': name, 'kind': 'numeric', 'file': filename})
+    return columns
+
+
+def _write_columns(df, columns, target):
+    for column in columns:
+        series = df[column['name']]
+        if column['kind'] == 'numeric':
+            values = series.to_numpy()
+        else:
+            values = _as_categorical(series).cat.codes.to_numpy()
+        np.save(target / column['file'], values)
+
+
+def _read_columns(target, columns):
+    """Memory-map the cached columns back into a DataFrame."""
+    data = {}
+    for column in columns:
+        values = np.load(target / column['file'], mmap_mode='r')
+        if column['kind'] == 'numeric':
+            data[column['name']] = values
+            continue
+        categorical = pd.Categorical.from_codes(values, categories=column['categories'], ordered=column['ordered'])
+        if column['kind'] == 'string':
+            data[column['name']] = np.asarray(categorical, dtype=object)
+        else:
+            data[column['name']] = categorical
+    return pd.DataFrame(data, copy=False)
+
+
+class ColumnarCache:
+    """Binary columnar cache of prepared DataFrames, one directory of .npy files per source.
+
+    Entries are validated against the source file's mtime and size; when those change the
+    source is re-hashed and the entry is only rebuilt if its content actually differs.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = Path(cache_dir)
+
+    def _manifest_path(self, name):
+        return self.cache_dir / f'{name}.json'
+
+    def _read_manifest(self, name):
+        try:
+            with open(self._manifest_path(name)) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifest.get('version') != CACHE_VERSION:
+            return None
+        return manifest
+
+    def _is_fresh(self, name, manifest, source):
+        """Check an entry against its source, refreshing the recorded mtime if only that changed."""
+        stat = _source_stat(source)
+        recorded = manifest['source']
+        if recorded['mtime_ns'] == stat['mtime_ns'] and recorded['size'] == stat['size']:
+            return True
+        if recorded['size'] != stat['size'] or recorded['sha256'] != file_digest(source):
+            return False
+        manifest['source'].update(stat)
+        _write_json_atomic(self._manifest_path(name), manifest)
+        return True
+
+    def load(self, name, source, build):
+        """Return the cached frame for source, calling build(source) and caching it when stale."""
+        source = Path(source)
+        manifest = self._read_manifest(name)
+        if manifest is not None and (self.cache_dir / manifest['entry']).is_dir() and self._is_fresh(
+                name, manifest, source):
+            return _read_columns(self.cache_dir / manifest['entry'], manifest['columns'])
+
+        stat = _source_stat(source)
+        sha256 = file_digest(source)
+        df = build(source)
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        entry = f'{name}-{sha256[:16]}'
+        target = self.cache_dir / entry
+        columns = _column_layout(df)
+        if not target.is_dir():
+            # Build in a private directory and rename it so concurrent workers never see partial entries
+            tmp = Path(tempfile.mkdtemp(dir=self.cache_dir, prefix=f'.{entry}-'))
+            _write_columns(df, columns, tmp)
+            try:
+                os.rename(tmp, target)
+            except OSError:
+                shutil.rmtree(tmp, ignore_errors=True)
+
+        previous = manifest['entry'] if manifest is not None else None
+        _write_json_atomic(self._manifest_path(name), {
+            'version': CACHE_VERSION,
+            'entry': entry,
+            'source': {'path': str(source), 'sha256': sha256, **stat},
+            'columns': columns,
+        })
+        if previous and previous != entry:
+            shutil.rmtree(self.cache_dir / previous, ignore_errors=True)
+
+        return _read_columns(target, columns)
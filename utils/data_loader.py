@@ -0,0 +1,145 @@
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from utils.data_cache import ColumnarCache
+from utils.startup_profile import span
+
+# Local copies of the cleaned datasets ship with the repository in data/
+DATA_DIR = Path(os.environ.get('DASH_DATA_DIR', Path(__file__).resolve().parent.parent / 'data'))
+
+# Remote location used only when a file is missing from DATA_DIR (set to an empty string to disable)
+FALLBACK_URL = os.environ.get(
+    'DASH_DATA_FALLBACK_URL',
+    'https://github.com/TouradBaba/exploratory_data_analysis_and_visualization/raw/master/data'
+)
+
+# Prepared copies of the datasets are cached here as memory-mapped .npy columns (set to an empty string to disable)
+CACHE_DIR = os.environ.get('DASH_DATA_CACHE_DIR', str(DATA_DIR / '.cache'))
+
+# Store Year as int16, other integer columns as int32 and float columns as float32 when every value survives it
+# (set to 0 to keep the int64/float64 columns pandas reads)
+COMPACT_DTYPES = os.environ.get('DASH_COMPACT_DTYPES', '1') != '0'
+
+ENTITY_COLUMN = 'Region/Country/Area'
+GDP_COLUMN = 'GDP in current prices (millions of US dollars)'
+
+# Dataset name -> file name inside DATA_DIR
+DATASETS = {
+    'population_countries': 'cleaned_df.csv',
+    'population_regions': 'cleaned_df2.xlsx',
+    'gdp_countries': 'cleaned_gdp.xlsx',
+    'gdp_regions': 'cleaned_gdp2.xlsx',
+}
+
+
+def _read(source, filename):
+    if filename.endswith('.csv'):
+        return pd.read_csv(source)
+    return pd.read_excel(source)
+
+
+# Entity names of the datasets loaded so far -> their categorical dtype, shared by datasets with the same names
+_entity_dtypes = {}
+
+
+def _fits_float32(values):
+    """Whether every value is the float64 parsed from its shortest float32 decimal form."""
+    return np.array_equal(values.astype(np.float32).astype(str).astype(np.float64), values, equal_nan=True)
+
+
+def _compact(df):
+    for column in df.columns:
+        values = df[column].to_numpy()
+        if values.dtype.kind == 'i':
+            dtype = 'int16' if column == 'Year' else 'int32'
+            limits = np.iinfo(dtype)
+            if len(values) == 0 or limits.min <= values.min() and values.max() <= limits.max:
+                df[column] = values.astype(dtype)
+        elif values.dtype == np.float64 and _fits_float32(values):
+            df[column] = values.astype(np.float32)
+    return df
+
+
+def _share_entity_names(df):
+    """Rebuild the entity column on interned names, so every dataset naming an entity shares one string."""
+    entities = df[ENTITY_COLUMN].cat
+    categories = tuple(sys.intern(name) for name in entities.categories)
+    dtype = _entity_dtypes.setdefault(categories, pd.CategoricalDtype(list(categories)))
+    df[ENTITY_COLUMN] = pd.Categorical.from_codes(entities.codes.to_numpy(), dtype=dtype)
+    return df
+
+
+def _prepare(name, df):
+    """Apply the per-dataset normalization shared by every page, so it is done once and cached."""
+    if name.startswith('gdp'):
+        # Convert 'GDP in current prices (millions of US dollars)' to numeric, coercing errors
+        df[GDP_COLUMN] = pd.to_numeric(df[GDP_COLUMN], errors='coerce')
+    df[ENTITY_COLUMN] = df[ENTITY_COLUMN].astype('category')
+    return _compact(df) if COMPACT_DTYPES else df
+
+
+def exact_float64(values):
+    """Return numeric values as int64/float64, float32 ones as the float64 numbers they were read as.
+
+    Narrowed columns are widened this way before anything computes with them or sends them to the browser,
+    so sums, means and figures are the same as with the columns pandas reads.
+    """
+    values = np.asarray(values)
+    if values.dtype == np.float32:
+        # Formatting is the slow part and columns repeat their values (a country's coordinates, every year),
+        # so convert each distinct bit pattern once; comparing bits keeps -0.0 and 0.0 apart
+        patterns, inverse = np.unique(values.view(np.uint32), return_inverse=True)
+        return patterns.view(np.float32).astype(str).astype(np.float64)[inverse.reshape(values.shape)]
+    if values.dtype.kind == 'i' and values.dtype.itemsize < 8:
+        return values.astype(np.int64)
+    return values
+
+
+def exact_value(value):
+    """exact_float64 of a single value, e.g. one read out of a narrowed column."""
+    if isinstance(value, np.float32):
+        return np.float64(str(value))
+    if isinstance(value, np.signedinteger):
+        return np.int64(value)
+    return value
+
+
+def widen(df):
+    """Return df with its narrowed numeric columns converted by exact_float64."""
+    narrowed = [column for column, dtype in df.dtypes.items()
+                if dtype == np.float32 or dtype.kind == 'i' and dtype.itemsize < 8]
+    if not narrowed:
+        return df
+    return df.assign(**{column: exact_float64(df[column].to_numpy()) for column in narrowed})
+
+
+def dataset_path(name):
+    """Return the local path of a dataset, whether or not it exists."""
+    return DATA_DIR / DATASETS[name]
+
+
+def load_dataset(name):
+    """Load a prepared dataset from DATA_DIR (via the cache), falling back to FALLBACK_URL if the file is missing."""
+    with span(f'read {name}', 'read'):
+        return _share_entity_names(_load_dataset(name))
+
+
+def _load_dataset(name):
+    filename = DATASETS[name]
+    path = DATA_DIR / filename
+    if path.exists():
+        if CACHE_DIR:
+            try:
+                return ColumnarCache(CACHE_DIR).load(name if COMPACT_DTYPES else f'{name}.wide', path,
+                                                     lambda source: _prepare(name, _read(source, filename)))
+            except OSError:
+                # Read-only or full filesystem: parse the source directly
+                pass
+        return _prepare(name, _read(path, filename))
+    if not FALLBACK_URL:
+        raise FileNotFoundError(f"Dataset '{name}' not found at {path} and no fallback URL is configured")
+    return _prepare(name, _read(f"{FALLBACK_URL.rstrip('/')}/{filename}", filename))
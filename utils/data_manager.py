@@ -0,0 +1,227 @@
+import contextlib
+import contextvars
+import logging
+import os
+import threading
+import time
+
+import flask
+
+from utils.data_cache import file_digest
+from utils.data_loader import dataset_path, load_dataset
+from utils.lazy import Lazy
+from utils.startup_profile import span
+
+logger = logging.getLogger(__name__)
+
+# Version a thread works on instead of the published one, while a new version is being built
+_building = contextvars.ContextVar('building_data_version', default=None)
+
+
+class DataVersion:
+    """One consistent set of datasets, and everything derived from them, as seen by a callback.
+
+    Datasets are loaded on first use. Derived structures (indexes, snapshots, aggregates) are keyed by the
+    digests of the datasets they are built from, so a new version reuses those of the files that did not
+    change. Views (a page's data, its layout) are built once per version.
+    """
+
+    def __init__(self, number, frames=None, digests=None, derived=None):
+        self.number = number
+        self._frames = dict(frames or {})
+        self._digests = dict(digests or {})
+        self._derived = dict(derived or {})
+        self._views = {}
+        self._lock = threading.RLock()
+
+    def digest(self, name):
+        """Return the SHA-256 of a dataset's file as this version loads it (None when read from FALLBACK_URL)."""
+        with self._lock:
+            if name not in self._digests:
+                path = dataset_path(name)
+                self._digests[name] = file_digest(path) if path.exists() else None
+            return self._digests[name]
+
+    def tag(self, *names):
+        """A short identifier of the given datasets' contents in this version, for cache keys."""
+        return '-'.join((self.digest(name) or 'remote')[:12] for name in names)
+
+    def frame(self, name):
+        """Return a dataset, loading it on first use."""
+        with self._lock:
+            if name not in self._frames:
+                self.digest(name)
+                self._frames[name] = load_dataset(name)
+            return self._frames[name]
+
+    def loaded(self):
+        with self._lock:
+            return list(self._frames)
+
+    def derive(self, name, datasets, build):
+        """Return build() for this version's contents of datasets, reusing it from earlier versions."""
+        key = (name, tuple((dataset, self.digest(dataset)) for dataset in datasets))
+        with self._lock:
+            if key not in self._derived:
+                self._derived[key] = build()
+            return self._derived[key]
+
+    def view(self, view):
+        with self._lock:
+            if view not in self._views:
+                with span(view.name, view.kind):
+                    self._views[view] = view.build()
+            return self._views[view]
+
+    def next(self, changed):
+        """A new version, with the frames and derived structures of the datasets not in changed."""
+        with self._lock:
+            return DataVersion(
+                self.number + 1,
+                frames={name: df for name, df in self._frames.items() if name not in changed},
+                digests={name: digest for name, digest in self._digests.items() if name not in changed},
+                derived={key: value for key, value in self._derived.items()
+                         if not any(dataset in changed for dataset, _ in key[1])},
+            ), list(self._views)
+
+
+class DataView(Lazy):
+    """A Lazy built once per data version: build() reads the data through data_manager.current()."""
+
+    def __init__(self, build, name=None, kind='precompute'):
+        super().__init__(build, name, kind)
+        self.build = build
+
+    @property
+    def built(self):
+        return self in data_manager.current()._views
+
+    def __call__(self):
+        return data_manager.current().view(self)
+
+
+class DataManager:
+    """Holds the published data version and replaces it when dataset files change.
+
+    A request works on the version published when it first reads data, until it ends, so in-flight
+    callbacks finish on a consistent version while reload() builds the next one: it loads the changed
+    datasets, rebuilds the structures derived from them and the views built so far, then publishes the
+    new version with a single assignment. Listeners run after each swap, e.g. to drop the figure cache
+    entries of the changed datasets.
+    """
+
+    def __init__(self):
+        self._version = DataVersion(1)
+        self._listeners = []
+        self._reload_lock = threading.RLock()
+        self._watcher = None
+        self.reloads = 0
+
+    @property
+    def published(self):
+        """The version new requests work on."""
+        return self._version
+
+    def current(self):
+        """The version this request (or the reload running in this thread) works on."""
+        building = _building.get()
+        if building is not None:
+            return building
+        if flask.has_request_context():
+            # Pin the version for the rest of the request
+            if 'data_version' not in flask.g:
+                flask.g.data_version = self._version
+            return flask.g.data_version
+        return self._version
+
+    @contextlib.contextmanager
+    def building(self, version):
+        """Make current() return version in this thread (and the requests it serves in-process)."""
+        token = _building.set(version)
+        try:
+            yield version
+        finally:
+            _building.reset(token)
+
+    def on_reload(self, listener):
+        """Call listener(changed dataset names, old version, new version) after every swap."""
+        self._listeners.append(listener)
+        return listener
+
+    def changed_datasets(self):
+        """Return the loaded datasets whose file no longer has the digest they were loaded with."""
+        version = self._version
+        changed = []
+        for name in version.loaded():
+            path = dataset_path(name)
+            digest = file_digest(path) if path.exists() else None
+            if digest != version.digest(name):
+                changed.append(name)
+        return changed
+
+    @contextlib.contextmanager
+    def paused(self):
+        """Hold off reloads and the watcher's checks meanwhile."""
+        with self._reload_lock:
+            yield
+
+    def reload(self, names=None):
+        """Publish a new version if loaded datasets changed on disk (or reload names regardless).
+
+        Returns the names of the datasets reloaded, empty when nothing changed.
+        """
+        with self._reload_lock:
+            old = self._version
+            changed = set(self.changed_datasets())
+            changed.update(name for name in names or () if name in old.loaded())
+            if not changed:
+                return []
+            new, views = old.next(changed)
+            with self.building(new):
+                # Build what the old version had built, so the first requests on the new one find it ready
+                for view in views:
+                    view()
+            self._version = new
+            self.reloads += 1
+            for listener in self._listeners:
+                listener(changed, old, new)
+            return sorted(changed)
+
+    def watch(self, interval):
+        """Check the loaded datasets' files every interval seconds in a daemon thread and reload on change."""
+        if interval <= 0 or (self._watcher is not None and self._watcher.is_alive()):
+            return
+
+        def run():
+            # The first check compares digests, in case a file changed before the watcher started
+            stats = None
+            while True:
+                time.sleep(interval)
+                # Then only hash the files once their size or modification time changes
+                current = {}
+                with self._reload_lock:
+                    for name in self._version.loaded():
+                        path = dataset_path(name)
+                        if path.exists():
+                            stat = path.stat()
+                            current[name] = (stat.st_mtime_ns, stat.st_size)
+                if current != stats:
+                    try:
+                        self.reload()
+                    except Exception:
+                        # e.g. a half-written file: keep serving the published version and try again
+                        logger.exception('Reloading the datasets failed, keeping version %d', self._version.number)
+                        continue
+                stats = current
+
+        self._watcher = threading.Thread(target=run, name='data-watcher', daemon=True)
+        self._watcher.start()
+
+    def stats(self):
+        return {'version': self._version.number, 'reloads': self.reloads}
+
+
+# Shared by every page; DATA_WATCH_INTERVAL seconds between checks of the data files (0, the default, only
+# reloads through /admin/reload-data, see app.py)
+data_manager = DataManager()
+WATCH_INTERVAL = float(os.environ.get('DATA_WATCH_INTERVAL', '0'))
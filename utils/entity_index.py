@@ -0,0 +1,82 @@
+import numpy as np
+
+from utils.data_loader import ENTITY_COLUMN, exact_float64
+
+
+class EntityIndex:
+    """Rows of a frame grouped by entity and sorted by year.
+
+    Looking up an entity is a dictionary access and restricting it to a year range is a binary
+    search over that entity's years, so the cost depends on the size of the answer, not of the table.
+    frame keeps the dataset's compact dtypes and rows() and year_range() return slices of it, so callers
+    widen what they compute with or plot (see data_loader.widen; figures.xy widens the columns it reads).
+    """
+
+    def __init__(self, df, entity_column=ENTITY_COLUMN, year_column='Year'):
+        entities = df[entity_column].astype('category')
+        codes = entities.cat.codes.to_numpy()
+        order = np.lexsort((df[year_column].to_numpy(), codes))
+
+        self.frame = df.iloc[order]
+        self._years = self.frame[year_column].to_numpy()
+
+        sorted_codes = codes[order]
+        starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]]) if len(order) else []
+        stops = np.r_[starts[1:], len(order)] if len(order) else []
+        categories = entities.cat.categories
+        self._bounds = {
+            categories[sorted_codes[start]]: (int(start), int(stop)) for start, stop in zip(starts, stops)
+        }
+
+    def __contains__(self, entity):
+        return entity in self._bounds
+
+    def entities(self):
+        return list(self._bounds)
+
+    def bounds(self):
+        """Return the (start, stop) positions in frame of every entity's rows."""
+        return dict(self._bounds)
+
+    def rows(self, entity):
+        """Return all rows of an entity (an empty frame if it is unknown)."""
+        start, stop = self._bounds.get(entity, (0, 0))
+        return self.frame.iloc[start:stop]
+
+    def positions(self, entity, first_year, last_year):
+        """Return the (start, stop) positions in frame of the rows of an entity with first_year <= Year <= last_year."""
+        start, stop = self._bounds.get(entity, (0, 0))
+        years = self._years[start:stop]
+        lo = start + int(np.searchsorted(years, first_year, side='left'))
+        hi = start + int(np.searchsorted(years, last_year, side='right'))
+        return lo, hi
+
+    def year_range(self, entity, first_year, last_year):
+        """Return the rows of an entity with first_year <= Year <= last_year."""
+        lo, hi = self.positions(entity, first_year, last_year)
+        return self.frame.iloc[lo:hi]
+
+
+class EntityProfiles:
+    """Every entity's indicator series as numpy arrays in the order of an EntityIndex.
+
+    A profile is sliced straight out of the arrays, so a country's charts are filled without touching pandas.
+    The arrays keep the compact dtypes of the index's frame and only the slices read are widened.
+    """
+
+    def __init__(self, index, features, year_column='Year'):
+        self.index = index
+        self.features = list(features)
+        self.years = index.frame[year_column].to_numpy()
+        self.values = {feature: index.frame[feature].to_numpy() for feature in self.features}
+
+    def series(self, entity, first_year, last_year):
+        """Return the years of an entity between first_year and last_year and every feature's values in them."""
+        lo, hi = self.index.positions(entity, first_year, last_year)
+        return exact_float64(self.years[lo:hi]), {feature: exact_float64(values[lo:hi])
+                                                  for feature, values in self.values.items()}
+
+    def columns(self):
+        """The profiles as plain columns: each entity's (start, stop) positions, its years and feature values."""
+        return {'bounds': self.index.bounds(), 'years': exact_float64(self.years), 'features': self.features,
+                'values': {feature: exact_float64(values) for feature, values in self.values.items()}}
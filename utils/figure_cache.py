@@ -0,0 +1,283 @@
+import functools
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import plotly.io as pio
+
+from utils.data_manager import data_manager
+
+
+class MemoryBackend:
+    """In-process LRU store. Not shared between gunicorn workers."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                self._items.move_to_end(key)
+            return item
+
+    def set(self, key, item):
+        """Store an item and return how many entries were evicted to make room."""
+        with self._lock:
+            self._items[key] = item
+            self._items.move_to_end(key)
+            evicted = 0
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+                evicted += 1
+            return evicted
+
+    def delete(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def keys(self):
+        with self._lock:
+            return list(self._items)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+class FileSystemBackend:
+    """One JSON file per entry in a directory shared by every worker on the host.
+
+    File modification times are used as the LRU clock. Other workers write, touch and evict the same files
+    concurrently, so an entry disappearing between two file operations is a miss, never an error.
+    """
+
+    def __init__(self, directory, maxsize):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.maxsize = maxsize
+
+    def _path(self, key):
+        return self.directory / f"{hashlib.sha1(key.encode()).hexdigest()}.json"
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                item = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return item['expires'], item['value']
+
+    def set(self, key, item):
+        path = self._path(key)
+        # A temporary file of its own per call, so threads and workers writing the same key never share one
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=f'.{path.stem}-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'key': key, 'expires': item[0], 'value': item[1]}, f)
+            os.replace(tmp, path)
+        except OSError:
+            # Full or read-only filesystem: the figure is served without being cached
+            Path(tmp).unlink(missing_ok=True)
+            return 0
+
+        entries = []
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if not entry.name.endswith('.json'):
+                    continue
+                try:
+                    entries.append((entry.stat().st_mtime, entry.path))
+                except FileNotFoundError:
+                    continue
+        entries.sort()
+        evicted = 0
+        for _, stale in entries[:max(len(entries) - self.maxsize, 0)]:
+            try:
+                os.unlink(stale)
+            except FileNotFoundError:
+                # Evicted by another worker in the meantime
+                continue
+            evicted += 1
+        return evicted
+
+    def delete(self, key):
+        self._path(key).unlink(missing_ok=True)
+
+    def keys(self):
+        keys = []
+        for path in self.directory.glob('*.json'):
+            try:
+                with open(path) as f:
+                    keys.append(json.load(f)['key'])
+            except (OSError, ValueError):
+                continue
+        return keys
+
+    def clear(self):
+        for path in self.directory.glob('*.json'):
+            path.unlink(missing_ok=True)
+
+
+class RedisBackend:
+    """Store entries in Redis (or any server speaking its protocol), shared by every worker.
+
+    Size-based eviction is left to the server's maxmemory policy.
+    """
+
+    def __init__(self, url, prefix='figure-cache:'):
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError("The 'redis' figure cache backend requires the redis package") from e
+        self._client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self._client.get(self.prefix + key)
+        if value is None:
+            return None
+        return None, value.decode()
+
+    def set(self, key, item):
+        expires, value = item
+        ttl = max(int(expires - time.time()), 1) if expires else None
+        self._client.set(self.prefix + key, value, ex=ttl)
+        return 0
+
+    def delete(self, key):
+        self._client.delete(self.prefix + key)
+
+    def keys(self):
+        return [key.decode()[len(self.prefix):] for key in self._client.scan_iter(self.prefix + '*')]
+
+    def clear(self):
+        for key in self._client.scan_iter(self.prefix + '*'):
+            self._client.delete(key)
+
+
+def _normalize(value):
+    """Make callback inputs hashable and canonical (numpy scalars, tuples and lists compare equal)."""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in sorted(value.items())}
+    return value
+
+
+class FigureCache:
+    """LRU cache of serialized figure JSON keyed by callback name and normalized inputs.
+
+    Entries of a function memoized with datasets are also keyed by those datasets' contents, and are
+    deleted when one of them is reloaded (see utils/data_manager.py).
+    """
+
+    def __init__(self, backend, ttl=None):
+        self.backend = backend
+        self.ttl = ttl
+        self.datasets = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """Build the cache from FIGURE_CACHE_* environment variables."""
+        kind = os.environ.get('FIGURE_CACHE_BACKEND', 'memory')
+        maxsize = int(os.environ.get('FIGURE_CACHE_SIZE', '256'))
+        ttl = float(os.environ.get('FIGURE_CACHE_TTL', '0')) or None
+        if kind == 'filesystem':
+            backend = FileSystemBackend(os.environ.get('FIGURE_CACHE_DIR', '/tmp/dash-figure-cache'), maxsize)
+        elif kind == 'redis':
+            backend = RedisBackend(os.environ.get('FIGURE_CACHE_URL', 'redis://localhost:6379/0'))
+        elif kind == 'memory':
+            backend = MemoryBackend(maxsize)
+        else:
+            raise ValueError(f"Unknown FIGURE_CACHE_BACKEND '{kind}'")
+        return cls(backend, ttl=ttl)
+
+    @staticmethod
+    def make_key(name, args):
+        return f'{name}:{json.dumps(_normalize(list(args)), sort_keys=True)}'
+
+    def _count(self, counter, amount=1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def get_or_build(self, name, args, build):
+        """Return the figure dict cached for (name, args), building and storing it on a miss."""
+        key = self.make_key(name, args)
+        item = self.backend.get(key)
+        if item is not None:
+            expires, value = item
+            if expires is None or expires > time.time():
+                self._count('hits')
+                return json.loads(value)
+            self.backend.delete(key)
+            self._count('evictions')
+
+        self._count('misses')
+        value = pio.to_json(build(*args), validate=False)
+        expires = time.time() + self.ttl if self.ttl else None
+        evicted = self.backend.set(key, (expires, value))
+        if evicted:
+            self._count('evictions', evicted)
+        return json.loads(value)
+
+    def memoize(self, name, datasets=()):
+        """Decorator caching a figure-returning function, built from datasets, on its positional arguments."""
+        self.datasets[name] = set(datasets)
+
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args):
+                key_name = f'{name}@{data_manager.current().tag(*datasets)}' if datasets else name
+                return self.get_or_build(key_name, args, func)
+            return wrapper
+        return decorator
+
+    def invalidate(self, datasets, keep=None):
+        """Delete the entries built from any of datasets and return how many were deleted.
+
+        With keep, a data version, entries built from its contents of those datasets are kept: they are not
+        stale, whether this process built them since the reload or another worker sharing the backend did.
+        """
+        names = {name: keep and f'{name}@{keep.tag(*used)}' for name, used in self.datasets.items()
+                 if used & set(datasets)}
+        deleted = 0
+        for key in self.backend.keys():
+            tagged = key.split(':', 1)[0]
+            name = tagged.split('@', 1)[0]
+            if name in names and tagged != names[name]:
+                self.backend.delete(key)
+                deleted += 1
+        self._count('invalidations', deleted)
+        return deleted
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'invalidations': self.invalidations}
+
+    def clear(self):
+        self.backend.clear()
+
+
+# Shared by every page; configured through FIGURE_CACHE_BACKEND, FIGURE_CACHE_SIZE, FIGURE_CACHE_TTL,
+# FIGURE_CACHE_DIR (filesystem backend) and FIGURE_CACHE_URL (redis backend)
+figure_cache = FigureCache.from_env()
+# A reload calls this after building the new version's figures, so those are kept
+data_manager.on_reload(lambda changed, old, new: figure_cache.invalidate(changed, keep=new))
@@ -0,0 +1,21 @@
+import numpy as np
+
+
+def apply_country_selection(target, locations, values, latest, country):
+    """Highlight one country on an orthographic choropleth by updating only its color values and rotation.
+
+    target is either the full figure dict or a dash.Patch of it, so the same code builds the initial
+    figure and the partial updates sent afterwards. Countries whose value is NaN are not drawn, which
+    matches a figure built from the selected country alone. A country the latest snapshot does not know
+    (e.g. dropped by a data reload while a tab still lists it) leaves the globe unselected.
+    """
+    row = latest.get(country) if country else None
+    if row is not None:
+        z = np.where(locations == country, values, np.nan)
+        rotation = {'lon': row['Longitude'], 'lat': row['Latitude']}
+    else:
+        z = values
+        rotation = {'lon': 0, 'lat': 0}
+    target['data'][0]['z'] = z
+    target['layout']['geo']['projection']['rotation'] = rotation
+    return target
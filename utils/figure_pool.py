@@ -0,0 +1,238 @@
+import contextlib
+import functools
+import json
+import multiprocessing
+import os
+import signal
+import threading
+
+import flask
+import plotly.io as pio
+from dash.exceptions import PreventUpdate
+
+from utils.data_manager import data_manager
+
+# Signals gunicorn handles in its workers; pool processes forked from a worker go back to the defaults
+WORKER_SIGNALS = ('SIGHUP', 'SIGQUIT', 'SIGTERM', 'SIGUSR1', 'SIGUSR2', 'SIGWINCH', 'SIGTTIN', 'SIGTTOU', 'SIGCHLD')
+
+
+class PoolSaturated(PreventUpdate):
+    """Raised instead of queueing a build when the pool already holds queue_depth builds."""
+
+
+class PoolTimeout(PreventUpdate):
+    """Raised when a build did not finish within the pool's timeout."""
+
+
+def _init_pool_process():
+    for name in WORKER_SIGNALS:
+        signal.signal(getattr(signal, name), signal.SIG_DFL)
+    # Ctrl-C is the parent's to handle
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    figure_pool.in_pool_process = True
+
+
+def _build_json(name, args):
+    return pio.to_json(figure_pool.builders[name](*args), validate=False)
+
+
+class FigurePool:
+    """Bounded pool of forked processes that build figures outside the web worker's GIL.
+
+    Functions decorated with offload() run in the pool and come back as figure dicts. A worker thread
+    waiting on its figure releases the GIL, so with threaded workers (gthread) the other requests keep
+    being served while plotly builds the figure on another core. At most queue_depth builds are in flight
+    per web worker: beyond that, or when a build takes longer than timeout seconds, the callback stops with
+    PoolSaturated / PoolTimeout, which dash answers like dash.no_update for every output.
+
+    Another thread of a threaded worker may hold a lock (a data version's, a Lazy's) at any moment, and a
+    process forked meanwhile would wait on its copy of that lock forever. So once the worker serves requests,
+    the pool is only forked while none is running: init_app() counts them, and a fork that is due (the first
+    one, or a restart after a reload) holds new requests back until the running ones have finished.
+    """
+
+    def __init__(self, workers=0, queue_depth=None, timeout=10.0):
+        self.workers = workers
+        self.queue_depth = queue_depth or 2 * workers
+        self.timeout = timeout
+        self.builders = {}
+        self.in_pool_process = False
+        self._local = threading.local()
+        self._closed = False
+        self.submitted = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self._pool = None
+        self._pid = None
+        self.data_version = None
+        self._slots = threading.BoundedSemaphore(max(self.queue_depth, 1))
+        self._lock = threading.Lock()
+        # Requests running in this process, and whether a fork waits for them to finish
+        self._idle = threading.Condition()
+        self._requests = 0
+        self._fork_pending = False
+
+    @classmethod
+    def from_env(cls):
+        """Build the pool from FIGURE_POOL_* environment variables."""
+        return cls(
+            workers=int(os.environ.get('FIGURE_POOL_WORKERS', '0')),
+            queue_depth=int(os.environ.get('FIGURE_POOL_QUEUE', '0')) or None,
+            timeout=float(os.environ.get('FIGURE_POOL_TIMEOUT', '10')),
+        )
+
+    def init_app(self, server):
+        """Count the requests running in this process, so the pool is forked while none is."""
+        @server.before_request
+        def enter_request():
+            # Requests this thread makes in process, e.g. a layout rendering its snapshot, are part of the
+            # request already running, which a due fork would wait for
+            if getattr(self._local, 'in_process', False):
+                return
+            with self._idle:
+                # Hold new requests back until a due fork is done
+                while self._fork_pending:
+                    self._idle.wait()
+                self._requests += 1
+            flask.g.figure_pool_request = True
+
+        @server.teardown_request
+        def leave_request(_):
+            if not flask.g.pop('figure_pool_request', False):
+                return
+            with self._idle:
+                self._requests -= 1
+                last = self._fork_pending and not self._requests
+            if last:
+                self._fork_when_idle()
+
+    @property
+    def enabled(self):
+        in_process = getattr(self._local, 'in_process', False)
+        return self.workers > 0 and not self.in_pool_process and not in_process and not self._closed
+
+    @contextlib.contextmanager
+    def in_process(self):
+        """Build offloaded figures in this thread meanwhile, e.g. in the gunicorn master, which must not fork."""
+        previous, self._local.in_process = getattr(self._local, 'in_process', False), True
+        try:
+            yield
+        finally:
+            self._local.in_process = previous
+
+    @property
+    def running(self):
+        return self._pool is not None and self._pid == os.getpid()
+
+    def start(self):
+        """Fork the pool processes of this web worker, if they are not running yet.
+
+        Pages must be imported first, since the processes only know the builders registered before the
+        fork. Only call this while no other thread can hold the app's locks: under gunicorn it runs in
+        post_worker_init, before the worker starts its request threads. Later forks go through
+        _fork_when_idle().
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            if self.running:
+                return
+            self._pool = multiprocessing.get_context('fork').Pool(self.workers, initializer=_init_pool_process)
+            self._pid = os.getpid()
+            self.data_version = data_manager.published
+
+    def _fork_when_idle(self, due=False):
+        """Fork the pool now if no request is running, otherwise once the last running one ends."""
+        with self._idle:
+            self._fork_pending = self._fork_pending or due
+            if not self._fork_pending or self._requests:
+                return
+        # Reloads (and the data watcher's checks) take the data locks outside of any request, hold them off too
+        with data_manager.paused(), self._idle:
+            if not self._fork_pending or self._requests:
+                return
+            try:
+                self.start()
+            finally:
+                self._fork_pending = False
+                self._idle.notify_all()
+
+    def restart(self):
+        """Replace running pool processes by new forks, so they see the current data version.
+
+        The old processes finish the builds they were given, on the data they were forked with, then exit.
+        Until the new ones are forked, builds run in the request thread.
+        """
+        with self._lock:
+            if not self.running:
+                return
+            old, self._pool = self._pool, None
+        old.close()
+        self._fork_when_idle(due=True)
+
+    def close(self):
+        """Stop the pool for good; requests still finishing (a worker shutting down) build in their thread."""
+        self._closed = True
+        with self._lock:
+            if self._pool is not None and self._pid == os.getpid():
+                self._pool.terminate()
+            self._pool = None
+
+    def _release(self, _):
+        self._slots.release()
+
+    def run(self, name, args):
+        """Build the figure of a registered builder in the pool and return its JSON, None if the pool is down."""
+        with self._lock:
+            pool = self._pool if self.running else None
+        if pool is None:
+            return None
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise PoolSaturated
+        with self._lock:
+            self.submitted += 1
+        # The slot is freed when the build finishes, even if the caller stopped waiting for it
+        try:
+            result = pool.apply_async(_build_json, (name, args), callback=self._release,
+                                            error_callback=self._release)
+        except Exception:
+            self._slots.release()
+            raise
+        try:
+            return result.get(self.timeout)
+        except multiprocessing.TimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            raise PoolTimeout from None
+
+    def offload(self, func):
+        """Decorator running a figure-returning function in the pool when the pool is enabled."""
+        name = f'{func.__module__}.{func.__qualname__}'
+        self.builders[name] = func
+
+        @functools.wraps(func)
+        def wrapper(*args):
+            if not self.enabled:
+                return func(*args)
+            if not self.running:
+                # Fork the pool, right away outside of requests, otherwise once they have finished
+                self._fork_when_idle(due=True)
+            # The processes only have the data version they were forked with; builds on another one (a request
+            # that started before a reload, or a reload building its new version) stay in this process
+            if not self.running or self.data_version is not data_manager.current():
+                return func(*args)
+            figure = self.run(name, args)
+            return func(*args) if figure is None else json.loads(figure)
+        return wrapper
+
+    def stats(self):
+        return {'submitted': self.submitted, 'rejected': self.rejected, 'timeouts': self.timeouts}
+
+
+# Shared by every page; FIGURE_POOL_WORKERS processes per web worker (0, the default, builds figures in the
+# request thread), FIGURE_POOL_QUEUE builds in flight at most (default twice the processes) and
+# FIGURE_POOL_TIMEOUT seconds per build
+figure_pool = FigurePool.from_env()
+data_manager.on_reload(lambda changed, old, new: figure_pool.restart())
@@ -0,0 +1,35 @@
+from utils.data_loader import exact_float64
+from utils.lazy import Lazy
+
+
+class FigureTemplate:
+    """Layout and trace skeletons of a fixed-shape chart, built once; render() only fills in the data.
+
+    build() makes the chart with the same plotly.express and update_layout calls as the figure it replaces,
+    on any sample of the data. It runs on first render rather than at import, because the pages are
+    imported before app.py makes darkly the default plotly template.
+    """
+
+    def __init__(self, build):
+        self._spec = Lazy(lambda: build().to_plotly_json(), f'{build.__module__} figure template')
+
+    @property
+    def spec(self):
+        return self._spec()
+
+    def render(self, traces, **layout):
+        """Return a figure dict whose i-th trace is the i-th skeleton trace updated with traces[i].
+
+        Only the traces given are kept, and keyword arguments replace top-level layout keys (e.g. title).
+        Skeleton dicts are shared between figures, so callers must not modify the result in place.
+        """
+        spec = self.spec
+        return {
+            'data': [dict(skeleton, **values) for skeleton, values in zip(spec['data'], traces)],
+            'layout': dict(spec['layout'], **layout),
+        }
+
+
+def xy(data, x, y):
+    """Trace values of a px chart plotting column y against column x of data, widened like data_loader.widen."""
+    return {'x': exact_float64(data[x].to_numpy()), 'y': exact_float64(data[y].to_numpy())}
@@ -0,0 +1,33 @@
+from utils.data_loader import ENTITY_COLUMN, exact_float64, exact_value
+
+
+class LatestSnapshot:
+    """The most recent row of every entity, with constant-time lookups by entity name.
+
+    frame keeps the dataset's compact dtypes; rows and columns read through get() and column() are widened
+    (see data_loader.widen).
+    """
+
+    def __init__(self, df, entity_column=ENTITY_COLUMN, year_column='Year'):
+        # One stable sort puts each entity's latest year first; when years tie the first row in
+        # table order is kept instead of duplicating the entity
+        latest = (df.sort_values([entity_column, year_column], ascending=[True, False], kind='stable')
+                  .drop_duplicates(entity_column, keep='first')
+                  .sort_index())
+        self.frame = latest.reset_index(drop=True)
+        self._positions = {entity: i for i, entity in enumerate(self.frame[entity_column])}
+        self._columns = {column: self.frame[column].to_numpy() for column in self.frame.columns}
+
+    def __contains__(self, entity):
+        return entity in self._positions
+
+    def get(self, entity):
+        """Return the latest row of an entity as a dict, or None if it is unknown."""
+        position = self._positions.get(entity)
+        if position is None:
+            return None
+        return {column: exact_value(values[position]) for column, values in self._columns.items()}
+
+    def column(self, column):
+        """Return every entity's latest value of column, in the order of frame."""
+        return exact_float64(self._columns[column])
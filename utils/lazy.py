@@ -0,0 +1,42 @@
+import threading
+
+from utils.startup_profile import span
+
+
+class Lazy:
+    """A value built on first use, once, even when several threads ask for it at the same time.
+
+    Every instance is registered, so prime_all() can build them up front: in a preloading gunicorn master
+    before the workers fork, or at import when lazy pages are turned off. name and kind label the build in
+    the startup profile.
+    """
+
+    instances = []
+
+    def __init__(self, build, name=None, kind='precompute'):
+        self._build = build
+        self.name = name or f'{build.__module__}.{build.__qualname__}'
+        self.kind = kind
+        self._value = None
+        self._built = False
+        self._lock = threading.Lock()
+        Lazy.instances.append(self)
+
+    @property
+    def built(self):
+        return self._built
+
+    def __call__(self):
+        if not self._built:
+            with self._lock:
+                if not self._built:
+                    with span(self.name, self.kind):
+                        self._value = self._build()
+                    self._built = True
+        return self._value
+
+
+def prime_all():
+    """Build every lazy value that has not been built yet."""
+    for lazy in list(Lazy.instances):
+        lazy()
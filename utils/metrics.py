@@ -0,0 +1,172 @@
+import bisect
+import contextvars
+import functools
+import threading
+import time
+
+import dash._callback
+from flask import Response
+
+# Histogram buckets (upper bounds) for callback phase durations and response sizes
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PAYLOAD_BUCKETS = (1e3, 5e3, 1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 5e6)
+
+# Timing record of the callback running in the current request context
+_current = contextvars.ContextVar('callback_timing', default=None)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name, labels):
+        cumulative = 0
+        for bound, count in zip((*self.buckets, '+Inf'), self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_sum{{{labels}}} {self.sum}'
+        yield f'{name}_count{{{labels}}} {self.count}'
+
+
+class _Timing:
+    """Phase durations of one callback invocation, filled in by lap() and the serialization hook."""
+
+    def __init__(self):
+        self.start = self.last = time.perf_counter()
+        self.phases = {}
+
+    def add(self, phase, seconds):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+
+def lap(phase):
+    """Attribute the time since the callback started (or since the previous lap) to phase.
+
+    Callbacks call lap('filter') once their data is selected and lap('figure') once their figures are
+    built; outside an instrumented callback this does nothing.
+    """
+    timing = _current.get()
+    if timing is None:
+        return
+    now = time.perf_counter()
+    timing.add(phase, now - timing.last)
+    timing.last = now
+
+
+class CallbackMetrics:
+    """Per-callback call counts, phase duration histograms and payload size histograms."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = {}
+        self.durations = {}
+        self.payloads = {}
+
+    def record(self, callback_id, timing, total, payload_bytes):
+        with self._lock:
+            self.calls[callback_id] = self.calls.get(callback_id, 0) + 1
+            for phase, seconds in (*timing.phases.items(), ('total', total)):
+                key = (callback_id, phase)
+                if key not in self.durations:
+                    self.durations[key] = Histogram(DURATION_BUCKETS)
+                self.durations[key].observe(seconds)
+            if payload_bytes is not None:
+                if callback_id not in self.payloads:
+                    self.payloads[callback_id] = Histogram(PAYLOAD_BUCKETS)
+                self.payloads[callback_id].observe(payload_bytes)
+
+    def wrap(self, callback_id, func):
+        """Wrap a registered Dash callback so every invocation is timed and its response measured."""
+        @functools.wraps(func)
+        def instrumented(*args, **kwargs):
+            timing = _Timing()
+            token = _current.set(timing)
+            payload_bytes = None
+            try:
+                result = func(*args, **kwargs)
+                payload_bytes = len(result.encode() if isinstance(result, str) else result)
+                return result
+            finally:
+                _current.reset(token)
+                self.record(callback_id, timing, time.perf_counter() - timing.start, payload_bytes)
+
+        instrumented.metrics_instrumented = True
+        return instrumented
+
+    def instrument(self, app):
+        """Wrap every callback of app, including page callbacks registered before the first request."""
+        # dash serializes callback responses with dash._callback.to_json, time it as its own phase
+        if not getattr(dash._callback.to_json, 'metrics_instrumented', False):
+            dash._callback.to_json = _timed_to_json(dash._callback.to_json)
+
+        @app.server.before_request
+        def instrument_callbacks():
+            for entry in app.callback_map.values():
+                func = entry.get('callback')
+                if func is None or getattr(func, 'metrics_instrumented', False):
+                    continue
+                callback_id = f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+                entry['callback'] = self.wrap(callback_id, func)
+
+    def prometheus(self, extra_counters=()):
+        """Render the metrics in the Prometheus text exposition format."""
+        lines = [
+            '# HELP dash_callback_calls_total Number of callback invocations.',
+            '# TYPE dash_callback_calls_total counter',
+        ]
+        with self._lock:
+            for callback_id, calls in sorted(self.calls.items()):
+                lines.append(f'dash_callback_calls_total{{callback="{callback_id}"}} {calls}')
+            lines += [
+                '# HELP dash_callback_duration_seconds Callback wall time by phase '
+                '(filter, figure, serialize and total).',
+                '# TYPE dash_callback_duration_seconds histogram',
+            ]
+            for (callback_id, phase), histogram in sorted(self.durations.items()):
+                lines += histogram.samples('dash_callback_duration_seconds',
+                                           f'callback="{callback_id}",phase="{phase}"')
+            lines += [
+                '# HELP dash_callback_payload_bytes Size of the JSON response of a callback.',
+                '# TYPE dash_callback_payload_bytes histogram',
+            ]
+            for callback_id, histogram in sorted(self.payloads.items()):
+                lines += histogram.samples('dash_callback_payload_bytes', f'callback="{callback_id}"')
+        for name, help_text, value in extra_counters:
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter', f'{name} {value}']
+        return '\n'.join(lines) + '\n'
+
+    def register_route(self, server, path='/metrics', extra_counters=lambda: ()):
+        """Serve the metrics (plus extra_counters() as (name, help, value) tuples) at path."""
+        def metrics_view():
+            return Response(self.prometheus(extra_counters()), mimetype='text/plain; version=0.0.4')
+
+        server.add_url_rule(path, 'callback_metrics', metrics_view)
+
+
+def _timed_to_json(to_json):
+    @functools.wraps(to_json)
+    def timed(obj):
+        timing = _current.get()
+        if timing is None:
+            return to_json(obj)
+        start = time.perf_counter()
+        try:
+            return to_json(obj)
+        finally:
+            now = time.perf_counter()
+            timing.add('serialize', now - start)
+            timing.last = now
+
+    timed.metrics_instrumented = True
+    return timed
+
+
+callback_metrics = CallbackMetrics()
@@ -0,0 +1,123 @@
+import base64
+import functools
+import os
+import re
+
+import dash
+import dash._callback
+import numpy as np
+import plotly.io as pio
+from plotly.utils import PlotlyJSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# First plotly.js release that decodes {dtype, bdata} typed-array specs in figure data
+TYPED_ARRAYS_PLOTLYJS = (2, 28, 0)
+
+# numpy dtypes plotly.js typed arrays support, by their plotly.js short name
+TYPED_ARRAY_DTYPES = {
+    'int8': 'i1', 'uint8': 'u1', 'int16': 'i2', 'uint16': 'u2',
+    'int32': 'i4', 'uint32': 'u4', 'float32': 'f4', 'float64': 'f8',
+}
+
+# Characters plotly escapes in the JSON it produces with orjson, so it is safe to embed in HTML
+HTML_ESCAPES = (('<', '\\u003c'), ('>', '\\u003e'), ('/', '\\u002f'), ('\u2028', '\\u2028'), ('\u2029', '\\u2029'))
+
+_encoder = PlotlyJSONEncoder()
+
+
+def bundled_plotlyjs_version():
+    """Return the version of the plotly.js served with dcc.Graph, read from the bundle header."""
+    path = os.path.join(os.path.dirname(dash.dcc.__file__), 'plotly.min.js')
+    try:
+        with open(path, encoding='utf-8', errors='ignore') as f:
+            match = re.search(r'plotly\.js v(\d+)\.(\d+)\.(\d+)', f.read(256))
+    except OSError:
+        return None
+    return tuple(int(part) for part in match.groups()) if match else None
+
+
+def typed_array_spec(values):
+    """Return a numeric array as a plotly.js typed-array spec, or unchanged if it has no binary form."""
+    if values.size == 0 or values.dtype.kind not in 'iuf':
+        return values
+    # plotly.js has no 64-bit integer arrays, narrow them when the values fit
+    if values.dtype.kind in 'iu' and values.dtype.itemsize == 8:
+        for dtype in ('int8', 'int16', 'int32') if values.dtype.kind == 'i' else ('uint8', 'uint16', 'uint32'):
+            limits = np.iinfo(dtype)
+            if limits.min <= values.min() and values.max() <= limits.max:
+                values = values.astype(dtype)
+                break
+        else:
+            return values
+    if values.dtype.name not in TYPED_ARRAY_DTYPES:
+        return values
+    little_endian = np.ascontiguousarray(values, dtype=values.dtype.newbyteorder('<'))
+    spec = {'dtype': TYPED_ARRAY_DTYPES[values.dtype.name], 'bdata': base64.b64encode(little_endian).decode('ascii')}
+    if values.ndim > 1:
+        spec['shape'] = ', '.join(str(size) for size in values.shape)
+    return spec
+
+
+def encode_typed_arrays(obj, in_figure=False):
+    """Replace the numeric numpy arrays of every figure (dcc.Graph figure prop) in obj by typed-array specs."""
+    if hasattr(obj, 'to_plotly_json'):
+        obj = obj.to_plotly_json()
+    if isinstance(obj, dict):
+        return {key: encode_typed_arrays(value, in_figure or key == 'figure') for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [encode_typed_arrays(value, in_figure) for value in obj]
+    if in_figure and isinstance(obj, np.ndarray):
+        return typed_array_spec(obj)
+    return obj
+
+
+def _default(obj):
+    # Components, figures and patches; orjson serializes dicts, lists and contiguous numeric arrays natively
+    if hasattr(obj, 'to_plotly_json'):
+        return obj.to_plotly_json()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    # Anything else (pandas objects, dates, decimals) the way plotly's JSON encoder converts it
+    return _encoder.default(obj)
+
+
+def escape_html(json_str):
+    for char, escaped in HTML_ESCAPES:
+        if char in json_str:
+            json_str = json_str.replace(char, escaped)
+    return json_str
+
+
+def to_json(obj, typed_arrays=False):
+    """Serialize a callback response with orjson, converting Dash/plotly objects lazily.
+
+    plotly's own orjson path first cleans the whole object in Python as soon as it contains a component
+    or figure object, which every callback response does; orjson's default hook avoids that pass.
+    """
+    if typed_arrays:
+        obj = encode_typed_arrays(obj)
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    return escape_html(orjson.dumps(obj, default=_default, option=options).decode('utf8'))
+
+
+def typed_arrays_supported():
+    version = bundled_plotlyjs_version()
+    return version is not None and version >= TYPED_ARRAYS_PLOTLYJS
+
+
+def enable_fast_json(typed_arrays=False):
+    """Serialize callback responses with to_json and make orjson plotly's JSON engine.
+
+    typed_arrays is ignored unless the bundled plotly.js decodes typed-array specs; returns whether they
+    are used. Call this before callback_metrics.instrument(), so the serialize phase times the fast encoder.
+    """
+    if orjson is None:
+        raise ImportError('The fast JSON mode requires the orjson package')
+    typed_arrays = typed_arrays and typed_arrays_supported()
+    pio.json.config.default_engine = 'orjson'
+    dash._callback.to_json = functools.partial(to_json, typed_arrays=typed_arrays)
+    return typed_arrays
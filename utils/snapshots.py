@@ -0,0 +1,186 @@
+import json
+import logging
+import os
+from pathlib import Path
+
+import dash
+from dash.development.base_component import Component
+from plotly.io.json import to_json_plotly
+
+from utils.clientside import CLIENTSIDE_FILTERING, session_store_ids
+from utils.data_cache import file_digest, _source_stat, _write_json_atomic
+from utils.data_loader import dataset_path
+from utils.data_manager import data_manager
+from utils.figure_pool import figure_pool
+
+logger = logging.getLogger(__name__)
+
+# Initial callback outputs rendered by scripts/build_snapshots.py (set to an empty string to ignore them)
+SNAPSHOT_DIR = os.environ.get('DASH_SNAPSHOT_DIR', str(Path(__file__).resolve().parent.parent / 'snapshots'))
+
+
+def walk(component):
+    """Yield a component and every component below it."""
+    yield component
+    children = getattr(component, 'children', None)
+    for child in children if isinstance(children, (list, tuple)) else [children]:
+        if isinstance(child, Component):
+            yield from walk(child)
+
+
+def render_initial_outputs(app, layout):
+    """Return {component id: {property: value}} set by the server callbacks the browser calls when layout loads.
+
+    The session stores of the clientside filtering mode are left out: each session fetches them once, they
+    are not part of the layout. Figures are built in this thread, since layouts cannot answer no_update when
+    the figure pool turns a build away.
+    """
+    components = {c.id: c for c in walk(layout) if isinstance(getattr(c, 'id', None), str)}
+    stores = session_store_ids()
+
+    def current(item):
+        return dict(item, value=getattr(components.get(item['id']), item['property'], None))
+
+    client = app.server.test_client()
+    outputs = {}
+    with figure_pool.in_process():
+        for output, entry in app.callback_map.items():
+            # Clientside callbacks run in the browser; callbacks of other pages do not fire here
+            ids = [item['id'] for item in entry['inputs']]
+            if 'callback' not in entry or not all(isinstance(i, str) and i in components for i in ids):
+                continue
+            if output.startswith('..'):
+                output_spec = [dict(zip(('id', 'property'), o.rsplit('.', 1))) for o in output[2:-2].split('...')]
+            else:
+                output_spec = dict(zip(('id', 'property'), output.rsplit('.', 1)))
+            if any(item['id'] in stores for item in (output_spec if isinstance(output_spec, list) else [output_spec])):
+                continue
+
+            response = client.post('/_dash-update-component', content_type='application/json', data=to_json_plotly({
+                'output': output, 'outputs': output_spec, 'changedPropIds': [],
+                'inputs': [current(i) for i in entry['inputs']],
+                'state': [current(s) for s in entry.get('state', [])],
+            }))
+            if response.status_code == 200:
+                for component_id, props in response.get_json()['response'].items():
+                    for prop, value in props.items():
+                        # Partial updates only apply to a figure the layout already has
+                        if not (isinstance(value, dict) and '__dash_patch_update' in value):
+                            outputs.setdefault(component_id, {})[prop] = value
+    return outputs
+
+
+class LayoutSnapshot:
+    """The outputs of a page's initial callbacks, rendered ahead of time and embedded in its layout.
+
+    They are the same for every visitor, so scripts/build_snapshots.py renders them once. When a snapshot
+    of the page's datasets as they are on disk exists at startup, available is true: the page's callbacks
+    are registered with prevent_initial_call=available and apply() sets the snapshot's values on the
+    layout's components. Layouts built for a later data version render and save a new snapshot
+    in-process (or only serve it, if the directory is read-only). Without a snapshot at startup the
+    callbacks run on page load as usual.
+    """
+
+    def __init__(self, page, datasets, directory=SNAPSHOT_DIR):
+        self.page = page
+        self.datasets = list(datasets)
+        self.path = Path(directory) / f'{page}.json' if directory else None
+        self.available = self._matches_files()
+
+    @property
+    def _sources_path(self):
+        return self.path.with_suffix('.datasets.json')
+
+    def _read_sources(self):
+        """Return {dataset: {'sha256', 'mtime_ns', 'size'}} of the files the snapshot was rendered from."""
+        if self.path is None:
+            return None
+        try:
+            with open(self._sources_path) as f:
+                sources = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(sources, dict) or sorted(sources) != sorted(self.datasets) or not all(
+                isinstance(source, dict) for source in sources.values()):
+            return None
+        return sources
+
+    def _read_digests(self):
+        sources = self._read_sources()
+        return None if sources is None else {name: source.get('sha256') for name, source in sources.items()}
+
+    def _matches_files(self):
+        """Check the snapshot against the dataset files, hashing only those whose mtime or size changed.
+
+        Pages create their snapshot at import, so this costs a stat per dataset rather than reading them,
+        the way the columnar cache checks its entries.
+        """
+        sources = self._read_sources()
+        if sources is None:
+            return False
+        refreshed = False
+        for name in self.datasets:
+            path, recorded = dataset_path(name), sources[name]
+            if not path.exists():
+                if recorded.get('sha256') is not None:
+                    return False
+                continue
+            stat = _source_stat(path)
+            if recorded.get('mtime_ns') == stat['mtime_ns'] and recorded.get('size') == stat['size']:
+                continue
+            if recorded.get('size') != stat['size'] or recorded.get('sha256') != file_digest(path):
+                return False
+            recorded.update(stat)
+            refreshed = True
+        if refreshed:
+            # Same contents with a new mtime (e.g. a fresh checkout): record it so the next start skips the hash
+            try:
+                _write_json_atomic(self._sources_path, sources)
+            except OSError:
+                pass
+        return True
+
+    def apply(self, layout):
+        """Set the snapshot's property values on the components of layout and return it."""
+        if not self.available:
+            return layout
+        data = data_manager.current()
+        digests = {name: data.digest(name) for name in self.datasets}
+        outputs = None
+        if self._read_digests() == digests:
+            try:
+                with open(self.path) as f:
+                    outputs = json.load(f)
+            except (OSError, ValueError):
+                pass
+        if outputs is None:
+            # The datasets were reloaded since the snapshot was rendered
+            outputs = render_initial_outputs(dash.get_app(), layout)
+            # With clientside filtering the browser renders the filtering callbacks' outputs, so this render lacks
+            # them; only renders made like scripts/build_snapshots.py's, by the server callbacks, are saved
+            if not CLIENTSIDE_FILTERING:
+                try:
+                    self.write(outputs, digests)
+                except OSError as error:
+                    # e.g. a read-only deployment: serve what was rendered, the layout is built once per version
+                    logger.warning('Could not save the %s snapshot: %s', self.page, error)
+
+        for component in walk(layout):
+            component_id = getattr(component, 'id', None)
+            if isinstance(component_id, str):
+                for prop, value in outputs.get(component_id, {}).items():
+                    setattr(component, prop, value)
+        return layout
+
+    def write(self, outputs, digests):
+        """Save {component id: {property: value}} rendered from datasets with the given digests."""
+        sources = {}
+        for name in self.datasets:
+            path = dataset_path(name)
+            sources[name] = {'sha256': digests[name]}
+            # apply() compares the digests, a file replaced since it was loaded only costs a hash at startup
+            if digests[name] is not None and path.exists():
+                sources[name].update(_source_stat(path))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        _write_json_atomic(self.path, outputs)
+        _write_json_atomic(self._sources_path, sources)
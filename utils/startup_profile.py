@@ -0,0 +1,169 @@
+import argparse
+import builtins
+import importlib
+import importlib.util
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Summary table rows, in boot order
+KINDS = ('import', 'theme', 'read', 'precompute', 'layout', 'other')
+
+
+class StartupProfile:
+    """Nested wall-clock spans of the app's startup, written as folded stacks for flame graph tools.
+
+    Spans are only recorded between start() and stop(), on the thread that called start(); outside of
+    that span() does nothing, so the instrumented code paths cost nothing when the app is served.
+    While profiling, every module import that actually loads a module is recorded as an 'import' span.
+    """
+
+    def __init__(self):
+        self._thread = None
+        self._stack = []
+        self._spans = []
+        self._import = None
+
+    @property
+    def active(self):
+        return self._thread == threading.get_ident()
+
+    def start(self, root='app'):
+        self._thread = threading.get_ident()
+        self._stack = []
+        self._spans = []
+        self._import = builtins.__import__
+        builtins.__import__ = self._traced_import
+        self._push(root, 'other')
+
+    def stop(self):
+        if not self.active:
+            return
+        builtins.__import__ = self._import
+        while self._stack:
+            self._pop()
+        self._thread = None
+
+    def _push(self, name, kind):
+        self._stack.append([name, kind, time.perf_counter(), 0.0])
+
+    def _pop(self):
+        name, kind, started, children = self._stack.pop()
+        total = time.perf_counter() - started
+        path = tuple(frame[0] for frame in self._stack) + (name,)
+        self._spans.append((path, kind, total, total - children))
+        if self._stack:
+            self._stack[-1][3] += total
+
+    @contextmanager
+    def span(self, name, kind='other'):
+        if not self.active:
+            yield
+            return
+        self._push(name, kind)
+        try:
+            yield
+        finally:
+            self._pop()
+
+    def _loading(self, name, fromlist):
+        """Return the modules an import statement is about to load, if any."""
+        module = sys.modules.get(name)
+        if module is None:
+            return name
+        # `from package import submodule` loads the submodule even when the package is already imported
+        missing = [item for item in fromlist or () if item != '*' and not hasattr(module, item)]
+        if not missing:
+            return None
+        return f'{name}.{missing[0]}' if len(missing) == 1 else f"{name}.{{{','.join(missing)}}}"
+
+    def _traced_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if not self.active:
+            return self._import(name, globals, locals, fromlist, level)
+        module_name = name
+        if level:
+            try:
+                module_name = importlib.util.resolve_name('.' * level + name, (globals or {}).get('__package__'))
+            except (ImportError, ValueError):
+                pass
+        loading = self._loading(module_name, fromlist)
+        if loading is None:
+            return self._import(name, globals, locals, fromlist, level)
+        with self.span(f'import {loading}', 'import'):
+            return self._import(name, globals, locals, fromlist, level)
+
+    def _merged(self):
+        """Return {path: [kind, count, total, self time]}, adding up spans with the same name and parents."""
+        merged = {}
+        for path, kind, total, self_time in self._spans:
+            entry = merged.setdefault(path, [kind, 0, 0.0, 0.0])
+            entry[1] += 1
+            entry[2] += total
+            entry[3] += self_time
+        return merged
+
+    def folded(self):
+        """Return 'frame;frame;frame microseconds' lines of self time, the input format of flamegraph.pl."""
+        lines = []
+        for path, (_, _, _, self_time) in sorted(self._merged().items()):
+            if round(self_time * 1e6) > 0:
+                lines.append(f"{';'.join(path)} {round(self_time * 1e6)}")
+        return lines
+
+    def summary(self, top=20):
+        """Return a table of the self time spent in each kind of work, followed by the slowest spans."""
+        wall = max((total for path, _, total, _ in self._spans if len(path) == 1), default=0.0)
+        by_kind = dict.fromkeys(KINDS, 0.0)
+        for _, kind, _, self_time in self._spans:
+            by_kind[kind] += self_time
+
+        lines = [f"{'phase':<12} {'ms':>9} {'share':>7}"]
+        for kind, seconds in by_kind.items():
+            lines.append(f'{kind:<12} {seconds * 1e3:>9.1f} {seconds / wall if wall else 0:>7.1%}')
+        lines.append(f"{'total':<12} {wall * 1e3:>9.1f}")
+
+        # Imports are listed only where they are first reached from app code, with their nested imports included
+        spans = [(path, *entry) for path, entry in self._merged().items()
+                 if len(path) > 1 and not (entry[0] == 'import' and path[-2].startswith('import '))]
+        spans.sort(key=lambda span: span[3], reverse=True)
+        lines.append('')
+        lines.append(f"{'span':<48} {'kind':<10} {'count':>5} {'total ms':>9} {'self ms':>9}")
+        for path, kind, count, total, self_time in spans[:top]:
+            lines.append(f'{path[-1][:48]:<48} {kind:<10} {count:>5} {total * 1e3:>9.1f} {self_time * 1e3:>9.1f}')
+        return '\n'.join(lines)
+
+    def write_folded(self, path):
+        with open(path, 'w') as f:
+            f.write('\n'.join(self.folded()) + '\n')
+
+
+startup_profile = StartupProfile()
+span = startup_profile.span
+
+
+def profile_startup(module, argv):
+    """Import module with the profiler running, build its lazy pages, then write and print the report."""
+    parser = argparse.ArgumentParser(prog=f'python -m {module} --profile-startup',
+                                     description='Report where the time to boot the app goes.')
+    parser.add_argument('--profile-startup', action='store_true')
+    parser.add_argument('--output', default='startup.folded',
+                        help='folded stacks for flamegraph.pl or speedscope (default: %(default)s)')
+    parser.add_argument('--top', type=int, default=20, help='number of spans in the summary table')
+    args = parser.parse_args(argv)
+
+    startup_profile.start('startup')
+    try:
+        with span(f'{module} module', 'other'):
+            importlib.import_module(module)
+        # Pages build their data and layouts on first use, which is part of a cold start too
+        from utils.lazy import prime_all
+
+        with span('prime lazy pages', 'other'):
+            prime_all()
+    finally:
+        startup_profile.stop()
+
+    startup_profile.write_folded(args.output)
+    print(startup_profile.summary(args.top))
+    print(f'\nFolded stacks written to {args.output}')
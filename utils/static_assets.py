@@ -0,0 +1,76 @@
+import os
+import threading
+
+import dash
+from flask import request
+from werkzeug.security import safe_join
+
+from utils.data_cache import file_digest
+
+# Cache-Control of versioned asset URLs: dash adds ?m=<mtime> to the CSS/JS it includes, asset_url() adds
+# ?v=<content hash>; anything else is revalidated against its ETag
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+VERSION_ARGS = ('m', 'v')
+
+
+class StaticAssets:
+    """Content-hashed ETags and long-lived caching for the files dash serves from assets/."""
+
+    def __init__(self):
+        self.app = None
+        self._digests = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        app.server.after_request(self.add_headers)
+
+    def _app(self):
+        # Pages build their layouts while dash.Dash() is being constructed, before init_app()
+        return self.app or dash.get_app()
+
+    def file_path(self, path):
+        return safe_join(self._app().config.assets_folder, path)
+
+    def digest(self, path):
+        """Return the SHA-256 of an asset, recomputed only when its mtime or size changes."""
+        file_path = self.file_path(path)
+        stat = os.stat(file_path)
+        key = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._digests.get(file_path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        digest = file_digest(file_path)
+        with self._lock:
+            self._digests[file_path] = (key, digest)
+        return digest
+
+    def url(self, path):
+        """Return the versioned URL of an asset, preferring its WebP variant built by scripts/build_webp.py."""
+        webp = os.path.splitext(path)[0] + '.webp'
+        if os.path.isfile(self.file_path(webp)):
+            path = webp
+        return f'{dash.get_asset_url(path)}?v={self.digest(path)[:16]}'
+
+    def add_headers(self, response):
+        app = self._app()
+        prefix = app.config.routes_pathname_prefix + app.config.assets_url_path.strip('/') + '/'
+        if response.status_code != 200 or not request.path.startswith(prefix):
+            return response
+        file_path = self.file_path(request.path[len(prefix):])
+        if file_path is None or not os.path.isfile(file_path):
+            return response
+
+        response.set_etag(self.digest(request.path[len(prefix):]))
+        if any(arg in request.args for arg in VERSION_ARGS):
+            response.headers['Cache-Control'] = IMMUTABLE
+        else:
+            response.headers['Cache-Control'] = REVALIDATE
+        # Answer If-None-Match with the content hash rather than flask's mtime-based ETag
+        return response.make_conditional(request)
+
+
+static_assets = StaticAssets()
+asset_url = static_assets.url